@@ -0,0 +1,178 @@
+"""
+Admission control in front of the analysis executor.
+
+Every analysis takes a slot before it reads its uploads or queues work. At
+most ``max_concurrent`` analyses run at once. Up to ``max_queue`` more wait
+in a priority queue: cheap work (statistical AI detection) goes ahead of
+heavy work (similarity search, batches), first come first served within a
+class. Anything beyond that is refused at once with 429. A request that
+waited ``queue_timeout`` seconds without getting a slot gets 503. A request
+whose client disconnects while it waits leaves the queue and never runs.
+Both refusals carry Retry-After, estimated from the recent service time.
+
+All state lives on the event loop, so there is no locking.
+"""
+
+import time
+import heapq
+import asyncio
+import itertools
+from contextlib import asynccontextmanager
+from typing import List, Dict, Optional, Callable, Awaitable, Any
+
+from fastapi import HTTPException
+
+# Lower runs first
+DEFAULT_PRIORITIES = {
+    "ai_statistical": 0,
+    "ai": 1,
+    "plagiarism": 2,
+    "combined": 2,
+    "batch": 3,
+}
+
+
+class _Waiter:
+    def __init__(self, kind: str, future: asyncio.Future):
+        self.kind = kind
+        self.future = future
+        self.enqueued = time.monotonic()
+
+
+class Slot:
+    """A granted slot; release() is idempotent and feeds the service-time estimate."""
+
+    def __init__(self, controller: "AdmissionController", waited: float):
+        self.controller = controller
+        self.waited = waited
+        self.start = time.monotonic()
+        self.released = False
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.controller.release(time.monotonic() - self.start)
+
+    async def release_on_loop(self):
+        """release() as a coroutine, for Starlette background tasks (which run plain callables in a thread)."""
+        self.release()
+
+
+class AdmissionController:
+    """Concurrency limit plus a bounded priority queue for analysis requests."""
+
+    def __init__(self, max_concurrent: int = 2, max_queue: int = 16, queue_timeout: float = 30.0,
+                 poll_interval: float = 0.5, priorities: Optional[Dict[str, int]] = None):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.poll_interval = poll_interval
+        self.priorities = dict(DEFAULT_PRIORITIES, **(priorities or {}))
+        self.running = 0
+        self.admitted = 0
+        self.rejected: Dict[str, int] = {}
+        # EWMA of how long a slot is held, for Retry-After
+        self.service_seconds = 5.0
+        self._heap: List[Any] = []
+        self._seq = itertools.count()
+
+    @property
+    def queued(self) -> int:
+        return len(self._heap)
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely free: the queue ahead drained at the current pace."""
+        ahead = self.queued + self.running
+        return max(1, int(round(self.service_seconds * ahead / max(1, self.max_concurrent))))
+
+    def _reject(self, status: int, reason: str, detail: str):
+        self.rejected[reason] = self.rejected.get(reason, 0) + 1
+        raise HTTPException(status_code=status, detail=detail, headers={"Retry-After": str(self.retry_after())})
+
+    def _wake_next(self):
+        while self._heap and self.running < self.max_concurrent:
+            _, _, waiter = heapq.heappop(self._heap)
+            self.running += 1
+            waiter.future.set_result(None)
+
+    async def acquire(self, kind: str, is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+                      timeout: Optional[float] = None) -> float:
+        """Wait for a slot, at most ``timeout`` (default ``queue_timeout``) seconds; returns the seconds spent queued."""
+        if self.running < self.max_concurrent and not self.queued:
+            self.running += 1
+            self.admitted += 1
+            return 0.0
+        if self.queued >= self.max_queue:
+            self._reject(429, "queue_full", f"Server busy: {self.queued} analyses already queued. Retry later.")
+
+        waiter = _Waiter(kind, asyncio.get_running_loop().create_future())
+        entry = (self.priorities.get(kind, max(self.priorities.values())), next(self._seq), waiter)
+        heapq.heappush(self._heap, entry)
+        timeout = self.queue_timeout if timeout is None else timeout
+        deadline = waiter.enqueued + timeout
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._reject(503, "timeout", f"Server busy: no capacity within {timeout:.0f}s. Retry later.")
+                try:
+                    await asyncio.wait_for(asyncio.shield(waiter.future), min(self.poll_interval, remaining))
+                    break
+                except asyncio.TimeoutError:
+                    pass
+                if is_disconnected is not None and await is_disconnected():
+                    self.rejected["disconnected"] = self.rejected.get("disconnected", 0) + 1
+                    # Nobody is left to answer; 499 is only ever seen in logs
+                    raise HTTPException(status_code=499, detail="Client closed the request while it was queued")
+        except BaseException:
+            if waiter.future.done():
+                # Granted the slot just as we gave up: pass it on
+                self.release()
+            else:
+                waiter.future.cancel()
+                self._heap.remove(entry)
+                heapq.heapify(self._heap)
+            raise
+        self.admitted += 1
+        return time.monotonic() - waiter.enqueued
+
+    def release(self, held_seconds: Optional[float] = None):
+        self.running -= 1
+        if held_seconds:
+            self.service_seconds = 0.8 * self.service_seconds + 0.2 * held_seconds
+        self._wake_next()
+
+    async def enter(self, kind: str, is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+                    timeout: Optional[float] = None) -> Slot:
+        return Slot(self, await self.acquire(kind, is_disconnected, timeout))
+
+    @asynccontextmanager
+    async def slot(self, kind: str, is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None):
+        """``async with admission.slot("plagiarism", request.is_disconnected): ...``"""
+        slot = await self.enter(kind, is_disconnected)
+        try:
+            yield slot
+        finally:
+            slot.release()
+
+    def check_capacity(self):
+        """429 now if a request arriving at this moment would be refused (same test as ``acquire``)."""
+        admitted_at_once = self.running < self.max_concurrent and not self.queued
+        if not admitted_at_once and self.queued >= self.max_queue:
+            self._reject(429, "queue_full", f"Server busy: {self.queued} analyses already queued. Retry later.")
+
+    def stats(self) -> Dict[str, Any]:
+        waiting: Dict[str, int] = {}
+        for _, _, waiter in self._heap:
+            waiting[waiter.kind] = waiting.get(waiter.kind, 0) + 1
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "queue_timeout": self.queue_timeout,
+            "running": self.running,
+            "queued": waiting,
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "service_seconds": self.service_seconds,
+            "priorities": self.priorities,
+        }
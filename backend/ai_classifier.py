@@ -0,0 +1,161 @@
+"""
+Local pretrained AI-text classifiers.
+
+The detectors listed by /api/ai-detection/models are Hugging Face
+sequence-classification checkpoints. They are loaded from a local
+directory, ``<root>/<model_choice>/``, and never downloaded at runtime.
+Sentences are tokenized once, sorted by token length and run in padded
+batches, so each batch pads only to its own longest sentence. Scores are
+cached per (model, sentence) hash.
+"""
+
+import os
+import re
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any
+
+import numpy as np
+
+# Directory names under the detector root. roberta-openai and roberta-general
+# match openai-community/roberta-{base,large}-openai-detector; any
+# sequence-classification checkpoint can be dropped in under these names.
+AI_DETECTOR_MODELS = (
+    "roberta-openai",
+    "roberta-chatgpt",
+    "roberta-general",
+    "distilroberta-ai",
+    "bert-ai-classifier",
+)
+
+# Label names that mean "machine written" across the common detectors. Whole
+# names only: "Not AI" or "not-generated" must not match
+AI_LABEL_RE = re.compile(r"^(fake|machine|generated|chatgpt|gpt|ai|label_1)$", re.IGNORECASE)
+
+
+def detector_path(root: str, model_choice: str) -> str:
+    if model_choice not in AI_DETECTOR_MODELS:
+        raise ValueError(f"Unknown AI detector '{model_choice}'. Choose from: {', '.join(AI_DETECTOR_MODELS)}")
+    return os.path.join(root, model_choice)
+
+
+def is_available(root: str, model_choice: str) -> bool:
+    return os.path.isfile(os.path.join(detector_path(root, model_choice), "config.json"))
+
+
+def ai_label_index(id2label: Dict[int, str]) -> int:
+    """Index of the logit that means AI-generated.
+
+    Raises RuntimeError if no label name says so; guessing would silently
+    invert the scores of a detector whose labels are in the other order.
+    """
+    matches = [int(index) for index, label in sorted(id2label.items()) if AI_LABEL_RE.match(str(label).strip())]
+    if len(matches) != 1:
+        labels = ", ".join(str(label) for _, label in sorted(id2label.items()))
+        raise RuntimeError(f"Cannot tell which detector label means AI-generated: {labels}")
+    return matches[0]
+
+
+class AIClassifier:
+    """A loaded detector: tokenizer, model and the logit that means AI-generated."""
+
+    def __init__(self, name: str, path: str, device: str = "cpu", quantize: bool = True,
+                 max_length: int = 256, batch_size: int = 32):
+        import torch
+        from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+        self.name = name
+        self.max_length = max_length
+        self.batch_size = batch_size
+        self.tokenizer = AutoTokenizer.from_pretrained(path, local_files_only=True)
+        model = AutoModelForSequenceClassification.from_pretrained(path, local_files_only=True).eval()
+        self.quantized = quantize and device == "cpu"
+        if self.quantized:
+            # int8 linear layers: the bulk of the compute of a BERT-style classifier
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.model = model.to(device)
+        self.device = device
+        self.ai_index = ai_label_index(model.config.id2label)
+
+    @property
+    def optimized(self) -> bool:
+        return self.quantized or self.device != "cpu"
+
+    def parameters(self):
+        return self.model.parameters()
+
+    def buffers(self):
+        return self.model.buffers()
+
+    def predict(self, sentences: List[str]) -> np.ndarray:
+        """Probability that each sentence is AI-generated."""
+        import torch
+
+        out = np.zeros(len(sentences), dtype=np.float32)
+        if not sentences:
+            return out
+        encoded = self.tokenizer(sentences, truncation=True, max_length=self.max_length)
+        # Length bucketing: neighbours in this order pad to nearly the same length
+        order = np.argsort([len(ids) for ids in encoded["input_ids"]], kind="stable")
+        with torch.inference_mode():
+            for start in range(0, len(order), self.batch_size):
+                rows = order[start:start + self.batch_size]
+                batch = self.tokenizer.pad(
+                    {key: [encoded[key][i] for i in rows] for key in encoded.keys()},
+                    return_tensors="pt"
+                )
+                logits = self.model(**{key: value.to(self.device) for key, value in batch.items()}).logits
+                out[rows] = torch.softmax(logits.float(), dim=-1)[:, self.ai_index].cpu().numpy()
+        return out
+
+
+class SentenceScoreCache:
+    """LRU of per-sentence AI probabilities keyed by (model, sentence) hash."""
+
+    def __init__(self, max_entries: int = 100000):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._scores: "OrderedDict[bytes, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(model_name: str, sentence: str) -> bytes:
+        return hashlib.blake2b(f"{model_name}\0{sentence}".encode("utf-8"), digest_size=16).digest()
+
+    def score(self, classifier: AIClassifier, sentences: List[str]) -> np.ndarray:
+        """Cached probabilities, running the classifier only on unseen sentences."""
+        keys = [self.key(classifier.name, s) for s in sentences]
+        out = np.zeros(len(sentences), dtype=np.float32)
+        todo: Dict[bytes, List[int]] = {}
+        with self._lock:
+            for i, key in enumerate(keys):
+                cached = self._scores.get(key)
+                if cached is None:
+                    todo.setdefault(key, []).append(i)
+                else:
+                    self._scores.move_to_end(key)
+                    out[i] = cached
+            self.hits += len(sentences) - sum(len(v) for v in todo.values())
+            self.misses += len(todo)
+        if todo:
+            miss_keys = list(todo)
+            scores = classifier.predict([sentences[todo[key][0]] for key in miss_keys])
+            with self._lock:
+                for key, score in zip(miss_keys, scores):
+                    out[todo[key]] = score
+                    self._scores[key] = float(score)
+                while len(self._scores) > self.max_entries:
+                    self._scores.popitem(last=False)
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._scores),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,118 @@
+"""
+Worker processes for EXECUTION_MODE=process.
+
+In thread mode every analysis shares one interpreter. PDF parsing, sentence
+splitting and result building are pure Python and serialise on the GIL, so
+more threads add no throughput. In process mode each analysis runs in its
+own worker process. Bytes go in, the finished result dict comes out, and
+throughput scales with cores.
+
+Where the platform has ``forkserver``, the fork server imports this module
+with PLAGIASENSE_ANALYSIS_WORKER set. That import loads ``api`` and the
+default model once, and every worker is forked from that server, so the
+weights are shared copy-on-write instead of loaded per process. Elsewhere
+the workers are spawned and each loads the model in its initializer.
+
+Inside a worker, ``api`` runs in thread mode with in-line PDF extraction and
+no cross-request embedding batcher: the pool itself is the parallelism.
+Each worker keeps its own in-memory caches; the on-disk reference and text
+caches are shared. Stage timings are returned with the result and merged
+into the parent's request timings and metrics. Settings changed through
+/api/configure travel with every call.
+"""
+
+import os
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Tuple, Optional, Any
+
+WORKER_ENV = "PLAGIASENSE_ANALYSIS_WORKER"
+
+
+class WorkerHTTPError(Exception):
+    """An HTTPException raised in a worker; HTTPException itself does not pickle."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(status_code, detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def configure_worker_env():
+    """Settings for the copy of ``api`` inside a worker; must run before it is imported."""
+    os.environ[WORKER_ENV] = "1"
+    os.environ["EXECUTION_MODE"] = "thread"
+    os.environ["PDF_WORKERS"] = "0"
+    os.environ["EMBED_BATCHING"] = "0"
+    os.environ["PRELOAD_MODEL"] = "0"
+
+
+def preload():
+    """Import ``api`` and load the default model (in the fork server, before any worker exists)."""
+    configure_worker_env()
+    try:
+        import api
+        api.get_model()
+    except Exception as e:
+        # Workers will retry in their initializer
+        print(f"⚠️ Analysis worker preload failed: {e}")
+
+
+def init_worker(torch_threads: int):
+    """Runs once in every worker: pin torch threads, load the model if not inherited, warm up."""
+    configure_worker_env()
+    import torch
+    torch.set_num_threads(torch_threads)
+    import api
+    # Runs the first forward pass here rather than in the fork server, so the
+    # intra-op thread pool is created per worker
+    api.warm_up_model()
+
+
+def ping() -> int:
+    return os.getpid()
+
+
+def run(fn_name: str, args: Tuple[Any, ...], kwargs: Optional[Dict[str, Any]] = None,
+        config: Optional[Dict[str, Any]] = None) -> Tuple[Any, Dict[str, Any]]:
+    """Call ``api.<fn_name>(*args, **kwargs)`` under the parent's runtime ``config``; returns the result and the worker's timings."""
+    import api
+    from metrics import RequestTimings, current_timings
+    from fastapi import HTTPException
+
+    if config is not None:
+        # Thresholds etc. set through /api/configure after this worker started
+        api.apply_runtime_config(config)
+    timings = RequestTimings()
+    token = current_timings.set(timings)
+    started = time.time()
+    try:
+        result = getattr(api, fn_name)(*args, **(kwargs or {}))
+    except HTTPException as e:
+        raise WorkerHTTPError(e.status_code, str(e.detail))
+    finally:
+        current_timings.reset(token)
+    return result, {**timings.to_dict(), "started_at": started, "pid": os.getpid()}
+
+
+def create_pool(workers: int, torch_threads: int) -> ProcessPoolExecutor:
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        ctx = multiprocessing.get_context("forkserver")
+        ctx.set_forkserver_preload([__name__])
+        # The flag makes the fork server's import of this module call preload()
+        os.environ[WORKER_ENV] = "1"
+        try:
+            from multiprocessing import forkserver
+            forkserver.ensure_running()
+        finally:
+            del os.environ[WORKER_ENV]
+    else:
+        ctx = multiprocessing.get_context("spawn")
+    return ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                               initializer=init_worker, initargs=(torch_threads,))
+
+
+if os.environ.get(WORKER_ENV) == "1" and multiprocessing.current_process().name == "MainProcess":
+    # Imported by the fork server: load once, before workers are forked
+    preload()
@@ -1,17 +1,23 @@
-import io
-import re
 import base64
+import json
 from typing import List, Tuple, Dict, Optional, Any
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
+import threading
+from concurrent.futures.process import BrokenProcessPool
+import functools
 import hashlib
+import os
+import sys
 
-from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks, Form
+from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks, Form, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse, Response
+from starlette.background import BackgroundTask
 from pydantic import BaseModel, ConfigDict
 
 # Optional ML imports with fallbacks
+# Availability checks only: extraction and model loading live in
+# pdf_extract.py and inference_backends.py
 try:
     import pdfplumber
     PDF_SUPPORT = True
@@ -22,7 +28,7 @@ except ImportError:
 try:
     import numpy as np
     import torch
-    from sentence_transformers import SentenceTransformer, util
+    import sentence_transformers
     ML_SUPPORT = True
 except ImportError:
     ML_SUPPORT = False
@@ -31,18 +37,36 @@ except ImportError:
 # Sentence splitting
 try:
     import nltk
-    from nltk.tokenize import sent_tokenize
     NLTK_SUPPORT = True
 except ImportError:
     NLTK_SUPPORT = False
     print("⚠️ NLTK not available - using basic sentence splitting")
 
+# Local modules live next to this file; make them importable both as
+# `backend.api` (Render/Railway) and `api` (local uvicorn from backend/)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from corpus_store import ReferenceStore, ReferenceEntry, ReferenceCorpus
+from similarity import create_engine, ENGINES, best_per_document, normalize_rows
+from jobs import JobStore
+from pdf_extract import PdfExtractor, PdfExtractionError
+from embedding_batcher import EmbeddingBatcher
+from embedding_cache import SentenceEmbeddingCache
+from model_registry import ModelRegistry, AVAILABLE_MODELS, resolve_model_name
+from inference_backends import BACKENDS, load_sentence_model, parity_report
+from segmentation import Segment, Segmenter, punkt_span_tokenizer
+from compact_result import build_compact_result, encode_body, pack_array
+from lexical_index import LexicalIndexCache
+from ai_statistical import score_sentences
+from ai_classifier import AIClassifier, SentenceScoreCache, AI_DETECTOR_MODELS, detector_path, is_available
+from admission import AdmissionController, Slot
+from uploads import UploadSpool, SpooledPdf, Document, document_digest
+import analysis_worker
+from metrics import registry as metrics_registry, RequestTimings, InstrumentedExecutor, current_timings, stage, record_count
+
 # Initialize FastAPI app
 app = FastAPI(title="PlagiaSense API", description="BERT-based Plagiarism Detection API", version="1.0.0")
 
 # CORS configuration
-import os
-
 # Get allowed origins from environment or use defaults
 ALLOWED_ORIGINS = os.getenv("ALLOWED_ORIGINS", "").split(",") if os.getenv("ALLOWED_ORIGINS") else [
     "http://localhost:8080", 
@@ -61,15 +85,196 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def limit_request_size(request: Request, call_next):
+    """Refuse a body over MAX_REQUEST_BYTES from its Content-Length, before any of it is read."""
+    length = request.headers.get("content-length")
+    if length and length.isdigit() and int(length) > MAX_REQUEST_BYTES:
+        return JSONResponse(
+            status_code=413,
+            content={"detail": f"Request body is larger than the {MAX_REQUEST_BYTES // (1024 * 1024)} MB limit"}
+        )
+    return await call_next(request)
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Give every request a RequestTimings and count it by route, status and latency.
+
+    For streamed responses the latency is time to the first byte.
+    """
+    import time
+    timings = RequestTimings()
+    token = current_timings.set(timings)
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        if timings.stages:
+            response.headers["Server-Timing"] = timings.server_timing()
+        return response
+    finally:
+        current_timings.reset(token)
+        route = request.scope.get("route")
+        path = getattr(route, "path", "unmatched")
+        metrics_registry.inc("plagiasense_requests_total", route=path, method=request.method, status=status)
+        metrics_registry.observe("plagiasense_request_seconds", time.perf_counter() - start, route=path)
+
 # Global variables for model and configuration
-model = None
-executor = ThreadPoolExecutor(max_workers=2)
+model_state = {"status": "not_loaded", "error": None, "load_seconds": None, "warmup_seconds": None}
+# EXECUTION_MODE=process runs each analysis in one of ANALYSIS_PROCESSES worker
+# processes (see analysis_worker.py) so pure-Python stages scale past the GIL;
+# the default "thread" runs everything in this process
+EXECUTION_MODE = os.getenv("EXECUTION_MODE", "thread")
+ANALYSIS_PROCESSES = int(os.getenv("ANALYSIS_PROCESSES", str(os.cpu_count() or 1)))
+# Torch intra-op threads per worker process, so workers don't oversubscribe the cores
+ANALYSIS_PROCESS_THREADS = int(os.getenv("ANALYSIS_PROCESS_THREADS", str(max(1, (os.cpu_count() or 1) // ANALYSIS_PROCESSES))))
+analysis_pool = None
+analysis_pool_lock = threading.Lock()
+# Both pools record queue wait and credit stage timings to the submitting request.
+# In process mode the analysis threads only wait on worker processes
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", str(ANALYSIS_PROCESSES if EXECUTION_MODE == "process" else 2)))
+executor = InstrumentedExecutor(max_workers=ANALYSIS_WORKERS, thread_name_prefix="analysis")
+# Stages fanned out from inside a request already running on `executor`
+stage_executor = InstrumentedExecutor(max_workers=2, thread_name_prefix="stage")
+
+# Admission control in front of `executor`: ADMISSION_MAX_CONCURRENT analyses
+# run, ADMISSION_MAX_QUEUE more wait (cheap AI-statistical ones first) for up to
+# ADMISSION_QUEUE_TIMEOUT seconds; beyond that requests get 429/503 + Retry-After
+admission = AdmissionController(
+    max_concurrent=int(os.getenv("ADMISSION_MAX_CONCURRENT", str(ANALYSIS_WORKERS))),
+    max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", "16")),
+    queue_timeout=float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "30"))
+)
+# Background job tasks waiting for or holding a slot
+job_tasks = set()
+
+# Sentence splitter, resolved once: NLTK punkt from NLTK_DATA_DIR (bundle or
+# pre-fetch it there to run offline; NLTK_DOWNLOAD=0 never hits the network)
+# with the regex splitter as fallback
+NLTK_DATA_DIR = os.getenv("NLTK_DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "nltk_data"))
+NLTK_DOWNLOAD = os.getenv("NLTK_DOWNLOAD", "1") != "0"
+sentence_splitter = None
+splitter_lock = threading.Lock()
+
+# Load and warm up the model at startup instead of in the first request
+PRELOAD_MODEL = os.getenv("PRELOAD_MODEL", "1") != "0"
 
 # Configuration
 RED_THRESHOLD = 0.85
 ORANGE_THRESHOLD = 0.70
 MAX_SENTENCES = 5000
 BATCH_SIZE = 32
+MODEL_NAME = resolve_model_name(os.getenv("MODEL_NAME", "all-MiniLM-L6-v2"))  # default for /api/analyze
+
+# Persistent cache of reference embeddings, keyed by PDF SHA-256 + model name
+CACHE_DIR = os.getenv("PLAGIASENSE_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache"))
+REFERENCE_CACHE_ENABLED = os.getenv("REFERENCE_CACHE_ENABLED", "1") != "0"
+reference_store = ReferenceStore(os.path.join(CACHE_DIR, "references"))
+
+# PDF text extraction: page ranges run in a process pool (PDF_WORKERS=0 extracts
+# in-thread); text is cached by PDF hash in memory and under CACHE_DIR
+pdf_extractor = PdfExtractor(
+    workers=int(os.getenv("PDF_WORKERS", str(min(4, os.cpu_count() or 1)))),
+    pages_per_task=int(os.getenv("PDF_PAGES_PER_TASK", "8")),
+    max_pages=int(os.getenv("PDF_MAX_PAGES", "1000")),
+    timeout=float(os.getenv("PDF_TIMEOUT_SECONDS", "120")),
+    cache_dir=os.path.join(CACHE_DIR, "text"),
+    memory_budget=int(os.getenv("PDF_TEXT_CACHE_MB", "64")) * 1024 * 1024
+)
+
+# Uploads are spooled to temp files (UPLOAD_TMP_DIR, default the system temp
+# dir) in chunks and hashed on the way; a file over MAX_UPLOAD_MB or a request
+# over MAX_REQUEST_MB is refused with 413 instead of being read into memory
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_MB", "50")) * 1024 * 1024
+MAX_REQUEST_BYTES = int(os.getenv("MAX_REQUEST_MB", "200")) * 1024 * 1024
+UPLOAD_TMP_DIR = os.getenv("UPLOAD_TMP_DIR") or None
+
+# Nearest-reference search: "exact" (blocked brute force) or "ivf" (approximate index).
+# Peak similarity memory is SIMILARITY_QUERY_BLOCK x SIMILARITY_BLOCK_SIZE floats.
+SIMILARITY_ENGINE = os.getenv("SIMILARITY_ENGINE", "exact")
+SIMILARITY_BLOCK_SIZE = int(os.getenv("SIMILARITY_BLOCK_SIZE", "4096"))
+SIMILARITY_QUERY_BLOCK = int(os.getenv("SIMILARITY_QUERY_BLOCK", "1024"))
+# Student sentences per streamed record (stream=ndjson/sse); much smaller than
+# SIMILARITY_QUERY_BLOCK so typical documents arrive in several records
+STREAM_BLOCK_SIZE = int(os.getenv("STREAM_BLOCK_SIZE", "64"))
+TOP_K_MATCHES = int(os.getenv("TOP_K_MATCHES", "3"))  # best match + alternatives per sentence
+
+def make_similarity_engine():
+    return create_engine(SIMILARITY_ENGINE, block_size=SIMILARITY_BLOCK_SIZE, query_block_size=SIMILARITY_QUERY_BLOCK)
+
+similarity_engine = make_similarity_engine()
+
+# Lexical pre-filter: sentences matching a reference sentence verbatim (after
+# normalisation) are not embedded at all; MinHash-LSH candidates with estimated
+# Jaccard >= LEXICAL_THRESHOLD are scored against those candidates only, and
+# fall back to the full search unless that confirms a red-level match
+LEXICAL_PREFILTER = os.getenv("LEXICAL_PREFILTER", "1") != "0"
+LEXICAL_THRESHOLD = float(os.getenv("LEXICAL_THRESHOLD", "0.5"))
+lexical_indexes = LexicalIndexCache(
+    num_perm=int(os.getenv("LEXICAL_NUM_PERM", "64")),
+    bands=int(os.getenv("LEXICAL_BANDS", "16"))
+)
+MATCH_TYPES = ("semantic", "near_exact", "exact")
+
+# Cross-request embedding scheduler: concurrent requests share length-bucketed
+# batches of up to EMBED_MAX_BATCH sentences, collected for at most EMBED_MAX_WAIT_MS.
+# A caller waits at most EMBED_TIMEOUT_SECONDS for its embeddings
+EMBED_BATCHING_ENABLED = os.getenv("EMBED_BATCHING", "1") != "0"
+embedding_batcher = EmbeddingBatcher(
+    max_batch_size=int(os.getenv("EMBED_MAX_BATCH", "64")),
+    max_wait=float(os.getenv("EMBED_MAX_WAIT_MS", "5")) / 1000,
+    timeout=float(os.getenv("EMBED_TIMEOUT_SECONDS", "300"))
+)
+
+# Sentence -> embedding cache in front of model.encode: an in-memory LRU of
+# SENTENCE_CACHE_MB, optionally backed by a memory-mapped table of
+# SENTENCE_CACHE_DISK_ROWS rows per model under CACHE_DIR
+SENTENCE_CACHE_ENABLED = os.getenv("SENTENCE_CACHE", "1") != "0"
+sentence_cache = SentenceEmbeddingCache(
+    budget_bytes=int(os.getenv("SENTENCE_CACHE_MB", "128")) * 1024 * 1024,
+    disk_dir=os.path.join(CACHE_DIR, "sentences"),
+    disk_rows=int(os.getenv("SENTENCE_CACHE_DISK_ROWS", "0"))
+)
+
+# Embedding inference backend: "torch" (fp32), "int8" (dynamic quantization)
+# or "onnx" (onnxruntime); BACKEND_PARITY_CHECK=1 compares it with fp32 at startup
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "torch")
+if EMBED_BACKEND not in BACKENDS:
+    raise ValueError(f"EMBED_BACKEND must be one of: {', '.join(BACKENDS)}")
+ONNX_FILE_NAME = os.getenv("ONNX_FILE_NAME") or None  # e.g. onnx/model_qint8_avx2.onnx
+BACKEND_PARITY_CHECK = os.getenv("BACKEND_PARITY_CHECK", "0") == "1"
+
+# Loaded Sentence-BERT models, evicted least-recently-used beyond MODEL_MEMORY_MB
+model_registry = ModelRegistry(
+    loader=lambda name: load_model_sync(name),
+    budget_bytes=int(os.getenv("MODEL_MEMORY_MB", "1500")) * 1024 * 1024
+)
+
+# Pretrained AI detectors, loaded only from AI_DETECTOR_DIR/<model_choice>/ (no
+# downloads); int8-quantized on CPU unless AI_DETECTOR_INT8=0, kept in an LRU of
+# AI_DETECTOR_MEMORY_MB, with per-sentence scores cached by hash
+AI_DETECTOR_DIR = os.getenv("AI_DETECTOR_DIR", os.path.join(CACHE_DIR, "ai-detectors"))
+AI_DETECTOR_INT8 = os.getenv("AI_DETECTOR_INT8", "1") != "0"
+AI_DETECTOR_BATCH = int(os.getenv("AI_DETECTOR_BATCH", "32"))
+
+def load_ai_classifier(model_choice: str) -> AIClassifier:
+    device = 'cuda' if torch.cuda.is_available() else 'cpu'
+    print(f"🔍 Loading AI detector {model_choice} from {AI_DETECTOR_DIR} on {device}")
+    metrics_registry.inc("plagiasense_model_loads_total", model=model_choice, backend="ai-detector")
+    with stage("model_load"):
+        return AIClassifier(model_choice, detector_path(AI_DETECTOR_DIR, model_choice), device=device,
+                            quantize=AI_DETECTOR_INT8, batch_size=AI_DETECTOR_BATCH)
+
+ai_classifiers = ModelRegistry(
+    loader=load_ai_classifier,
+    budget_bytes=int(os.getenv("AI_DETECTOR_MEMORY_MB", "1024")) * 1024 * 1024
+)
+ai_score_cache = SentenceScoreCache(max_entries=int(os.getenv("AI_SCORE_CACHE_SIZE", "100000")))
+
+# Background jobs for long analyses; finished jobs are kept for JOB_TTL_SECONDS
+JOB_TTL_SECONDS = float(os.getenv("JOB_TTL_SECONDS", "3600"))
+job_store = JobStore(ttl_seconds=JOB_TTL_SECONDS)
 
 # Response models
 class AnalysisResult(BaseModel):
@@ -80,6 +285,8 @@ class AnalysisResult(BaseModel):
     flagged_sentences: List[Dict[str, Any]]
     highlighted_fragments: List[str]
     processing_time: float
+    # Per-stage breakdown, only when the request asked for timings
+    timings: Optional[Dict[str, Any]] = None
 
 class HealthResponse(BaseModel):
     status: str
@@ -111,8 +318,11 @@ class AIDetectionResult(BaseModel):
     optimized: Optional[bool] = None
     device: Optional[str] = None
     total_sentences_analyzed: int
+    # Document-level statistics behind the statistical engine's scores
+    features: Optional[Dict[str, float]] = None
     processing_time: float
     error: Optional[str] = None
+    timings: Optional[Dict[str, Any]] = None
 
 class AIAnalysisRequest(BaseModel):
     method: str = "pretrained"  # pretrained, gptzero_api, custom_api, statistical
@@ -121,119 +331,152 @@ class AIAnalysisRequest(BaseModel):
     api_url: Optional[str] = None
 
 # Utility functions (adapted from Streamlit version)
-def load_model_sync(model_name: str = "sentence-transformers/all-MiniLM-L6-v2"):
+def load_model_sync(model_name: str = MODEL_NAME, backend: Optional[str] = None):
     """Load Sentence-BERT model."""
     device = 'cuda' if torch.cuda.is_available() else 'cpu'
-    return SentenceTransformer(model_name, device=device)
+    metrics_registry.inc("plagiasense_model_loads_total", model=model_name, backend=backend or EMBED_BACKEND)
+    with stage("model_load"):
+        return load_sentence_model(model_name, backend or EMBED_BACKEND, device, ONNX_FILE_NAME)
+
+def embedding_space(model_name: str) -> str:
+    """Cache namespace for a model's vectors; reduced-precision backends get their own."""
+    return model_name if EMBED_BACKEND == "torch" else f"{model_name}@{EMBED_BACKEND}"
+
+def reference_space(space: str) -> str:
+    """Store namespace for reference documents: their sentences also depend on the splitter."""
+    return f"{space}+{get_sentence_splitter().name}"
 
-def read_pdf_bytes(file_bytes: bytes) -> str:
-    """Extract text from PDF bytes."""
+def check_backend_parity(model_name: str = MODEL_NAME) -> Dict[str, Any]:
+    """Score fixed sentence pairs with the fp32 model and the configured backend."""
+    reference = load_model_sync(model_name, backend="torch")
+    report = parity_report(reference, get_model(model_name), RED_THRESHOLD, ORANGE_THRESHOLD)
+    return {"model": model_name, "backend": EMBED_BACKEND, **report}
+
+def get_model(model_name: str = MODEL_NAME):
+    """Return a model from the registry, loading it exactly once even under concurrent first requests."""
+    if model_name != MODEL_NAME or model_registry.is_loaded(MODEL_NAME):
+        return model_registry.get(model_name)
+    import time
+    if model_state["status"] in ("not_loaded", "failed"):
+        model_state["status"] = "loading"
+    start = time.time()
     try:
-        with pdfplumber.open(io.BytesIO(file_bytes)) as pdf:
-            texts = []
-            for i, page in enumerate(pdf.pages):
-                try:
-                    t = page.extract_text() or ""
-                    # Normalize whitespace and clean up common PDF artifacts
-                    t = re.sub(r"[ \t]+", " ", t)
-                    t = re.sub(r"-\n", "", t)  # Remove hyphenation at line breaks
-                    t = re.sub(r"\n+", "\n", t)  # Normalize line breaks
-                    texts.append(t)
-                except Exception as e:
-                    print(f"Error extracting text from page {i+1}: {e}")
-                    continue
-                    
-        doc_text = "\n".join(texts)
-        # Basic cleanup: remove multiple blank lines
-        doc_text = re.sub(r"\n{3,}", "\n\n", doc_text).strip()
-        return doc_text
+        loaded = model_registry.get(MODEL_NAME)
+    except Exception as e:
+        model_state["status"] = "failed"
+        model_state["error"] = str(e)
+        raise
+    if model_state["status"] == "loading":
+        model_state["load_seconds"] = time.time() - start
+        model_state["status"] = "loaded"
+        model_state["error"] = None
+    return loaded
+
+def warm_up_model():
+    """Load the model and run one small encode so the first request pays no setup cost."""
+    import time
+    try:
+        loaded = get_model()
+        model_state["status"] = "warming_up"
+        start = time.time()
+        # Bypass the caches: the point is to exercise the forward pass
+        emb = loaded.encode(["Warm-up sentence for the model.", "A second, slightly longer warm-up sentence."],
+                            convert_to_numpy=True, show_progress_bar=False)
+        similarity_engine.search(emb, emb, k=1)
+        model_state["warmup_seconds"] = time.time() - start
+        if BACKEND_PARITY_CHECK and EMBED_BACKEND != "torch":
+            model_state["parity"] = check_backend_parity()
+            print(f"🔬 {EMBED_BACKEND} vs fp32 parity: {model_state['parity']}")
+        model_state["status"] = "ready"
+        print(f"✅ Model ready (load {model_state['load_seconds']:.1f}s, warm-up {model_state['warmup_seconds']:.2f}s)")
     except Exception as e:
+        model_state["status"] = "failed"
+        model_state["error"] = str(e)
+        print(f"⚠️ Model warm-up failed: {e}")
+
+def read_pdfs(docs: List[Document], digests: Optional[List[str]] = None, progress=None) -> List[str]:
+    """Extract text from several PDFs in parallel, reusing cached text."""
+    try:
+        with stage("extracting"):
+            return pdf_extractor.extract_many(docs, digests, progress)
+    except PdfExtractionError as e:
         raise HTTPException(status_code=400, detail=f"Failed to read PDF: {e}")
 
+def read_pdf_bytes(doc: Document) -> str:
+    """Extract text from a PDF (bytes or a spooled upload)."""
+    return read_pdfs([doc])[0]
+
+def nltk_punkt_available() -> bool:
+    """Check, without touching the network, that the installed NLTK can build its punkt tokenizer.
+
+    Only loading it tells: NLTK >= 3.8.2 needs punkt_tab and ignores a legacy
+    punkt download, older versions need the punkt pickle.
+    """
+    try:
+        punkt_span_tokenizer()
+        return True
+    except Exception:
+        return False
+
 def download_nltk_data():
-    """Download NLTK data if not available."""
+    """Download NLTK data into NLTK_DATA_DIR if not available."""
     try:
         # Try the new punkt_tab first (NLTK 3.8+)
-        nltk.download("punkt_tab", quiet=True)
-    except:
+        if nltk.download("punkt_tab", download_dir=NLTK_DATA_DIR, quiet=True):
+            return
+    except Exception:
+        pass
+    try:
+        # Fallback to old punkt tokenizer
+        nltk.download("punkt", download_dir=NLTK_DATA_DIR, quiet=True)
+    except Exception:
+        print("Failed to download NLTK tokenizer")
+
+def resolve_sentence_splitter() -> Segmenter:
+    """Pick NLTK punkt if its data is present (bundled, pre-fetched or downloaded once), else regex."""
+    if NLTK_SUPPORT:
+        if NLTK_DATA_DIR not in nltk.data.path:
+            nltk.data.path.insert(0, NLTK_DATA_DIR)
+        if not nltk_punkt_available() and NLTK_DOWNLOAD:
+            download_nltk_data()
         try:
-            # Fallback to old punkt tokenizer
-            nltk.download("punkt", quiet=True)
-        except:
-            print("Failed to download NLTK tokenizer")
-
-def split_sentences_alternative(text: str) -> List[str]:
-    """Alternative sentence splitting without NLTK dependency."""
-    # Improved reference section removal
-    patterns = [
-        r"\n\s*(references|bibliography|works cited|citations?)\s*\n",
-        r"\n\s*(appendix|appendices)\s*[a-z]?\s*\n"
-    ]
-    
-    for pattern in patterns:
-        split = re.split(pattern, text, flags=re.IGNORECASE, maxsplit=1)
-        if len(split) > 1:
-            text = split[0]
-            break
-    
-    # Basic sentence splitting using regex
-    sentences = re.split(r'(?<=[.!?])\s+(?=[A-Z])', text)
-    
-    # Filter and clean sentences
-    sents = []
-    for s in sentences:
-        s = s.strip()
-        # Skip very short sentences and number-only sentences
-        if len(s) > 20 and not re.match(r'^[\d\s\.\-]+$', s):
-            # Remove extra whitespace
-            s = re.sub(r'\s+', ' ', s)
-            sents.append(s)
-    
-    if len(sents) > MAX_SENTENCES:
-        sents = sents[:MAX_SENTENCES]
-    
-    return sents
-
-def split_sentences_nltk(text: str) -> List[str]:
-    """NLTK-based sentence splitting."""
-    # Improved reference section removal
-    patterns = [
-        r"\n\s*(references|bibliography|works cited|citations?)\s*\n",
-        r"\n\s*(appendix|appendices)\s*[a-z]?\s*\n"
-    ]
-    
-    for pattern in patterns:
-        split = re.split(pattern, text, flags=re.IGNORECASE, maxsplit=1)
-        if len(split) > 1:
-            text = split[0]
-            break
+            # Test if tokenizer works
+            span_tokenize = punkt_span_tokenizer()
+            if len(list(span_tokenize("Test sentence. Another sentence."))) >= 2:  # If NLTK works properly
+                return Segmenter(span_tokenize, name="nltk")
+        except Exception as e:
+            print(f"NLTK tokenizer unavailable ({type(e).__name__}). Using alternative sentence splitting.")
     
-    # Filter out very short sentences and clean up
-    sents = []
-    for s in sent_tokenize(text):
-        s = s.strip()
-        # Skip very short sentences (likely artifacts)
-        if len(s) > 20 and not re.match(r'^[\d\s\.\-]+$', s):
-            sents.append(s)
-    
-    if len(sents) > MAX_SENTENCES:
-        sents = sents[:MAX_SENTENCES]
-    
-    return sents
+    # Fall back to regex-based splitting
+    return Segmenter()
+
+def get_sentence_splitter() -> Segmenter:
+    """Resolve the sentence splitter once per process and reuse it for every document."""
+    global sentence_splitter
+    if sentence_splitter is None:
+        with splitter_lock:
+            if sentence_splitter is None:
+                sentence_splitter = resolve_sentence_splitter()
+                print(f"✂️ Sentence splitter: {'nltk punkt' if sentence_splitter.name == 'nltk' else 'regex'}")
+    return sentence_splitter
+
+def segment_text(text: str) -> List[Segment]:
+    """Sentences of the document body with their character offsets into ``text``."""
+    splitter = get_sentence_splitter()
+    with stage("splitting"):
+        return splitter.segment(text, MAX_SENTENCES)
 
 def split_sentences(text: str) -> List[str]:
     """Split into sentences with NLTK fallback to regex-based splitting."""
-    try:
-        download_nltk_data()
-        # Test if tokenizer works
-        test_result = sent_tokenize("Test sentence. Another sentence.")
-        if len(test_result) >= 2:  # If NLTK works properly
-            return split_sentences_nltk(text)
-    except Exception as e:
-        print(f"NLTK tokenizer failed: {e}. Using alternative sentence splitting.")
-    
-    # Fall back to regex-based splitting
-    return split_sentences_alternative(text)
+    splitter = get_sentence_splitter()
+    with stage("splitting"):
+        return splitter.split(text, MAX_SENTENCES)
+
+def split_sentences_batch(texts: List[str]) -> List[List[str]]:
+    """Split several documents with one splitter lookup."""
+    splitter = get_sentence_splitter()
+    with stage("splitting"):
+        return [splitter.split(t, MAX_SENTENCES) for t in texts]
 
 def color_for_score(score: float) -> str:
     if score >= RED_THRESHOLD:
@@ -242,219 +485,970 @@ def color_for_score(score: float) -> str:
         return "rgba(255,165,0,0.28)"     # orange
     return "transparent"
 
+def escape_html(text: str) -> str:
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
 def make_highlight_html(sent: str, score: float, src_doc_name: str, src_snippet: str) -> str:
     bg = color_for_score(score)
     tooltip = (
         f"Similarity: {score:.2f} | Source: {src_doc_name or '—'}"
         + (f" | Match: {src_snippet}" if src_snippet else "")
     )
-    safe_sent = (
-        sent.replace("&", "&amp;")
-            .replace("<", "&lt;")
-            .replace(">", "&gt;")
-    )
-    safe_tooltip = (
-        tooltip.replace("&", "&amp;")
-               .replace("<", "&lt;")
-               .replace(">", "&gt;")
-    )
-    return f"<span title='{safe_tooltip}' style='background-color:{bg}; padding:2px; border-radius:4px;'>{safe_sent}</span>"
+    return f"<span title='{escape_html(tooltip)}' style='background-color:{bg}; padding:2px; border-radius:4px;'>{escape_html(sent)}</span>"
 
-def encode_sentences_efficiently(model, sentences: List[str]) -> torch.Tensor:
-    """Encode sentences in batches for better memory management."""
+def render_highlights(texts: List[str], scores: np.ndarray, ref_rows: np.ndarray,
+                      ref_sents: List[str], ref_doc_names: Dict[int, str]) -> List[str]:
+    """make_highlight_html for many sentences at once.
+
+    ``ref_doc_names`` maps each reference sentence in ``ref_rows`` to its
+    document. Colours come from array masks, and the escaped source/match part
+    of the tooltip is built once per distinct reference sentence rather than
+    once per student sentence.
+    """
+    colors = np.where(scores >= RED_THRESHOLD, 0, np.where(scores >= ORANGE_THRESHOLD, 1, 2))
+    palette = [color_for_score(RED_THRESHOLD), color_for_score(ORANGE_THRESHOLD), "transparent"]
+    tails: Dict[int, str] = {}
+    fragments = []
+    for text, score, color, row in zip(texts, scores.tolist(), colors.tolist(), ref_rows.tolist()):
+        tail = tails.get(row)
+        if tail is None:
+            snippet = ref_sents[row]
+            tail = tails[row] = escape_html(
+                f" | Source: {ref_doc_names[row] or '—'}" + (f" | Match: {snippet}" if snippet else "")
+            )
+        fragments.append(
+            f"<span title='Similarity: {score:.2f}{tail}' style='background-color:{palette[color]}; "
+            f"padding:2px; border-radius:4px;'>{escape_html(text)}</span>"
+        )
+    return fragments
+
+def no_progress(stage: str, current: int = 0, total: int = 0):
+    """Default progress hook for synchronous requests."""
+    pass
+
+def encode_sentences_efficiently(model, sentences: List[str], progress=no_progress,
+                                 space: Optional[str] = None) -> torch.Tensor:
+    """Encode sentences, embedding only those missing from the sentence cache."""
+    with stage("encoding"):
+        return encode_cached(model, sentences, progress, space)
+
+def encode_cached(model, sentences: List[str], progress=no_progress, space: Optional[str] = None) -> torch.Tensor:
+    dim = model.get_sentence_embedding_dimension()
     if not sentences:
-        return torch.empty(0, model.get_sentence_embedding_dimension())
+        return torch.empty(0, dim)
+    if not SENTENCE_CACHE_ENABLED:
+        return encode_uncached(model, sentences, progress)
+    
+    # Keyed by model and backend so switching models never mixes vector spaces
+    space = space or embedding_space(MODEL_NAME)
+    rows, keys = sentence_cache.lookup(space, sentences, dim)
+    # Repeated boilerplate inside one document is encoded once as well
+    todo: Dict[bytes, List[int]] = {}
+    for i, row in enumerate(rows):
+        if row is None:
+            todo.setdefault(keys[i], []).append(i)
+    
+    record_count("sentence_cache_hits", len(sentences) - sum(len(v) for v in todo.values()))
+    record_count("sentences_encoded", len(todo))
+    out = np.empty((len(sentences), dim), dtype=np.float32)
+    for i, row in enumerate(rows):
+        if row is not None:
+            out[i] = row
+    if todo:
+        miss_keys = list(todo)
+        miss_emb = encode_uncached(model, [sentences[todo[k][0]] for k in miss_keys], progress).cpu().numpy()
+        sentence_cache.store(space, miss_keys, miss_emb)
+        for key, row in zip(miss_keys, miss_emb):
+            out[todo[key]] = row
+    else:
+        progress("encoding", 1, 1)
+    return torch.from_numpy(out)
+
+def encode_uncached(model, sentences: List[str], progress=no_progress) -> torch.Tensor:
+    """Encode sentences in batches for better memory management."""
+    import time
+    n_batches = (len(sentences) + BATCH_SIZE - 1) // BATCH_SIZE
+    if EMBED_BATCHING_ENABLED:
+        # Shared scheduler: batches are coalesced with concurrent requests
+        emb = embedding_batcher.encode(
+            model, sentences,
+            lambda done, total: progress("encoding", done // BATCH_SIZE, n_batches)
+        )
+        progress("encoding", n_batches, n_batches)
+        return torch.from_numpy(emb)
     
     embeddings = []
     for i in range(0, len(sentences), BATCH_SIZE):
+        progress("encoding", i // BATCH_SIZE, n_batches)
         batch = sentences[i:i + BATCH_SIZE]
+        batch_start = time.perf_counter()
         batch_emb = model.encode(batch, convert_to_tensor=True, show_progress_bar=False)
+        metrics_registry.observe("plagiasense_embedding_batch_seconds", time.perf_counter() - batch_start)
+        metrics_registry.inc("plagiasense_embedding_batch_sentences_total", len(batch))
         embeddings.append(batch_emb)
+    progress("encoding", n_batches, n_batches)
     
     return torch.cat(embeddings, dim=0)
 
-def process_plagiarism_detection(main_bytes: bytes, ref_bytes_list: List[bytes], ref_names: List[str]) -> Dict[str, Any]:
-    """Process plagiarism detection in a separate thread."""
+def lookup_reference(digest: str, space: str) -> Optional[ReferenceEntry]:
+    """Fetch a reference document's sentences and embeddings from the store (``space`` from reference_space)."""
+    if not REFERENCE_CACHE_ENABLED:
+        return None
+    return reference_store.get(digest, space, MAX_SENTENCES)
+
+def save_reference(digest: str, space: str, sents: List[str], emb) -> ReferenceEntry:
+    if not REFERENCE_CACHE_ENABLED:
+        return ReferenceEntry(digest, sents, emb)
+    return reference_store.put(digest, space, MAX_SENTENCES, sents, emb)
+
+def prepare_plagiarism_detection(main_bytes: Document, ref_bytes_list: List[Document], ref_names: List[str],
+                                 model_name: str = MODEL_NAME, progress=no_progress,
+                                 on_segmented=None) -> Dict[str, Any]:
+    """Extract, split and encode the documents; everything scoring needs, before any sentence is scored.
+
+    ``on_segmented(main_text, main_sentences)`` runs as soon as the student
+    document is split, so other stages can start before encoding.
+    """
     import time
     start_time = time.time()
     
-    global model
-    if model is None:
-        model = load_model_sync()
+    model = get_model(model_name)
     
-    # Read PDFs
-    main_text = read_pdf_bytes(main_bytes)
-    ref_texts = [read_pdf_bytes(ref_bytes) for ref_bytes in ref_bytes_list]
+    # References already in the embedding store skip extraction and encoding
+    digests = [document_digest(ref_bytes) for ref_bytes in ref_bytes_list]
+    space = embedding_space(model_name)
+    ref_space = reference_space(space)
+    entries = [lookup_reference(digest, ref_space) for digest in digests]
+    missing = [doc_i for doc_i, entry in enumerate(entries) if entry is None]
+    record_count("reference_cache_hits", len(entries) - len(missing))
+
+    # Read the student PDF and uncached references in parallel
+    n_docs = 1 + len(missing)
+    progress("extracting", 0, n_docs)
+    main_text, *new_texts = read_pdfs(
+        [main_bytes] + [ref_bytes_list[doc_i] for doc_i in missing],
+        [document_digest(main_bytes)] + [digests[doc_i] for doc_i in missing],
+        lambda done, total: progress("extracting", done, n_docs)
+    )
     
     # Split to sentences
-    main_sents = split_sentences(main_text)
-    ref_sents = []
-    ref_idx = []  # track which reference doc each sentence came from
-    for doc_i, t in enumerate(ref_texts):
-        sents = split_sentences(t)
-        ref_sents.extend(sents)
-        ref_idx.extend([doc_i] * len(sents))
+    progress("splitting", 0, n_docs)
+    main_segments = segment_text(main_text)
+    main_sents = [seg.text for seg in main_segments]
+    new_sents = split_sentences_batch(new_texts)
+    progress("splitting", n_docs, n_docs)
 
     if not main_sents:
         raise HTTPException(status_code=400, detail="Couldn't extract sentences from the student document.")
-    if not ref_sents:
+    if on_segmented is not None:
+        on_segmented(main_text, main_sents)
+
+    # Verbatim copies are resolved lexically and never reach the encoder
+    exact = [[] for _ in main_sents]
+    lexical = None
+    if LEXICAL_PREFILTER:
+        with stage("prefilter"):
+            doc_sents = [entries[doc_i].sentences if entries[doc_i] is not None else None for doc_i in range(len(entries))]
+            for doc_i, sents in zip(missing, new_sents):
+                doc_sents[doc_i] = sents
+            lexical_key = hashlib.sha256("\n".join(
+                [get_sentence_splitter().name] + [f"{digest}:{len(sents)}" for digest, sents in zip(digests, doc_sents)]
+            ).encode("utf-8")).hexdigest()
+            lexical = lexical_indexes.get(lexical_key, lambda: [s for sents in doc_sents for s in sents])
+            exact = lexical.exact_matches(main_sents)
+    to_encode = [i for i, rows in enumerate(exact) if not rows]
+    emb_rows = np.full(len(main_sents), -1, dtype=np.int64)
+    emb_rows[to_encode] = np.arange(len(to_encode))
+    candidates = None
+    if lexical is not None:
+        with stage("prefilter"):
+            candidates = lexical.candidates([main_sents[i] for i in to_encode], LEXICAL_THRESHOLD)
+    record_count("exact_matches", len(main_sents) - len(to_encode))
+
+    # Encode the student document and any new references in one batched pass
+    all_sents = [main_sents[i] for i in to_encode] + [s for sents in new_sents for s in sents]
+    all_emb = encode_sentences_efficiently(model, all_sents, progress, space).cpu().numpy()
+    main_emb = all_emb[:len(to_encode)]
+    pos = len(to_encode)
+    for doc_i, sents in zip(missing, new_sents):
+        entries[doc_i] = save_reference(digests[doc_i], ref_space, sents, all_emb[pos:pos + len(sents)])
+        pos += len(sents)
+
+    corpus = ReferenceCorpus(entries, model.get_sentence_embedding_dimension(), ref_space)
+    if not corpus.sentences:
         raise HTTPException(status_code=400, detail="Couldn't extract sentences from the reference documents.")
 
-    # Embeddings with efficient batching
-    main_emb = encode_sentences_efficiently(model, main_sents)
-    ref_emb = encode_sentences_efficiently(model, ref_sents)
+    return {
+        "start_time": start_time,
+        "main_text": main_text,
+        "main_segments": main_segments,
+        "main_emb": main_emb,
+        "emb_rows": emb_rows,
+        "exact": exact,
+        "candidates": candidates,
+        "corpus": corpus,
+        "ref_names": ref_names,
+    }
+
+def search_sentences(prepared: Dict[str, Any], start: int, end: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Top-k reference matches of student sentences [start, end), plus how each was matched (MATCH_TYPES code)."""
+    with stage("similarity"):
+        return search_block(prepared, start, end)
 
-    # Similarities
-    sim = util.cos_sim(main_emb, ref_emb)  # shape: [len(main_sents), len(ref_sents)]
-    best_scores = sim.max(dim=1).values.cpu().numpy()  # [N_main]
-    best_idx = sim.argmax(dim=1).cpu().numpy()         # indices into ref_sents
+def search_block(prepared: Dict[str, Any], start: int, end: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    corpus = prepared["corpus"]
+    k = TOP_K_MATCHES
+    n = end - start
+    top_scores = np.full((n, k), -np.inf, dtype=np.float32)
+    top_idx = np.zeros((n, k), dtype=np.int64)
+    match_type = np.zeros(n, dtype=np.int8)
+    full_search = []
+
+    for j in range(n):
+        i = start + j
+        rows = prepared["exact"][i]
+        if rows:
+            # Verbatim copy; further identical reference sentences are the alternatives
+            top_scores[j, :min(k, len(rows))] = 1.0
+            top_idx[j, :min(k, len(rows))] = rows[:k]
+            match_type[j] = 2
+            continue
+        row = prepared["emb_rows"][i]
+        if prepared["candidates"] is not None:
+            cand, _ = prepared["candidates"][row]
+            if len(cand):
+                scores = normalize_rows(prepared["main_emb"][row:row + 1]) @ normalize_rows(corpus.rows(cand)).T
+                order = np.argsort(-scores[0], kind="stable")[:k]
+                # Only a confirmed copy skips the full search
+                if scores[0, order[0]] >= RED_THRESHOLD:
+                    top_scores[j, :len(order)] = scores[0, order]
+                    top_idx[j, :len(order)] = cand[order]
+                    match_type[j] = 1
+                    continue
+        full_search.append(j)
 
-    # Build highlights and score
-    highlighted_fragments = []
+    if full_search:
+        # Similarities without materialising the full [N_main, N_ref] matrix
+        rows = prepared["emb_rows"][start + np.asarray(full_search)]
+        scores, idx = similarity_engine.search(prepared["main_emb"][rows], lambda: corpus.embeddings, k=k, key=corpus.key)
+        top_scores[full_search] = scores
+        top_idx[full_search] = idx
+    return top_scores, top_idx, match_type
+
+def assemble_matches(prepared: Dict[str, Any], start: int, top_scores: np.ndarray, top_idx: np.ndarray,
+                     match_type: np.ndarray, by_score: bool = False) -> Dict[str, Any]:
+    """Counts and flagged sentences for student sentences [start, start + len(top_scores)).
+
+    Thresholds, counts, reference lookups and ordering are array operations;
+    dicts are only built for flagged sentences. With ``by_score`` they come
+    highest score first (ties in sentence order), otherwise in sentence order.
+    """
+    main_segments = prepared["main_segments"]
+    corpus = prepared["corpus"]
+    ref_names = prepared["ref_names"]
+    ref_sents = corpus.sentences
+
+    best = top_scores[:, 0]
+    red_count = int(np.count_nonzero(best >= RED_THRESHOLD))
+    flagged = np.flatnonzero(best >= ORANGE_THRESHOLD)
+    if by_score:
+        flagged = flagged[np.argsort(-best[flagged], kind="stable")]
+
+    # Gather everything the flagged rows need, then leave NumPy once
+    scores = top_scores[flagged]
+    refs = top_idx[flagged]
+    docs = corpus.doc_index[refs]
+    alternatives = scores[:, 1:] >= ORANGE_THRESHOLD
     flagged_sentences = []
+    for j, row_scores, row_refs, row_docs, row_alts, kind in zip(
+        flagged.tolist(), scores.tolist(), refs.tolist(), docs.tolist(), alternatives.tolist(), match_type[flagged].tolist()
+    ):
+        seg = main_segments[start + j]
+        score = row_scores[0]
+        flagged_sentences.append({
+            "student_sentence": seg.text,
+            "score": score,
+            "reference_document": ref_names[row_docs[0]],
+            "reference_sentence": ref_sents[row_refs[0]],
+            "sentence_index": start + j,
+            # Where the sentence sits in the extracted student text
+            "char_start": seg.start,
+            "char_end": seg.end,
+            "risk_level": "HIGH" if score >= RED_THRESHOLD else "MEDIUM",
+            "match_type": MATCH_TYPES[kind],
+            # Other reference sentences (often other docs) sharing the passage
+            "alternative_matches": [
+                {
+                    "score": row_scores[m],
+                    "reference_document": ref_names[row_docs[m]],
+                    "reference_sentence": ref_sents[row_refs[m]]
+                }
+                for m in range(1, len(row_scores))
+                if row_alts[m - 1]
+            ]
+        })
 
-    red_count = 0
-    orange_count = 0
-    for i, sent in enumerate(main_sents):
-        score = float(best_scores[i])
-        ref_sent = ref_sents[int(best_idx[i])]
-        ref_doc_name = ref_names[int(ref_idx[int(best_idx[i])])]
-        
-        if score >= RED_THRESHOLD:
-            red_count += 1
-        elif score >= ORANGE_THRESHOLD:
-            orange_count += 1
+    return {
+        "red_count": red_count,
+        "orange_count": len(flagged) - red_count,
+        "flagged_sentences": flagged_sentences,
+    }
+
+def block_highlights(prepared: Dict[str, Any], start: int, top_scores: np.ndarray, top_idx: np.ndarray) -> List[str]:
+    """Highlighted HTML for student sentences [start, start + len(top_scores))."""
+    corpus = prepared["corpus"]
+    ref_rows = top_idx[:, 0]
+    # Document name per reference sentence, only for the rows actually used
+    used = np.unique(ref_rows)
+    doc_names = dict(zip(used.tolist(), (prepared["ref_names"][d] for d in corpus.doc_index[used].tolist())))
+    return render_highlights(
+        [seg.text for seg in prepared["main_segments"][start:start + len(top_scores)]],
+        top_scores[:, 0], ref_rows, corpus.sentences, doc_names
+    )
+
+def score_plagiarism_blocks(prepared: Dict[str, Any], block_size: int = STREAM_BLOCK_SIZE,
+                            highlights: bool = True):
+    """Score the student sentences a block at a time, yielding each block's highlights and flags."""
+    main_segments = prepared["main_segments"]
+
+    for block_start in range(0, len(main_segments), block_size):
+        block_end = min(block_start + block_size, len(main_segments))
 
-        highlighted_fragments.append(
-            make_highlight_html(sent, score, ref_doc_name, ref_sent)
+        top_scores, top_idx, match_type = search_sentences(prepared, block_start, block_end)
+
+        with stage("highlighting"):
+            block = assemble_matches(prepared, block_start, top_scores, top_idx, match_type)
+            fragments = block_highlights(prepared, block_start, top_scores, top_idx) if highlights else []
+
+        yield {
+            "start": block_start,
+            "end": block_end,
+            **block,
+            "highlighted_fragments": fragments,
+        }
+
+def plagiarism_summary(prepared: Dict[str, Any], red_count: int, orange_count: int) -> Dict[str, Any]:
+    import time
+    total = len(prepared["main_segments"])
+    return {
+        "overall_score": (red_count + orange_count) / max(1, total),
+        "red_count": red_count,
+        "orange_count": orange_count,
+        "total_sentences": total,
+        "processing_time": time.time() - prepared["start_time"]
+    }
+
+def compact_plagiarism_detection(main_bytes: Document, ref_bytes_list: List[Document], ref_names: List[str],
+                                 model_name: str = MODEL_NAME, progress=no_progress) -> Dict[str, Any]:
+    """Plagiarism detection returning the compact payload: offsets, packed scores, no HTML."""
+    prepared = prepare_plagiarism_detection(main_bytes, ref_bytes_list, ref_names, model_name, progress)
+    main_segments = prepared["main_segments"]
+    corpus = prepared["corpus"]
+
+    progress("scoring", 0, 1)
+    top_scores, top_idx, match_type = search_sentences(prepared, 0, len(main_segments))
+    progress("building", 0, 1)
+    with stage("building"):
+        result = build_compact_result(
+            prepared["main_text"],
+            [seg.start for seg in main_segments],
+            [seg.end for seg in main_segments],
+            top_scores, top_idx,
+            corpus.sentences, corpus.doc_index, ref_names,
+            RED_THRESHOLD, ORANGE_THRESHOLD
         )
-        
-        if score >= ORANGE_THRESHOLD:
+    result["match_types"] = pack_array(match_type, "int8")
+    result["match_type_names"] = list(MATCH_TYPES)
+    result["processing_time"] = plagiarism_summary(prepared, 0, 0)["processing_time"]
+    return result
+
+def process_plagiarism_detection(main_bytes: Document, ref_bytes_list: List[Document], ref_names: List[str],
+                                 model_name: str = MODEL_NAME, progress=no_progress,
+                                 on_segmented=None, highlights: bool = True) -> Dict[str, Any]:
+    """Process plagiarism detection in a separate thread.
+
+    Blocks are searched one at a time; their top-k arrays are then assembled in
+    one vectorized pass. With ``highlights=False`` no HTML is rendered at all.
+    """
+    prepared = prepare_plagiarism_detection(main_bytes, ref_bytes_list, ref_names, model_name, progress, on_segmented)
+    n = len(prepared["main_segments"])
+
+    progress("scoring", 0, n)
+    results = []
+    for block_start in range(0, n, SIMILARITY_QUERY_BLOCK):
+        block_end = min(block_start + SIMILARITY_QUERY_BLOCK, n)
+        results.append(search_sentences(prepared, block_start, block_end))
+        progress("scoring", block_end, n)
+    top_scores, top_idx, match_type = (np.concatenate(arrays) for arrays in zip(*results))
+
+    progress("building", 0, 1)
+    with stage("building"):
+        # Flagged sentences come out of an argsort, already highest score first
+        assembled = assemble_matches(prepared, 0, top_scores, top_idx, match_type, by_score=True)
+    with stage("highlighting"):
+        fragments = block_highlights(prepared, 0, top_scores, top_idx) if highlights else []
+    return {
+        **plagiarism_summary(prepared, assembled["red_count"], assembled["orange_count"]),
+        "flagged_sentences": assembled["flagged_sentences"],
+        "highlighted_fragments": fragments
+    }
+
+def embed_documents(model, space: str, docs: List[Document], progress=no_progress) -> List[ReferenceEntry]:
+    """Sentences and embeddings for every document, via the reference store and one encode pass."""
+    digests = [document_digest(doc) for doc in docs]
+    ref_space = reference_space(space)
+    entries = [lookup_reference(digest, ref_space) for digest in digests]
+    missing = [doc_i for doc_i, entry in enumerate(entries) if entry is None]
+
+    progress("extracting", 0, len(missing))
+    texts = read_pdfs(
+        [docs[doc_i] for doc_i in missing],
+        [digests[doc_i] for doc_i in missing],
+        lambda done, total: progress("extracting", done, total)
+    ) if missing else []
+
+    progress("splitting", 0, len(missing))
+    new_sents = split_sentences_batch(texts)
+    progress("splitting", len(missing), len(missing))
+
+    all_sents = [s for sents in new_sents for s in sents]
+    # Documents without extractable text still get an (empty) entry
+    all_emb = np.empty((0, model.get_sentence_embedding_dimension()), dtype=np.float32)
+    if all_sents:
+        all_emb = encode_sentences_efficiently(model, all_sents, progress, space).cpu().numpy()
+    pos = 0
+    for doc_i, sents in zip(missing, new_sents):
+        entries[doc_i] = save_reference(digests[doc_i], ref_space, sents, all_emb[pos:pos + len(sents)])
+        pos += len(sents)
+    return entries
+
+def process_batch_detection(sub_bytes_list: List[Document], sub_names: List[str],
+                            ref_bytes_list: List[Document], ref_names: List[str],
+                            model_name: str = MODEL_NAME, progress=no_progress) -> Dict[str, Any]:
+    """Check M submissions against each other and a shared reference set in one pass."""
+    import time
+    start_time = time.time()
+
+    model = get_model(model_name)
+    space = embedding_space(model_name)
+    entries = embed_documents(model, space, sub_bytes_list + ref_bytes_list, progress)
+
+    # Submissions first, then references: doc d < M is submission d
+    n_subs = len(sub_bytes_list)
+    names = sub_names + ref_names
+    corpus = ReferenceCorpus(entries, model.get_sentence_embedding_dimension(), reference_space(space))
+    offsets = corpus.offsets
+    sub_rows = int(offsets[n_subs])
+    if sub_rows == 0:
+        raise HTTPException(status_code=400, detail="Couldn't extract sentences from any submission.")
+
+    # Best match of every submission sentence inside every document
+    progress("scoring", 0, 1)
+    with stage("similarity"):
+        best, best_row = best_per_document(
+            corpus.embeddings[:sub_rows], corpus.embeddings, offsets,
+            block_size=SIMILARITY_BLOCK_SIZE, query_block_size=SIMILARITY_QUERY_BLOCK
+        )
+    for i in range(n_subs):
+        # A submission never matches itself
+        best[offsets[i]:offsets[i + 1], i] = -np.inf
+    progress("scoring", 1, 1)
+
+    progress("building", 0, n_subs)
+    coverage = np.zeros((n_subs, len(names)), dtype=np.float64)
+    mean_similarity = np.zeros((n_subs, len(names)), dtype=np.float64)
+    reports = []
+    for i in range(n_subs):
+        a, b = int(offsets[i]), int(offsets[i + 1])
+        sub_best = best[a:b]
+        if b > a:
+            # Share of sentences with a match in each document, and the mean best score
+            coverage[i] = np.mean(sub_best >= ORANGE_THRESHOLD, axis=0)
+            mean_similarity[i] = np.where(np.isfinite(sub_best), sub_best, 0.0).mean(axis=0)
+        coverage[i, i] = mean_similarity[i, i] = 1.0
+
+        source = np.argmax(sub_best, axis=1)
+        scores = sub_best[np.arange(b - a), source]
+        red_count = int(np.count_nonzero(scores >= RED_THRESHOLD))
+        orange_count = int(np.count_nonzero((scores >= ORANGE_THRESHOLD) & (scores < RED_THRESHOLD)))
+        flagged_sentences = []
+        for j in np.flatnonzero(scores >= ORANGE_THRESHOLD):
+            doc = int(source[j])
             flagged_sentences.append({
-                "student_sentence": sent,
-                "score": score,
-                "reference_document": ref_doc_name,
-                "reference_sentence": ref_sent,
-                "sentence_index": i,
-                "risk_level": "HIGH" if score >= RED_THRESHOLD else "MEDIUM"
+                "student_sentence": corpus.sentences[a + j],
+                "score": float(scores[j]),
+                "source_document": names[doc],
+                "source_type": "submission" if doc < n_subs else "reference",
+                "source_sentence": corpus.sentences[int(best_row[a + j, doc])],
+                "sentence_index": int(j),
+                "risk_level": "HIGH" if scores[j] >= RED_THRESHOLD else "MEDIUM"
             })
+        flagged_sentences.sort(key=lambda x: x["score"], reverse=True)
+        reports.append({
+            "submission": sub_names[i],
+            "overall_score": (red_count + orange_count) / max(1, b - a),
+            "red_count": red_count,
+            "orange_count": orange_count,
+            "total_sentences": b - a,
+            "flagged_sentences": flagged_sentences
+        })
+        progress("building", i + 1, n_subs)
 
-    # Sort flagged sentences by score (highest first)
-    flagged_sentences.sort(key=lambda x: x["score"], reverse=True)
-    
-    plag_fraction = (red_count + orange_count) / max(1, len(main_sents))
-    processing_time = time.time() - start_time
-    
     return {
-        "overall_score": plag_fraction,
-        "red_count": red_count,
-        "orange_count": orange_count,
-        "total_sentences": len(main_sents),
-        "flagged_sentences": flagged_sentences,
-        "highlighted_fragments": highlighted_fragments,
-        "processing_time": processing_time
+        "submissions": sub_names,
+        "references": ref_names,
+        # Row i, column j: how much of submission i is matched in document j
+        "submission_matrix": {
+            "coverage": coverage[:, :n_subs].tolist(),
+            "mean_similarity": mean_similarity[:, :n_subs].tolist()
+        },
+        "reference_matrix": {
+            "coverage": coverage[:, n_subs:].tolist(),
+            "mean_similarity": mean_similarity[:, n_subs:].tolist()
+        },
+        "reports": reports,
+        "processing_time": time.time() - start_time
     }
 
+def get_analysis_pool():
+    """The worker process pool for EXECUTION_MODE=process, started on first use."""
+    global analysis_pool
+    with analysis_pool_lock:
+        if analysis_pool is None:
+            analysis_pool = analysis_worker.create_pool(ANALYSIS_PROCESSES, ANALYSIS_PROCESS_THREADS)
+        return analysis_pool
+
+def start_analysis_pool():
+    """Start every worker process and wait until each has loaded and warmed the model."""
+    import time
+    start = time.time()
+    model_state["status"] = "warming_up"
+    try:
+        pool = get_analysis_pool()
+        # Workers run their initializer (model load + warm-up) before taking a task
+        for future in [pool.submit(analysis_worker.ping) for _ in range(ANALYSIS_PROCESSES)]:
+            future.result()
+        model_state["warmup_seconds"] = time.time() - start
+        model_state["status"] = "ready"
+        print(f"✅ {ANALYSIS_PROCESSES} analysis worker processes ready in {model_state['warmup_seconds']:.1f}s")
+    except Exception as e:
+        model_state["status"] = "failed"
+        model_state["error"] = str(e)
+        print(f"⚠️ Analysis worker processes failed to start: {e}")
+
+def reset_analysis_pool():
+    """Drop a broken pool (a worker died); the next analysis starts a fresh one."""
+    global analysis_pool
+    with analysis_pool_lock:
+        pool, analysis_pool = analysis_pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def run_in_worker_process(fn_name: str, *args, progress=None, **kwargs):
+    """Run ``api.<fn_name>(*args, **kwargs)`` in a worker process, blocking this thread until it returns."""
+    import time
+    if progress:
+        # Jobs only see coarse progress: stage updates stay in the worker
+        progress("extracting", 0, 1)
+    submitted = time.time()
+    try:
+        result, worker_timings = get_analysis_pool().submit(
+            analysis_worker.run, fn_name, args, kwargs, runtime_config()
+        ).result()
+    except analysis_worker.WorkerHTTPError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except BrokenProcessPool:
+        reset_analysis_pool()
+        raise HTTPException(status_code=503, detail="Analysis worker process died; retry the request")
+
+    # Credit the worker's stages to this request and this process's metrics
+    waited = max(0.0, worker_timings["started_at"] - submitted)
+    metrics_registry.observe("plagiasense_executor_queue_seconds", waited, executor="process")
+    timings = current_timings.get()
+    if timings is not None:
+        timings.add_queue_wait(waited + worker_timings["queue_wait_seconds"])
+    for name, entry in worker_timings["stages"].items():
+        metrics_registry.observe("plagiasense_stage_seconds", entry["seconds"], stage=name)
+        metrics_registry.inc("plagiasense_stage_cpu_seconds_total", entry["cpu_seconds"], stage=name)
+        if timings is not None:
+            timings.add_stage(name, entry["seconds"], entry["cpu_seconds"])
+    if timings is not None:
+        for name, value in worker_timings["counts"].items():
+            timings.count(name, value)
+    return result
+
+def in_worker(fn):
+    """``fn`` itself in thread mode; in process mode, a callable that runs it in a worker process."""
+    if EXECUTION_MODE != "process":
+        return fn
+    return functools.partial(run_in_worker_process, fn.__name__)
+
+@app.on_event("startup")
+async def preload_model():
+    """Resolve the sentence splitter and warm the model up in the background; /api/ready reports when it is done."""
+    asyncio.get_event_loop().run_in_executor(executor, get_sentence_splitter)
+    if EXECUTION_MODE == "process":
+        # Workers load the model; this process only needs it for streaming
+        asyncio.get_event_loop().run_in_executor(executor, start_analysis_pool)
+    elif PRELOAD_MODEL and ML_SUPPORT:
+        asyncio.get_event_loop().run_in_executor(executor, warm_up_model)
+
+@app.on_event("shutdown")
+def shutdown_workers():
+    pdf_extractor.shutdown()
+    if analysis_pool is not None:
+        analysis_pool.shutdown(cancel_futures=True)
+
 # API Routes
 @app.get("/", response_model=HealthResponse)
 async def health_check():
     """Health check endpoint."""
     return HealthResponse(
         status="healthy", 
-        model_loaded=model is not None,
+        model_loaded=model_registry.is_loaded(MODEL_NAME),
         pdf_support=PDF_SUPPORT,
         ml_support=ML_SUPPORT,
         nltk_support=NLTK_SUPPORT
     )
 
+@app.get("/api/live")
+async def liveness():
+    """Liveness: the process is up and serving requests."""
+    return {"status": "alive"}
+
+@app.get("/api/ready")
+async def readiness():
+    """Readiness: the model is loaded and warmed up, so analyses run at full speed."""
+    # In process mode the model lives in the worker processes
+    loaded = EXECUTION_MODE == "process" or model_registry.is_loaded(MODEL_NAME)
+    ready = loaded and model_state["status"] in ("ready", "loaded")
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"ready": ready, **model_state}
+    )
+
+def validate_model_name(model_name: Optional[str]) -> str:
+    """Resolve the requested Sentence-BERT model, defaulting to MODEL_NAME."""
+    if not model_name:
+        return MODEL_NAME
+    try:
+        return resolve_model_name(model_name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def admit(kind: str, request: Optional[Request] = None, timeout: Optional[float] = None) -> Slot:
+    """Take an analysis slot before touching the uploads; the wait is recorded as queueing."""
+    slot = await admission.enter(kind, request.is_disconnected if request is not None else None, timeout)
+    metrics_registry.observe("plagiasense_admission_wait_seconds", slot.waited, kind=kind)
+    timings = current_timings.get()
+    if timings is not None:
+        timings.add_queue_wait(slot.waited)
+    return slot
+
+def request_timings(include: bool) -> Optional[Dict[str, Any]]:
+    """The current request's stage breakdown, if the client asked for it."""
+    timings = current_timings.get()
+    return timings.to_dict() if include and timings is not None else None
+
+STREAM_FORMATS = {"ndjson": "application/x-ndjson", "sse": "text/event-stream"}
+
+def stream_record(fmt: str, kind: str, payload: Dict[str, Any]) -> str:
+    if fmt == "sse":
+        return f"event: {kind}\ndata: {json.dumps(payload)}\n\n"
+    return json.dumps({"type": kind, **payload}) + "\n"
+
+async def stream_plagiarism_results(fmt: str, prepared: Dict[str, Any], slot: Optional[Slot] = None,
+                                    highlights: bool = True):
+    """Emit one record per scored block of student sentences, then a summary record; releases ``slot`` at the end."""
+    loop = asyncio.get_event_loop()
+    blocks = score_plagiarism_blocks(prepared, highlights=highlights)
+    red_count = 0
+    orange_count = 0
+    try:
+        while True:
+            # Each block is scored on the worker pool; the event loop only serialises
+            block = await loop.run_in_executor(executor, next, blocks, None)
+            if block is None:
+                break
+            red_count += block["red_count"]
+            orange_count += block["orange_count"]
+            yield stream_record(fmt, "block", block)
+        yield stream_record(fmt, "summary", plagiarism_summary(prepared, red_count, orange_count))
+    except Exception as e:
+        # Headers are already sent, so the failure is reported in-band
+        yield stream_record(fmt, "error", {"detail": f"Processing error: {str(e)}"})
+    finally:
+        if slot is not None:
+            slot.release()
+
 @app.post("/api/analyze", response_model=AnalysisResult)
 async def analyze_plagiarism(
-    files: List[UploadFile] = File(...)
+    request: Request,
+    files: List[UploadFile] = File(...),
+    model_name: Optional[str] = Form(None),
+    stream: Optional[str] = Form(None),
+    result_format: str = Form("full", alias="format"),
+    highlights: bool = Form(True),
+    timings: bool = Form(False)
 ):
     """
     Analyze plagiarism in uploaded documents.
     First file is the student document, rest are reference documents.
+    With stream=ndjson or stream=sse, results are sent block by block as they are
+    scored, followed by a summary record, instead of as one AnalysisResult.
+    With format=compact, the result is the compact payload (see compact_result.py),
+    gzip/brotli compressed when the client accepts it.
+    With highlights=false, no highlighted_fragments HTML is rendered.
+    With timings=true, the result carries a per-stage timing breakdown.
     """
-    if len(files) < 2:
-        raise HTTPException(
-            status_code=400, 
-            detail="At least 2 files required: first is student document, rest are references"
-        )
-    
-    # Validate file types
-    for file in files:
-        if not file.filename.lower().endswith('.pdf'):
-            raise HTTPException(
-                status_code=400,
-                detail=f"File {file.filename} is not a PDF. Only PDF files are supported."
-            )
+    validate_plagiarism_files(files)
+    model_name = validate_model_name(model_name)
+    if stream and stream not in STREAM_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown stream format '{stream}'. Choose from: {', '.join(STREAM_FORMATS)}")
+    if result_format not in ("full", "compact"):
+        raise HTTPException(status_code=400, detail=f"Unknown result format '{result_format}'. Choose from: full, compact")
+    if stream and result_format == "compact":
+        raise HTTPException(status_code=400, detail="Streaming is only available for the full result format")
     
+    uploads = new_upload_spool()
+    slot = await admit("plagiarism", request)
     try:
-        # Read file contents
-        main_file = files[0]
-        ref_files = files[1:]
-        
-        main_bytes = await main_file.read()
-        ref_bytes_list = []
-        ref_names = []
-        
-        for ref_file in ref_files:
-            ref_bytes = await ref_file.read()
-            ref_bytes_list.append(ref_bytes)
-            ref_names.append(ref_file.filename)
+        # Spool uploads to disk; nothing below holds a whole PDF in memory
+        main_doc = await uploads.add(files[0])
+        ref_docs, ref_names = await read_uploads(uploads, files[1:])
         
         # Process in thread pool to avoid blocking
         loop = asyncio.get_event_loop()
+        if stream:
+            # Extraction/encoding errors still surface as normal HTTP errors;
+            # the PDFs are fully read by the time streaming starts
+            prepared = await loop.run_in_executor(
+                executor, prepare_plagiarism_detection, main_doc, ref_docs, ref_names, model_name
+            )
+            # The slot is held until the last block is sent; the background task
+            # releases it (on the event loop, where admission state lives) if the
+            # client disconnects before streaming starts
+            response = StreamingResponse(
+                stream_plagiarism_results(stream, prepared, slot, highlights),
+                media_type=STREAM_FORMATS[stream],
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+                background=BackgroundTask(slot.release_on_loop)
+            )
+            slot = None
+            return response
+
+        if result_format == "compact":
+            result = await loop.run_in_executor(
+                executor, in_worker(compact_plagiarism_detection), main_doc, ref_docs, ref_names, model_name
+            )
+            if timings:
+                result["timings"] = request_timings(timings)
+            body, encoding = await loop.run_in_executor(
+                executor, encode_body, result, request.headers.get("accept-encoding", "")
+            )
+            headers = {"Vary": "Accept-Encoding"}
+            if encoding:
+                headers["Content-Encoding"] = encoding
+            return Response(content=body, media_type="application/json", headers=headers)
+
         result = await loop.run_in_executor(
             executor,
-            process_plagiarism_detection,
-            main_bytes,
-            ref_bytes_list,
-            ref_names
+            functools.partial(in_worker(process_plagiarism_detection), highlights=highlights),
+            main_doc,
+            ref_docs,
+            ref_names,
+            model_name
         )
         
-        return AnalysisResult(**result)
+        return AnalysisResult(**result, timings=request_timings(timings))
         
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Processing error: {str(e)}")
+    finally:
+        uploads.cleanup()
+        if slot is not None:
+            slot.release()
+
+@app.post("/api/analyze/combined")
+async def analyze_combined(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    model_name: Optional[str] = Form(None),
+    method: str = Form("pretrained"),
+    model_choice: Optional[str] = Form("roberta-openai"),
+    api_key: Optional[str] = Form(None),
+    api_url: Optional[str] = Form(None),
+    timings: bool = Form(False)
+):
+    """
+    Plagiarism and AI detection in one request.
+    The student document (first file) is extracted and split once; AI scoring
+    runs alongside sentence encoding and similarity search.
+    """
+    validate_plagiarism_files(files)
+    model_name = validate_model_name(model_name)
+    analysis_params = build_ai_analysis_params(AIAnalysisRequest(
+        method=method,
+        model_choice=model_choice,
+        api_key=api_key,
+        api_url=api_url
+    ))
+
+    uploads = new_upload_spool()
+    slot = await admit("combined", request)
+    try:
+        main_doc = await uploads.add(files[0])
+        ref_docs, ref_names = await read_uploads(uploads, files[1:])
+
+        loop = asyncio.get_event_loop()
+        result = await loop.run_in_executor(
+            executor,
+            in_worker(process_combined_detection),
+            main_doc,
+            ref_docs,
+            ref_names,
+            model_name,
+            analysis_params
+        )
+        return {
+            "plagiarism": AnalysisResult(**result["plagiarism"]),
+            "ai_detection": AIDetectionResult(**result["ai_detection"]),
+            "processing_time": result["processing_time"],
+            "timings": request_timings(timings)
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Processing error: {str(e)}")
+    finally:
+        uploads.cleanup()
+        slot.release()
+
+@app.post("/api/batch/analyze")
+async def analyze_batch(
+    request: Request,
+    submissions: List[UploadFile] = File(...),
+    references: List[UploadFile] = File([]),
+    model_name: Optional[str] = Form(None),
+    timings: bool = Form(False)
+):
+    """
+    Check a class of submissions against each other and a shared reference set.
+    Every document is embedded once; returns submission x submission and
+    submission x reference matrices plus a report per submission.
+    """
+    validate_batch_files(submissions, references)
+    model_name = validate_model_name(model_name)
+
+    uploads = new_upload_spool()
+    slot = await admit("batch", request)
+    try:
+        sub_docs, sub_names = await read_uploads(uploads, submissions)
+        ref_docs, ref_names = await read_uploads(uploads, references)
+
+        loop = asyncio.get_event_loop()
+        result = await loop.run_in_executor(
+            executor,
+            in_worker(process_batch_detection),
+            sub_docs,
+            sub_names,
+            ref_docs,
+            ref_names,
+            model_name
+        )
+        return {**result, "timings": request_timings(timings)}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Processing error: {str(e)}")
+    finally:
+        uploads.cleanup()
+        slot.release()
 
 @app.get("/api/models")
 async def get_available_models():
     """Get available Sentence-BERT models."""
-    models = {
-        "all-MiniLM-L6-v2": "Fast & Balanced",
-        "all-mpnet-base-v2": "High Quality",
-        "all-distilroberta-v1": "Good Balance"
+    return {
+        "models": AVAILABLE_MODELS,
+        "default": MODEL_NAME.split("/")[-1],
+        "loaded": [name.split("/")[-1] for name in model_registry.stats()["loaded"]]
     }
-    return {"models": models}
+
+@app.get("/api/models/parity")
+async def get_backend_parity(model_name: Optional[str] = None):
+    """Compare the configured inference backend's similarity scores with fp32."""
+    model_name = validate_model_name(model_name)
+    loop = asyncio.get_event_loop()
+    try:
+        return await loop.run_in_executor(executor, check_backend_parity, model_name)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Parity check failed: {e}")
+
+def runtime_config() -> Dict[str, Any]:
+    """The settings /api/configure can change at runtime."""
+    return {
+        "red_threshold": RED_THRESHOLD,
+        "orange_threshold": ORANGE_THRESHOLD,
+        "max_sentences": MAX_SENTENCES,
+        "similarity_engine": SIMILARITY_ENGINE,
+        "similarity_block_size": SIMILARITY_BLOCK_SIZE,
+        "top_k_matches": TOP_K_MATCHES
+    }
+
+def apply_runtime_config(config: Dict[str, Any]):
+    """Adopt a runtime_config() dict; the similarity engine is only rebuilt when its settings change.
+
+    Worker processes call this before every analysis with the parent's
+    config, so /api/configure reaches them too.
+    """
+    global RED_THRESHOLD, ORANGE_THRESHOLD, MAX_SENTENCES, SIMILARITY_ENGINE, SIMILARITY_BLOCK_SIZE, TOP_K_MATCHES, similarity_engine
+    RED_THRESHOLD = config["red_threshold"]
+    ORANGE_THRESHOLD = config["orange_threshold"]
+    MAX_SENTENCES = config["max_sentences"]
+    TOP_K_MATCHES = config["top_k_matches"]
+    if (config["similarity_engine"], config["similarity_block_size"]) != (SIMILARITY_ENGINE, SIMILARITY_BLOCK_SIZE):
+        SIMILARITY_ENGINE = config["similarity_engine"]
+        SIMILARITY_BLOCK_SIZE = config["similarity_block_size"]
+        similarity_engine = make_similarity_engine()
 
 @app.post("/api/configure")
 async def configure_thresholds(
     red_threshold: float = 0.85,
     orange_threshold: float = 0.70,
-    max_sentences: int = 5000
+    max_sentences: int = 5000,
+    similarity_engine_name: Optional[str] = None,
+    similarity_block_size: Optional[int] = None,
+    top_k_matches: Optional[int] = None
 ):
     """Configure analysis thresholds."""
-    global RED_THRESHOLD, ORANGE_THRESHOLD, MAX_SENTENCES
-    
+
     if not (0.5 <= red_threshold <= 0.99):
         raise HTTPException(status_code=400, detail="Red threshold must be between 0.5 and 0.99")
     if not (0.5 <= orange_threshold <= red_threshold):
         raise HTTPException(status_code=400, detail="Orange threshold must be between 0.5 and red threshold")
     if not (500 <= max_sentences <= 10000):
         raise HTTPException(status_code=400, detail="Max sentences must be between 500 and 10000")
+    if similarity_engine_name is not None and similarity_engine_name not in ENGINES:
+        raise HTTPException(status_code=400, detail=f"Similarity engine must be one of: {', '.join(ENGINES)}")
+    if similarity_block_size is not None and not (256 <= similarity_block_size <= 65536):
+        raise HTTPException(status_code=400, detail="Similarity block size must be between 256 and 65536")
+    if top_k_matches is not None and not (1 <= top_k_matches <= 10):
+        raise HTTPException(status_code=400, detail="Top-k matches must be between 1 and 10")
     
-    RED_THRESHOLD = red_threshold
-    ORANGE_THRESHOLD = orange_threshold
-    MAX_SENTENCES = max_sentences
-    
-    return {
-        "red_threshold": RED_THRESHOLD,
-        "orange_threshold": ORANGE_THRESHOLD,
-        "max_sentences": MAX_SENTENCES
-    }
+    apply_runtime_config({
+        **runtime_config(),
+        "red_threshold": red_threshold,
+        "orange_threshold": orange_threshold,
+        "max_sentences": max_sentences,
+        **({"top_k_matches": top_k_matches} if top_k_matches is not None else {}),
+        **({"similarity_engine": similarity_engine_name} if similarity_engine_name is not None else {}),
+        **({"similarity_block_size": similarity_block_size} if similarity_block_size is not None else {}),
+    })
+    return runtime_config()
 
 # ============================================================================
 # AI DETECTION ENDPOINTS
@@ -468,8 +1462,8 @@ async def get_ai_detection_methods():
             "pretrained": {
                 "name": "Pretrained Model",
                 "description": "Uses local pretrained RoBERTa models for AI detection",
-                "available": True,
-                "requires_internet": True,
+                "available": any(is_available(AI_DETECTOR_DIR, name) for name in AI_DETECTOR_MODELS),
+                "requires_internet": False,
                 "requires_api_key": False
             },
             "api": {
@@ -481,7 +1475,7 @@ async def get_ai_detection_methods():
             },
             "statistical": {
                 "name": "Statistical Analysis",
-                "description": "Uses statistical methods to detect AI patterns",
+                "description": "Burstiness, sentence-length variance, type-token ratio, function-word and punctuation profiles",
                 "available": True,
                 "requires_internet": False,
                 "requires_api_key": False
@@ -546,7 +1540,9 @@ async def get_ai_detection_models():
         }
         return {
             "models": models,
-            "performance_info": performance_info
+            "performance_info": performance_info,
+            # Detectors present under AI_DETECTOR_DIR; others fall back to statistical analysis
+            "installed": {name: is_available(AI_DETECTOR_DIR, name) for name in models}
         }
     except Exception as e:
         print(f"AI detection models error: {e}")
@@ -556,14 +1552,180 @@ async def get_ai_detection_models():
             "performance_info": {"statistical": {"accuracy": 0.75, "speed": "Fast", "memory": "Low", "description": "Statistical analysis"}}
         }
 
+def build_ai_analysis_params(analysis_config: AIAnalysisRequest) -> Dict[str, Any]:
+    """Validate the requested AI detection method and collect its parameters."""
+    analysis_params = {
+        "method": analysis_config.method,
+    }
+    
+    if analysis_config.method == "pretrained":
+        analysis_params["model_choice"] = analysis_config.model_choice or "roberta-openai"
+    elif analysis_config.method == "gptzero_api":
+        if not analysis_config.api_key:
+            raise HTTPException(status_code=400, detail="API key is required for GPTZero analysis")
+        analysis_params["api_key"] = analysis_config.api_key
+    elif analysis_config.method == "custom_api":
+        if not analysis_config.api_url:
+            raise HTTPException(status_code=400, detail="API URL is required for custom API analysis")
+        analysis_params["api_url"] = analysis_config.api_url
+        if analysis_config.api_key:
+            analysis_params["api_key"] = analysis_config.api_key
+    return analysis_params
+
+def run_pretrained_analysis(main_sentences: List[str], model_choice: str) -> Optional[Dict[str, Any]]:
+    """Probabilities from a local pretrained detector, or None if it is not installed."""
+    if not ML_SUPPORT or not is_available(AI_DETECTOR_DIR, model_choice):
+        return None
+    classifier = ai_classifiers.get(model_choice)
+    return {
+        "probabilities": ai_score_cache.score(classifier, main_sentences),
+        "model_used": model_choice,
+        "device": classifier.device,
+        "optimized": classifier.optimized,
+    }
+
+def run_ai_analysis(main_sentences: List[str], analysis_params: Dict[str, Any]) -> Dict[str, Any]:
+    """Score each sentence of the document for AI-generated content."""
+    import time
+    start_time = time.time()
+    
+    error = None
+    features = None
+    scored = None
+    if analysis_params.get("method") == "pretrained":
+        model_choice = analysis_params.get("model_choice", "roberta-openai")
+        try:
+            scored = run_pretrained_analysis(main_sentences, model_choice)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if scored is None:
+            error = f"AI detector '{model_choice}' is not installed in {AI_DETECTOR_DIR}; used statistical analysis"
+        else:
+            method = "pretrained"
+    
+    if scored is None:
+        # Statistical engine: the default, and the fallback for detectors that aren't installed
+        statistical = score_sentences(main_sentences)
+        features = statistical["features"]
+        method = "statistical"
+        scored = {
+            "probabilities": statistical["probabilities"],
+            "model_used": "statistical",
+            "device": "cpu",
+            "optimized": True
+        }
+    
+    probabilities = scored["probabilities"]
+    sentence_scores = [
+        {"sentence": sentence, "ai_probability": float(prob), "sentence_index": i}
+        for i, (sentence, prob) in enumerate(zip(main_sentences, probabilities))
+    ]
+    
+    return {
+        "available": True,
+        "method": method,
+        "model_used": scored["model_used"],
+        "overall_score": float(probabilities.mean()) * 100 if len(probabilities) else 0.0,
+        "ai_probability": float(probabilities.mean()) if len(probabilities) else 0.0,
+        "sentence_scores": sentence_scores,
+        "high_risk_sentences": int(np.count_nonzero(probabilities > 0.8)),
+        "medium_risk_sentences": int(np.count_nonzero((probabilities > 0.5) & (probabilities <= 0.8))),
+        "total_sentences_analyzed": len(sentence_scores),
+        "features": features,
+        "processing_time": time.time() - start_time,
+        "device": scored["device"],
+        "optimized": scored["optimized"],
+        "error": error
+    }
+
+def score_ai_detection(main_sentences: List[str], analysis_params: Dict[str, Any], start_time: float) -> Dict[str, Any]:
+    """Run AI detection over already-split sentences and format the AIDetectionResult."""
+    import time
+    with stage("ai_detection"):
+        ai_results = run_ai_analysis(main_sentences, analysis_params)
+    
+    if not ai_results.get("available", False):
+        error_msg = ai_results.get("error", "AI detection analysis failed")
+        raise HTTPException(status_code=500, detail=error_msg)
+    
+    # Format response
+    result = AIDetectionResult(
+        available=ai_results.get("available", False),
+        method=ai_results.get("method", analysis_params["method"]),
+        overall_score=ai_results.get("overall_score", 0.0),
+        sentence_scores=ai_results.get("sentence_scores", []),
+        high_risk_sentences=ai_results.get("high_risk_sentences", 0),
+        medium_risk_sentences=ai_results.get("medium_risk_sentences", 0),
+        model_used=ai_results.get("model_used"),
+        optimized=ai_results.get("optimized"),
+        device=ai_results.get("device"),
+        total_sentences_analyzed=ai_results.get("total_sentences_analyzed", len(main_sentences)),
+        features=ai_results.get("features"),
+        error=ai_results.get("error"),
+        processing_time=time.time() - start_time
+    )
+    return result.model_dump()
+
+def process_ai_detection(file_bytes: Document, analysis_params: Dict[str, Any], progress=no_progress) -> Dict[str, Any]:
+    """Extract, split and score a document for AI content in a separate thread."""
+    import time
+    start_time = time.time()
+    
+    # Read PDF content
+    progress("extracting", 0, 1)
+    main_text = read_pdf_bytes(file_bytes)
+    
+    if not main_text or len(main_text.strip()) < 10:
+        raise HTTPException(status_code=400, detail="Could not extract meaningful text from the PDF")
+    
+    # Split into sentences
+    progress("splitting", 0, 1)
+    main_sentences = split_sentences(main_text)
+    
+    if not main_sentences:
+        raise HTTPException(status_code=400, detail="Could not extract sentences from the document")
+    
+    # Run AI detection analysis
+    progress("scoring", 0, 1)
+    return score_ai_detection(main_sentences, analysis_params, start_time)
+
+def process_combined_detection(main_bytes: Document, ref_bytes_list: List[Document], ref_names: List[str],
+                               model_name: str, analysis_params: Dict[str, Any],
+                               progress=no_progress) -> Dict[str, Any]:
+    """Plagiarism and AI detection over one extraction and split of the student document."""
+    import time
+    start_time = time.time()
+    ai_future = []
+
+    def start_ai_detection(main_text: str, main_sentences: List[str]):
+        # AI scoring overlaps with sentence encoding and similarity search
+        ai_future.append(stage_executor.submit(score_ai_detection, main_sentences, analysis_params, start_time))
+
+    try:
+        plagiarism = process_plagiarism_detection(
+            main_bytes, ref_bytes_list, ref_names, model_name, progress, on_segmented=start_ai_detection
+        )
+    except Exception:
+        if ai_future:
+            ai_future[0].cancel()
+        raise
+
+    return {
+        "plagiarism": plagiarism,
+        "ai_detection": ai_future[0].result(),
+        "processing_time": time.time() - start_time
+    }
+
 @app.post("/api/ai-detection/analyze", response_model=AIDetectionResult)
 async def analyze_ai_content(
+    request: Request,
     background_tasks: BackgroundTasks,
     files: List[UploadFile] = File(...),
     method: str = Form("pretrained"),
     model_choice: Optional[str] = Form("roberta-openai"),
     api_key: Optional[str] = Form(None),
-    api_url: Optional[str] = Form(None)
+    api_url: Optional[str] = Form(None),
+    timings: bool = Form(False)
 ):
     """Analyze uploaded document for AI-generated content."""
     if not files or len(files) == 0:
@@ -577,150 +1739,269 @@ async def analyze_ai_content(
         api_url=api_url
     )
     
+    uploads = new_upload_spool()
+    slot = await admit("ai_statistical" if method == "statistical" else "ai", request)
     try:
-        import time
-        start_time = time.time()
-        
         # Read the main document (first file)
         main_file = files[0]
         if not main_file.filename.lower().endswith('.pdf'):
             raise HTTPException(status_code=400, detail="Only PDF files are supported")
         
-        # Read PDF content
-        file_content = await main_file.read()
-        main_text = read_pdf_bytes(file_content)
-        
-        if not main_text or len(main_text.strip()) < 10:
-            raise HTTPException(status_code=400, detail="Could not extract meaningful text from the PDF")
-        
-        # Split into sentences
-        download_nltk_data()
-        main_sentences = split_sentences(main_text)
-        
-        if not main_sentences:
-            raise HTTPException(status_code=400, detail="Could not extract sentences from the document")
-        
         # Prepare analysis parameters
-        analysis_params = {
-            "method": analysis_config.method,
-        }
-        
-        if analysis_config.method == "pretrained":
-            analysis_params["model_choice"] = analysis_config.model_choice or "roberta-openai"
-        elif analysis_config.method == "gptzero_api":
-            if not analysis_config.api_key:
-                raise HTTPException(status_code=400, detail="API key is required for GPTZero analysis")
-            analysis_params["api_key"] = analysis_config.api_key
-        elif analysis_config.method == "custom_api":
-            if not analysis_config.api_url:
-                raise HTTPException(status_code=400, detail="API URL is required for custom API analysis")
-            analysis_params["api_url"] = analysis_config.api_url
-            if analysis_config.api_key:
-                analysis_params["api_key"] = analysis_config.api_key
-        
-        # Run AI detection analysis
-        def run_ai_analysis():
-            import random
-            import time
-            start_time = time.time()
-            
-            # Simple sentence tokenization
-            sentences = [s.strip() for s in main_text.replace('!', '.').replace('?', '.').split('.') if s.strip()]
-            
-            # Generate realistic mock AI probabilities
-            sentence_scores = []
-            ai_probabilities = []
-            
-            for i, sentence in enumerate(sentences):
-                if len(sentence) < 10:
-                    continue
-                    
-                # Generate AI probability based on some simple heuristics
-                ai_prob = random.uniform(0.2, 0.9)
-                
-                # Adjust probability based on sentence characteristics
-                if len(sentence.split()) > 20:  # Longer sentences might be more AI-like
-                    ai_prob += 0.1
-                if sentence.count(',') > 3:  # Complex sentences
-                    ai_prob += 0.05
-                if any(word in sentence.lower() for word in ['furthermore', 'moreover', 'additionally', 'consequently']):
-                    ai_prob += 0.15  # Formal transition words
-                    
-                ai_prob = min(ai_prob, 1.0)
-                
-                sentence_scores.append({
-                    "sentence": sentence,
-                    "ai_probability": ai_prob,
-                    "sentence_index": i
-                })
-                ai_probabilities.append(ai_prob)
-            
-            if not ai_probabilities:
-                ai_probabilities = [0.5]  # Default fallback
-            
-            overall_ai_prob = sum(ai_probabilities) / len(ai_probabilities)
-            high_risk_sentences = sum(1 for prob in ai_probabilities if prob > 0.8)
-            medium_risk_sentences = sum(1 for prob in ai_probabilities if 0.5 < prob <= 0.8)
-            
-            return {
-                "available": True,
-                "method": analysis_params.get('method', 'statistical'),
-                "model_used": analysis_params.get('model_choice', 'statistical'),
-                "overall_score": overall_ai_prob * 100,
-                "ai_probability": overall_ai_prob,
-                "sentence_scores": sentence_scores,
-                "high_risk_sentences": high_risk_sentences,
-                "medium_risk_sentences": medium_risk_sentences,
-                "total_sentences_analyzed": len(sentence_scores),
-                "processing_time": time.time() - start_time,
-                "device": "cpu",
-                "optimized": True
-            }
+        analysis_params = build_ai_analysis_params(analysis_config)
+        main_doc = await uploads.add(main_file)
         
         # Run analysis in thread pool for non-blocking execution
         loop = asyncio.get_event_loop()
-        ai_results = await loop.run_in_executor(executor, run_ai_analysis)
+        result = await loop.run_in_executor(executor, in_worker(process_ai_detection), main_doc, analysis_params)
         
-        processing_time = time.time() - start_time
-        
-        if not ai_results.get("available", False):
-            error_msg = ai_results.get("error", "AI detection analysis failed")
-            raise HTTPException(status_code=500, detail=error_msg)
-        
-        # Format response
-        result = AIDetectionResult(
-            available=ai_results.get("available", False),
-            method=ai_results.get("method", analysis_config.method),
-            overall_score=ai_results.get("overall_score", 0.0),
-            sentence_scores=ai_results.get("sentence_scores", []),
-            high_risk_sentences=ai_results.get("high_risk_sentences", 0),
-            medium_risk_sentences=ai_results.get("medium_risk_sentences", 0),
-            model_used=ai_results.get("model_used"),
-            optimized=ai_results.get("optimized"),
-            device=ai_results.get("device"),
-            total_sentences_analyzed=ai_results.get("total_sentences_analyzed", len(main_sentences)),
-            processing_time=processing_time
-        )
-        
-        return result
+        return AIDetectionResult(**{**result, "timings": request_timings(timings)})
         
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"AI detection analysis failed: {e}")
+    finally:
+        uploads.cleanup()
+        slot.release()
+
+# ============================================================================
+# BACKGROUND JOB ENDPOINTS
+# ============================================================================
+
+def validate_plagiarism_files(files: List[UploadFile]):
+    if len(files) < 2:
+        raise HTTPException(
+            status_code=400, 
+            detail="At least 2 files required: first is student document, rest are references"
+        )
+    
+    # Validate file types
+    for file in files:
+        if not file.filename.lower().endswith('.pdf'):
+            raise HTTPException(
+                status_code=400,
+                detail=f"File {file.filename} is not a PDF. Only PDF files are supported."
+            )
+
+def validate_batch_files(submissions: List[UploadFile], references: List[UploadFile]):
+    if not submissions or len(submissions) + len(references) < 2:
+        raise HTTPException(
+            status_code=400,
+            detail="At least 2 files required: one or more submissions plus other submissions or references"
+        )
+    for file in submissions + references:
+        if not file.filename.lower().endswith('.pdf'):
+            raise HTTPException(
+                status_code=400,
+                detail=f"File {file.filename} is not a PDF. Only PDF files are supported."
+            )
+
+def new_upload_spool() -> UploadSpool:
+    return UploadSpool(MAX_UPLOAD_BYTES, MAX_REQUEST_BYTES, UPLOAD_TMP_DIR)
+
+async def read_uploads(uploads: UploadSpool, files: List[UploadFile]) -> Tuple[List[SpooledPdf], List[str]]:
+    """Spool each upload to disk under the request's size limits."""
+    docs = [await uploads.add(file) for file in files]
+    return docs, [doc.name for doc in docs]
+
+async def run_admitted_job(job, priority: str, uploads: Optional[UploadSpool], fn, *args):
+    """Wait for a slot (as long as it takes: the client polls), then run the job on the executor.
+
+    The job already returned 202, so a refusal (the queue filled up in the
+    meantime) is recorded on the job rather than raised into the void.
+    """
+    try:
+        slot = await admit(priority, timeout=float("inf"))
+        try:
+            await asyncio.get_event_loop().run_in_executor(executor, job_store.run, job, fn, *args)
+        finally:
+            slot.release()
+    except HTTPException as e:
+        job_store.fail(job, str(e.detail), e.status_code)
+    except Exception as e:
+        job_store.fail(job, f"Processing error: {e}")
+    finally:
+        if uploads is not None:
+            uploads.cleanup()
+
+def submit_job(kind: str, fn, *args, priority: Optional[str] = None,
+               uploads: Optional[UploadSpool] = None) -> JSONResponse:
+    """Queue ``fn`` as a background job behind admission control and return its handle.
+
+    Once the job is queued it owns ``uploads`` and deletes them when it finishes.
+    """
+    admission.check_capacity()
+    job = job_store.create(kind)
+    task = asyncio.get_event_loop().create_task(run_admitted_job(job, priority or kind, uploads, fn, *args))
+    job_tasks.add(task)
+    task.add_done_callback(job_tasks.discard)
+    return JSONResponse(status_code=202, content={
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/api/jobs/{job.id}",
+        "result_url": f"/api/jobs/{job.id}/result"
+    })
+
+@app.post("/api/jobs/analyze", status_code=202)
+async def submit_plagiarism_job(
+    files: List[UploadFile] = File(...),
+    model_name: Optional[str] = Form(None)
+):
+    """Queue a plagiarism analysis and return a job id to poll."""
+    validate_plagiarism_files(files)
+    model_name = validate_model_name(model_name)
+    
+    uploads = new_upload_spool()
+    try:
+        main_doc = await uploads.add(files[0])
+        ref_docs, ref_names = await read_uploads(uploads, files[1:])
+        return submit_job("plagiarism", in_worker(process_plagiarism_detection), main_doc, ref_docs, ref_names, model_name,
+                          uploads=uploads)
+    except BaseException:
+        uploads.cleanup()
+        raise
+
+@app.post("/api/jobs/batch/analyze", status_code=202)
+async def submit_batch_job(
+    submissions: List[UploadFile] = File(...),
+    references: List[UploadFile] = File([]),
+    model_name: Optional[str] = Form(None)
+):
+    """Queue a batch analysis and return a job id to poll."""
+    validate_batch_files(submissions, references)
+    model_name = validate_model_name(model_name)
+
+    uploads = new_upload_spool()
+    try:
+        sub_docs, sub_names = await read_uploads(uploads, submissions)
+        ref_docs, ref_names = await read_uploads(uploads, references)
+        return submit_job("batch", in_worker(process_batch_detection), sub_docs, sub_names, ref_docs, ref_names, model_name,
+                          uploads=uploads)
+    except BaseException:
+        uploads.cleanup()
+        raise
+
+@app.post("/api/jobs/ai-detection/analyze", status_code=202)
+async def submit_ai_detection_job(
+    files: List[UploadFile] = File(...),
+    method: str = Form("pretrained"),
+    model_choice: Optional[str] = Form("roberta-openai"),
+    api_key: Optional[str] = Form(None),
+    api_url: Optional[str] = Form(None)
+):
+    """Queue an AI-content analysis and return a job id to poll."""
+    if not files or len(files) == 0:
+        raise HTTPException(status_code=400, detail="At least one file is required")
+    if not files[0].filename.lower().endswith('.pdf'):
+        raise HTTPException(status_code=400, detail="Only PDF files are supported")
+    
+    analysis_params = build_ai_analysis_params(AIAnalysisRequest(
+        method=method,
+        model_choice=model_choice,
+        api_key=api_key,
+        api_url=api_url
+    ))
+    uploads = new_upload_spool()
+    try:
+        main_doc = await uploads.add(files[0])
+        return submit_job("ai-detection", in_worker(process_ai_detection), main_doc, analysis_params,
+                          priority="ai_statistical" if method == "statistical" else "ai", uploads=uploads)
+    except BaseException:
+        uploads.cleanup()
+        raise
+
+@app.get("/api/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    """Report a job's status and stage-level progress."""
+    return job_store.get(job_id).to_status()
+
+@app.get("/api/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    """Return a finished job's result, or 409 while it is still running."""
+    job = job_store.get(job_id)
+    if job.status == "failed":
+        raise HTTPException(status_code=job.error_status, detail=job.error)
+    if job.status != "done":
+        raise HTTPException(status_code=409, detail=f"Job is still {job.status} ({job.stage})")
+    return job.result
+
+def component_metrics():
+    """Counters the caches, pools and registries keep themselves, sampled at scrape time."""
+    hits, misses = "plagiasense_cache_hits_total", "plagiasense_cache_misses_total"
+    hits_help, misses_help = "Cache hits by cache and tier", "Cache misses by cache"
+    sentence, pdf, ai_scores = sentence_cache.stats(), pdf_extractor.stats(), ai_score_cache.stats()
+    references = reference_store.stats()
+    yield hits, "counter", hits_help, {"cache": "sentence", "tier": "memory"}, sentence["hits"]
+    yield hits, "counter", hits_help, {"cache": "sentence", "tier": "disk"}, sentence["disk_hits"]
+    yield hits, "counter", hits_help, {"cache": "pdf_text", "tier": "memory"}, pdf["memory_hits"]
+    yield hits, "counter", hits_help, {"cache": "pdf_text", "tier": "disk"}, pdf["disk_hits"]
+    yield hits, "counter", hits_help, {"cache": "reference", "tier": "disk"}, references["hits"]
+    yield hits, "counter", hits_help, {"cache": "ai_score", "tier": "memory"}, ai_scores["hits"]
+    yield misses, "counter", misses_help, {"cache": "sentence"}, sentence["misses"]
+    yield misses, "counter", misses_help, {"cache": "pdf_text"}, pdf["misses"]
+    yield misses, "counter", misses_help, {"cache": "reference"}, references["misses"]
+    yield misses, "counter", misses_help, {"cache": "ai_score"}, ai_scores["misses"]
+    yield ("plagiasense_lexical_index_builds_total", "counter", "Lexical indexes built for new reference sets",
+           {}, lexical_indexes.builds)
+
+    for kind, models in (("sentence", model_registry.stats()), ("ai_detector", ai_classifiers.stats())):
+        yield "plagiasense_models_loaded", "gauge", "Models currently in memory", {"kind": kind}, len(models["loaded"])
+        yield "plagiasense_model_evictions_total", "counter", "Models evicted from memory", {"kind": kind}, models["evictions"]
+        for name, info in models["loaded"].items():
+            yield "plagiasense_model_bytes", "gauge", "Estimated memory of each loaded model", {"kind": kind, "model": name}, info["bytes"]
+
+    admitted = admission.stats()
+    yield "plagiasense_admission_running", "gauge", "Analyses holding a slot", {}, admitted["running"]
+    for kind in admission.priorities:
+        yield "plagiasense_admission_queued", "gauge", "Analyses waiting for a slot", {"kind": kind}, admitted["queued"].get(kind, 0)
+    for reason, n in admitted["rejected"].items():
+        yield "plagiasense_admission_rejected_total", "counter", "Requests refused or dropped by admission control", {"reason": reason}, n
+    for pool in (executor, stage_executor):
+        yield "plagiasense_executor_queued", "gauge", "Tasks waiting for a worker thread", {"executor": pool.name}, pool.queued
+    batcher = embedding_batcher.stats()
+    yield "plagiasense_embedding_queue", "gauge", "Encode requests waiting for the batcher", {}, batcher["queued_requests"]
+    for status, n in job_store.stats().items():
+        yield "plagiasense_jobs", "gauge", "Background jobs by status", {"status": status}, n
+
+metrics_registry.add_collector(component_metrics)
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus metrics: request and stage latencies, queue waits, cache hits, model loads."""
+    return Response(content=metrics_registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 @app.get("/api/status")
 async def get_status():
     """Get current API status and configuration."""
     return {
         "status": "running",
-        "model_loaded": model is not None,
+        "model_loaded": model_registry.is_loaded(MODEL_NAME),
+        "model_state": model_state,
+        "execution": {
+            "mode": EXECUTION_MODE,
+            "analysis_workers": ANALYSIS_WORKERS,
+            "processes": ANALYSIS_PROCESSES if EXECUTION_MODE == "process" else 0,
+            "threads_per_process": ANALYSIS_PROCESS_THREADS if EXECUTION_MODE == "process" else None
+        },
+        "inference_backend": EMBED_BACKEND,
+        "sentence_splitter": None if sentence_splitter is None else sentence_splitter.name,
+        "models": model_registry.stats(),
         "device": "cuda" if torch.cuda.is_available() else "cpu",
         "configuration": {
             "red_threshold": RED_THRESHOLD,
             "orange_threshold": ORANGE_THRESHOLD,
             "max_sentences": MAX_SENTENCES
-        }
+        },
+        "reference_cache": {**reference_store.stats(), "enabled": REFERENCE_CACHE_ENABLED},
+        "similarity": similarity_engine.info(),
+        "ai_detectors": {**ai_classifiers.stats(), "dir": AI_DETECTOR_DIR, "score_cache": ai_score_cache.stats()},
+        "lexical_prefilter": {**lexical_indexes.stats(), "enabled": LEXICAL_PREFILTER, "threshold": LEXICAL_THRESHOLD},
+        "jobs": job_store.stats(),
+        "admission": admission.stats(),
+        "pdf_extraction": pdf_extractor.stats(),
+        "embedding_batcher": {**embedding_batcher.stats(), "enabled": EMBED_BATCHING_ENABLED},
+        "sentence_cache": {**sentence_cache.stats(), "enabled": SENTENCE_CACHE_ENABLED}
     }
 
 if __name__ == "__main__":
@@ -0,0 +1,441 @@
+#!/usr/bin/env python3
+"""
+Benchmark harness for the plagiarism pipeline.
+
+Two measurements, both in-process:
+
+* stages: ``process_plagiarism_detection`` called directly, with the
+  progress hook timestamping each stage: extracting, splitting (including
+  the lexical pre-filter), encoding, scoring (similarity search and match
+  assembly) and building (highlights and the response).
+* load: ``POST /api/analyze`` against the ASGI app through httpx (no
+  network, no server) at each concurrency level. Reports p50/p95 latency,
+  requests/sec, student sentences/sec and peak RSS.
+
+Peak RSS is reported for this process and, separately, for its worker
+processes (PDF extraction, EXECUTION_MODE=process). The worker figure sums
+each live worker's own peak, read from /proc on Linux, so pages shared
+copy-on-write are counted once per worker and it is an upper bound.
+Elsewhere it falls back to the largest worker that has already exited.
+
+Documents are synthetic PDFs of a controlled size, generated here with a
+seeded RNG. Each reference copies part of the student text verbatim and
+paraphrases another part, so every match path is exercised. ``--samples``
+uses the PDFs in ``sample data/`` instead. Synthetic documents are new for
+every run, so the caches miss as they would for real uploads. ``--no-cache``
+also turns the caches off, which is the way to get cold numbers from the
+sample PDFs.
+
+Results are saved as JSON. ``--compare`` prints the change against an
+earlier results file.
+
+    python benchmark.py --sentences 400 --references 3 --concurrency 1,4 --output bench.json
+    python benchmark.py --output new.json --compare bench.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import platform
+import resource
+import subprocess
+from typing import List, Dict, Optional, Any, Tuple
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+SAMPLE_DIR = os.path.join(os.path.dirname(BACKEND_DIR), "sample data")
+
+STAGES = ("extracting", "splitting", "encoding", "scoring", "building")
+
+WORDS = (
+    "analysis data model system student research method result network learning "
+    "process design structure value theory function memory signal energy market "
+    "policy health language image feature sample error rate change growth level "
+    "pattern source layer input output report review study field test control "
+    "measure factor group region period surface pressure sequence platform"
+).split()
+VERBS = "shows improves reduces explains predicts requires supports describes affects limits".split()
+SYNONYMS = {
+    "shows": "demonstrates", "improves": "enhances", "reduces": "lowers", "explains": "accounts for",
+    "predicts": "forecasts", "requires": "needs", "supports": "backs", "describes": "outlines",
+    "affects": "influences", "limits": "constrains",
+}
+
+
+# Synthetic documents
+
+def synthetic_sentence(rng: random.Random) -> str:
+    subject = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 3)))
+    obj = " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 6)))
+    tail = " ".join(rng.choice(WORDS) for _ in range(rng.randint(0, 8)))
+    text = f"The {subject} {rng.choice(VERBS)} the {obj}" + (f" across the {tail}" if tail else "")
+    return text[0].upper() + text[1:] + "."
+
+
+def paraphrase(sentence: str) -> str:
+    words = sentence.rstrip(".").split()
+    return " ".join(SYNONYMS.get(w, w) for w in words) + " in practice."
+
+
+def synthetic_corpus(seed: int, sentences: int, references: int, ref_sentences: int,
+                     copied: float) -> Tuple[List[str], List[List[str]]]:
+    """Student sentences plus reference documents sharing a ``copied`` fraction of them."""
+    rng = random.Random(seed)
+    student = [synthetic_sentence(rng) for _ in range(sentences)]
+    refs = []
+    for _ in range(references):
+        shared = rng.sample(student, min(len(student), int(ref_sentences * copied)))
+        half = len(shared) // 2
+        doc = shared[:half] + [paraphrase(s) for s in shared[half:]]
+        doc += [synthetic_sentence(rng) for _ in range(ref_sentences - len(doc))]
+        rng.shuffle(doc)
+        refs.append(doc)
+    return student, refs
+
+
+def wrap_lines(text: str, width: int = 90) -> List[str]:
+    lines, line = [], ""
+    for word in text.split():
+        if line and len(line) + 1 + len(word) > width:
+            lines.append(line)
+            line = word
+        else:
+            line = f"{line} {word}" if line else word
+    if line:
+        lines.append(line)
+    return lines
+
+
+def make_pdf(sentences: List[str], lines_per_page: int = 55) -> bytes:
+    """A minimal multi-page PDF with the sentences as Helvetica text, paragraph per 5 sentences."""
+    lines = []
+    for i in range(0, len(sentences), 5):
+        lines.extend(wrap_lines(" ".join(sentences[i:i + 5])))
+        lines.append("")
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)] or [[]]
+
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None,
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for page in pages:
+        ops = ["BT", "/F1 10 Tf", "12 TL", "50 760 Td"]
+        for line in page:
+            safe = line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+            ops.append(f"({safe}) Tj T*")
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1", "replace")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (len(objects))
+        )
+        page_ids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % i for i in page_ids), len(page_ids))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+class DocumentSource:
+    """Student + reference PDFs per run: fresh synthetic documents, or the sample PDFs."""
+
+    def __init__(self, args):
+        self.args = args
+        self.samples = None
+        if args.samples:
+            names = sorted(n for n in os.listdir(args.samples) if n.lower().endswith(".pdf"))
+            if len(names) < 2:
+                raise SystemExit(f"❌ Need at least 2 PDFs in {args.samples}")
+            self.samples = [(n, open(os.path.join(args.samples, n), "rb").read()) for n in names]
+
+    def documents(self, run: int) -> Tuple[bytes, List[bytes], List[str]]:
+        if self.samples is not None:
+            return self.samples[0][1], [b for _, b in self.samples[1:]], [n for n, _ in self.samples[1:]]
+        a = self.args
+        student, refs = synthetic_corpus(a.seed + run, a.sentences, a.references, a.ref_sentences, a.copied)
+        return make_pdf(student), [make_pdf(doc) for doc in refs], [f"reference_{i + 1}.pdf" for i in range(len(refs))]
+
+
+# Measurements
+
+def rusage_mb(who: int) -> float:
+    peak = resource.getrusage(who).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def peak_rss_mb() -> float:
+    return rusage_mb(resource.RUSAGE_SELF)
+
+
+def peak_worker_rss_mb() -> float:
+    """Sum of the live workers' peak RSS (VmHWM), or the largest exited worker's without /proc."""
+    import multiprocessing
+    total_kb = 0
+    for child in multiprocessing.active_children():
+        try:
+            with open(f"/proc/{child.pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmHWM:"):
+                        total_kb += int(line.split()[1])
+        except (OSError, ValueError):
+            continue
+    return max(total_kb / 1024, rusage_mb(resource.RUSAGE_CHILDREN))
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    arr = np.asarray(values, dtype=np.float64)
+    return {
+        "mean": float(arr.mean()),
+        "p50": float(np.percentile(arr, 50)),
+        "p95": float(np.percentile(arr, 95)),
+        "min": float(arr.min()),
+        "max": float(arr.max()),
+    }
+
+
+def timed_run(api, main_bytes: bytes, ref_bytes: List[bytes], ref_names: List[str]) -> Dict[str, Any]:
+    """One direct pipeline run; each stage lasts from its first progress call to the next stage's."""
+    first_seen: Dict[str, float] = {}
+
+    def progress(stage: str, current: int = 0, total: int = 0):
+        first_seen.setdefault(stage, time.perf_counter())
+
+    start = time.perf_counter()
+    result = api.process_plagiarism_detection(main_bytes, ref_bytes, ref_names, api.MODEL_NAME, progress)
+    end = time.perf_counter()
+
+    marks = sorted(first_seen.items(), key=lambda kv: kv[1])
+    stages = {stage: 0.0 for stage in STAGES}
+    for (stage, t), (_, t_next) in zip(marks, marks[1:] + [("end", end)]):
+        stages[stage] = stages.get(stage, 0.0) + t_next - t
+    return {"total": end - start, "stages": stages, "sentences": result["total_sentences"]}
+
+
+def bench_stages(api, source: DocumentSource, runs: int, offset: int) -> Dict[str, Any]:
+    samples = []
+    for run in range(runs):
+        main_bytes, ref_bytes, ref_names = source.documents(offset + run)
+        samples.append(timed_run(api, main_bytes, ref_bytes, ref_names))
+        print(f"  run {run + 1}/{runs}: {samples[-1]['total'] * 1000:.0f} ms, {samples[-1]['sentences']} sentences")
+    total = sum(s["total"] for s in samples)
+    sentences = sum(s["sentences"] for s in samples)
+    return {
+        "runs": runs,
+        "sentences_per_run": sentences / max(1, runs),
+        "total_seconds": percentiles([s["total"] for s in samples]),
+        "stage_seconds": {stage: percentiles([s["stages"][stage] for s in samples]) for stage in STAGES},
+        "sentences_per_second": sentences / total if total else 0.0,
+        "peak_rss_mb": peak_rss_mb(),
+        "peak_worker_rss_mb": peak_worker_rss_mb(),
+    }
+
+
+async def bench_load(api, source: DocumentSource, concurrency: int, requests: int, offset: int) -> Dict[str, Any]:
+    import httpx
+
+    # Build the uploads up front so PDF generation isn't timed
+    uploads = []
+    for i in range(requests):
+        main_bytes, ref_bytes, ref_names = source.documents(offset + i)
+        files = [("files", ("student.pdf", main_bytes, "application/pdf"))]
+        files += [("files", (name, data, "application/pdf")) for name, data in zip(ref_names, ref_bytes)]
+        uploads.append(files)
+
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    sentences = 0
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one(client, files):
+        nonlocal sentences
+        async with gate:
+            start = time.perf_counter()
+            response = await client.post("/api/analyze", files=files)
+            latencies.append(time.perf_counter() - start)
+        if response.status_code == 200:
+            sentences += response.json()["total_sentences"]
+        else:
+            errors[str(response.status_code)] = errors.get(str(response.status_code), 0) + 1
+
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(one(client, files) for files in uploads))
+        wall = time.perf_counter() - start
+
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "wall_seconds": wall,
+        "latency_seconds": percentiles(latencies),
+        "requests_per_second": requests / wall if wall else 0.0,
+        "sentences_per_second": sentences / wall if wall else 0.0,
+        "peak_rss_mb": peak_rss_mb(),
+        "peak_worker_rss_mb": peak_worker_rss_mb(),
+    }
+
+
+# Reporting
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Lines describing each timing in ``current`` vs ``baseline``; a '!' marks a regression."""
+    pairs = []
+    if "stages" in current and "stages" in baseline:
+        pairs.append(("stages total p50", current["stages"]["total_seconds"].get("p50"),
+                      baseline["stages"]["total_seconds"].get("p50")))
+        for stage in STAGES:
+            pairs.append((f"stage {stage} p50", current["stages"]["stage_seconds"][stage].get("p50"),
+                          baseline["stages"]["stage_seconds"].get(stage, {}).get("p50")))
+    old_load = {run["concurrency"]: run for run in baseline.get("load", [])}
+    for run in current.get("load", []):
+        old = old_load.get(run["concurrency"])
+        if old:
+            for stat in ("p50", "p95"):
+                pairs.append((f"c={run['concurrency']} latency {stat}", run["latency_seconds"].get(stat),
+                              old["latency_seconds"].get(stat)))
+
+    lines = []
+    for label, new, old in pairs:
+        if not new or not old:
+            continue
+        change = new / old - 1
+        flag = "!" if change > tolerance else " "
+        lines.append(f"{flag} {label:<28} {old * 1000:9.1f} ms -> {new * 1000:9.1f} ms ({change:+.1%})")
+    return lines
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the PlagiaSense analysis pipeline")
+    parser.add_argument("--sentences", type=int, default=300, help="student sentences per synthetic document")
+    parser.add_argument("--references", type=int, default=3, help="synthetic reference documents per request")
+    parser.add_argument("--ref-sentences", type=int, default=300, help="sentences per synthetic reference")
+    parser.add_argument("--copied", type=float, default=0.2, help="fraction of each reference taken from the student text")
+    parser.add_argument("--samples", nargs="?", const=SAMPLE_DIR, default=None,
+                        help="use the PDFs in this directory (default: sample data/); the first is the student document")
+    parser.add_argument("--runs", type=int, default=5, help="direct pipeline runs for the stage timings")
+    parser.add_argument("--concurrency", default="1,4", help="comma-separated concurrency levels for the load test")
+    parser.add_argument("--requests", type=int, default=8, help="requests per concurrency level")
+    parser.add_argument("--warmup", type=int, default=1, help="untimed runs first (model load, JIT, pools)")
+    parser.add_argument("--no-cache", action="store_true", help="disable the text, sentence and reference caches")
+    parser.add_argument("--skip-stages", action="store_true")
+    parser.add_argument("--skip-load", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="write the results here as JSON")
+    parser.add_argument("--compare", default=None, help="earlier results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="slowdown that counts as a regression")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if args.no_cache:
+        import tempfile
+        os.environ["PLAGIASENSE_CACHE_DIR"] = tempfile.mkdtemp(prefix="plagiasense-bench-")
+        os.environ["REFERENCE_CACHE_ENABLED"] = "0"
+        os.environ["SENTENCE_CACHE"] = "0"
+        os.environ["PDF_TEXT_CACHE_MB"] = "0"
+
+    # Imported after the cache switches above, which api reads at import time
+    sys.path.insert(0, BACKEND_DIR)
+    import api
+
+    source = DocumentSource(args)
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    print(f"🚀 Benchmarking {api.MODEL_NAME} ({'sample PDFs' if args.samples else 'synthetic documents'})")
+
+    # Runs use distinct document seeds so no two share cached work
+    offset = 1_000_000
+    for i in range(args.warmup):
+        timed_run(api, *source.documents(offset + i))
+    offset += args.warmup
+
+    results: Dict[str, Any] = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "model": api.MODEL_NAME,
+        "config": {
+            "documents": "samples" if args.samples else "synthetic",
+            "sentences": args.sentences,
+            "references": args.references,
+            "ref_sentences": args.ref_sentences,
+            "copied": args.copied,
+            "no_cache": args.no_cache,
+            "embed_backend": api.EMBED_BACKEND,
+            "similarity_engine": api.SIMILARITY_ENGINE,
+            "lexical_prefilter": api.LEXICAL_PREFILTER,
+            "embed_batching": api.EMBED_BATCHING_ENABLED,
+        },
+    }
+
+    if not args.skip_stages:
+        print(f"⏱️ Stage timings ({args.runs} runs)")
+        results["stages"] = bench_stages(api, source, args.runs, offset)
+        offset += args.runs
+        for stage in STAGES:
+            s = results["stages"]["stage_seconds"][stage]
+            print(f"  {stage:<11} p50 {s['p50'] * 1000:8.1f} ms   p95 {s['p95'] * 1000:8.1f} ms")
+        print(f"  {results['stages']['sentences_per_second']:.0f} sentences/sec, "
+              f"peak RSS {results['stages']['peak_rss_mb']:.0f} MB, "
+              f"workers {results['stages']['peak_worker_rss_mb']:.0f} MB")
+
+    if not args.skip_load:
+        results["load"] = []
+        for concurrency in levels:
+            print(f"📈 Load: {args.requests} requests at concurrency {concurrency}")
+            run = asyncio.run(bench_load(api, source, concurrency, args.requests, offset))
+            offset += args.requests
+            results["load"].append(run)
+            lat = run["latency_seconds"]
+            print(f"  p50 {lat.get('p50', 0) * 1000:.0f} ms, p95 {lat.get('p95', 0) * 1000:.0f} ms, "
+                  f"{run['requests_per_second']:.2f} req/s, {run['sentences_per_second']:.0f} sentences/sec, "
+                  f"peak RSS {run['peak_rss_mb']:.0f} MB, workers {run['peak_worker_rss_mb']:.0f} MB" + (f", errors {run['errors']}" if run["errors"] else ""))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Results saved to {args.output}")
+
+    regressed = False
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"\n📊 Compared with {args.compare} ({baseline.get('commit') or 'unknown commit'})")
+        for line in compare(results, baseline, args.tolerance):
+            print(line)
+            regressed |= line.startswith("!")
+
+    api.executor.shutdown(wait=False)
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
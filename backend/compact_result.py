@@ -0,0 +1,126 @@
+"""
+Compact plagiarism result format.
+
+The full AnalysisResult carries an inline-styled HTML span per student
+sentence, with the matched reference sentence repeated in every tooltip and
+again in ``flagged_sentences``. The compact form sends the extracted text
+once, with sentence offsets into it. The offsets count UTF-16 code units,
+the unit JavaScript strings index by, so ``text.slice(start, end)`` is
+right even after astral characters (e.g. math-italic glyphs). Per-sentence scores and match indices
+go out as packed little-endian arrays (base64). Each matched reference
+sentence appears once, in a lookup table. The client renders highlights
+itself.
+
+Packed arrays are ``{"dtype", "shape", "data"}`` objects; ``data`` is base64
+of the raw bytes and ``dtype`` is ``float32``, ``int32`` or ``int8`` (the
+``match_types`` codes). In JavaScript, decode with the matching typed array
+(``Float32Array``, ``Int32Array`` or ``Int8Array``), e.g.
+``new Float32Array(Uint8Array.from(atob(data), c => c.charCodeAt(0)).buffer)``.
+"""
+
+import gzip
+import base64
+import json
+from typing import List, Dict, Tuple, Optional, Any
+
+import numpy as np
+
+try:
+    import brotli
+    BROTLI_SUPPORT = True
+except ImportError:
+    BROTLI_SUPPORT = False
+
+# Bodies smaller than this are not worth a compression round trip
+MIN_COMPRESS_BYTES = 1024
+
+
+def pack_array(arr: np.ndarray, dtype: str) -> Dict[str, Any]:
+    arr = np.ascontiguousarray(arr, dtype=np.dtype(dtype).newbyteorder("<"))
+    return {
+        "dtype": np.dtype(dtype).name,
+        "shape": list(arr.shape),
+        "data": base64.b64encode(arr.tobytes()).decode("ascii"),
+    }
+
+
+def unpack_array(packed: Dict[str, Any]) -> np.ndarray:
+    dtype = np.dtype(packed["dtype"]).newbyteorder("<")
+    return np.frombuffer(base64.b64decode(packed["data"]), dtype=dtype).reshape(packed["shape"])
+
+
+def utf16_offsets(text: str, offsets: List[int]) -> np.ndarray:
+    """Convert code-point offsets into ``text`` to UTF-16 code-unit offsets."""
+    code_points = np.frombuffer(text.encode("utf-32-le"), dtype="<u4")
+    # Characters above the BMP take two UTF-16 units (a surrogate pair)
+    extra = np.concatenate([[0], np.cumsum(code_points > 0xFFFF)])
+    offsets = np.asarray(offsets, dtype=np.int64)
+    return offsets + extra[offsets]
+
+
+def build_compact_result(text: str, starts: List[int], ends: List[int],
+                         top_scores: np.ndarray, top_idx: np.ndarray,
+                         ref_sentences: List[str], ref_doc_index: np.ndarray, ref_names: List[str],
+                         red: float, orange: float) -> Dict[str, Any]:
+    """Assemble the compact payload from the [n, k] top-k scores and reference indices."""
+    valid = np.isfinite(top_scores)
+    # Only reference sentences that are somebody's match go into the table
+    used, inverse = np.unique(top_idx[valid], return_inverse=True)
+    matches = np.full(top_idx.shape, -1, dtype=np.int32)
+    matches[valid] = inverse
+    scores = np.where(valid, top_scores, 0.0)
+
+    best = scores[:, 0]
+    red_count = int(np.count_nonzero(best >= red))
+    orange_count = int(np.count_nonzero((best >= orange) & (best < red)))
+    total = len(starts)
+
+    return {
+        "format": "compact",
+        "overall_score": (red_count + orange_count) / max(1, total),
+        "red_count": red_count,
+        "orange_count": orange_count,
+        "total_sentences": total,
+        "thresholds": {"red": red, "orange": orange},
+        "text": text,
+        # UTF-16 code-unit offsets into text
+        "sentence_starts": pack_array(utf16_offsets(text, starts), "int32"),
+        "sentence_ends": pack_array(utf16_offsets(text, ends), "int32"),
+        # [n, k] best first; matches index reference_sentences, -1 = no match
+        "scores": pack_array(scores, "float32"),
+        "matches": pack_array(matches, "int32"),
+        "reference_documents": ref_names,
+        "reference_sentences": [ref_sentences[int(i)] for i in used],
+        "reference_sentence_documents": [int(ref_doc_index[int(i)]) for i in used],
+    }
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick br or gzip from an Accept-Encoding header (q-values of 0 exclude)."""
+    offered = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            offered[name] = q
+    if BROTLI_SUPPORT and offered.get("br", 0) > 0:
+        return "br"
+    if offered.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+def encode_body(payload: Dict[str, Any], accept_encoding: str = "") -> Tuple[bytes, Optional[str]]:
+    """Serialise to compact JSON, compressed with the best encoding the client accepts."""
+    body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    encoding = negotiate_encoding(accept_encoding) if len(body) >= MIN_COMPRESS_BYTES else None
+    if encoding == "br":
+        body = brotli.compress(body, quality=5)
+    elif encoding == "gzip":
+        body = gzip.compress(body, compresslevel=6)
+    return body, encoding
@@ -0,0 +1,139 @@
+"""
+Content-addressed on-disk store for reference document embeddings.
+
+Each reference PDF is keyed by the SHA-256 of its bytes plus a namespace
+naming the embedding model and the sentence splitter, so the same course
+reading uploaded with many student submissions is only extracted, split and
+encoded once.
+"""
+
+import os
+import json
+import hashlib
+import threading
+from typing import List, Tuple, Dict, Optional, Any
+
+import numpy as np
+
+
+class ReferenceEntry:
+    """Sentences and float32 embeddings for a single reference document."""
+
+    def __init__(self, digest: str, sentences: List[str], embeddings: np.ndarray):
+        self.digest = digest
+        self.sentences = sentences
+        self.embeddings = embeddings
+
+
+class ReferenceCorpus:
+    """Reference entries concatenated into one row space with per-document offsets."""
+
+    def __init__(self, entries: List[ReferenceEntry], dim: int, model_name: str = ""):
+        # Stable identity of this exact set of documents, used to reuse search indexes
+        self.key = hashlib.sha256(
+            "\n".join([model_name] + [f"{e.digest}:{len(e.sentences)}" for e in entries]).encode("utf-8")
+        ).hexdigest()
+        self.sentences: List[str] = []
+        # offsets[d]..offsets[d + 1] are the rows belonging to reference doc d
+        self.offsets = np.zeros(len(entries) + 1, dtype=np.int64)
+        for doc_i, entry in enumerate(entries):
+            self.sentences.extend(entry.sentences)
+            self.offsets[doc_i + 1] = self.offsets[doc_i] + len(entry.sentences)
+
+        self._entries = entries
+        self._dim = dim
+        self._embeddings: Optional[np.ndarray] = None
+
+        # Which reference doc each row came from
+        self.doc_index = np.repeat(np.arange(len(entries)), np.diff(self.offsets))
+
+    @property
+    def embeddings(self) -> np.ndarray:
+        """All rows as one float32 matrix, concatenated on first use.
+
+        A search served by an index cached under ``key`` never needs it, so
+        warm requests skip the copy of every reference embedding.
+        """
+        if self._embeddings is None:
+            if self._entries:
+                self._embeddings = np.concatenate([e.embeddings for e in self._entries], axis=0).astype(np.float32, copy=False)
+            else:
+                self._embeddings = np.zeros((0, self._dim), dtype=np.float32)
+        return self._embeddings
+
+    def rows(self, idx: np.ndarray) -> np.ndarray:
+        """Embeddings of rows ``idx``, gathered per document without building the full matrix."""
+        if self._embeddings is not None:
+            return self._embeddings[idx]
+        out = np.empty((len(idx), self._dim), dtype=np.float32)
+        docs = self.doc_index[idx]
+        for doc_i in np.unique(docs):
+            mask = docs == doc_i
+            out[mask] = self._entries[doc_i].embeddings[idx[mask] - self.offsets[doc_i]]
+        return out
+
+
+class ReferenceStore:
+    """Persist sentences and embeddings keyed by (sha256, model and splitter namespace)."""
+
+    def __init__(self, root: str):
+        self.root = root
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _paths(self, digest: str, model_name: str) -> Tuple[str, str]:
+        model_dir = model_name.replace("/", "__")
+        base = os.path.join(self.root, model_dir, digest[:2], digest)
+        return base + ".json", base + ".npy"
+
+    def get(self, digest: str, model_name: str, max_sentences: int) -> Optional[ReferenceEntry]:
+        """Return the cached entry, or None if missing or built with other limits."""
+        meta_path, emb_path = self._paths(digest, model_name)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            sentences = meta["sentences"]
+            # A document truncated at a lower MAX_SENTENCES may have more rows now
+            truncated = len(sentences) >= meta["max_sentences"]
+            if truncated and max_sentences > meta["max_sentences"]:
+                raise KeyError("max_sentences raised")
+            embeddings = np.load(emb_path, mmap_mode="r")
+            if embeddings.shape[0] != len(sentences):
+                raise ValueError("corrupt cache entry")
+        except (OSError, ValueError, KeyError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        # Truncation keeps a prefix, so a lower limit is just a slice
+        return ReferenceEntry(digest, sentences[:max_sentences], embeddings[:max_sentences])
+
+    def put(self, digest: str, model_name: str, max_sentences: int,
+            sentences: List[str], embeddings: np.ndarray) -> ReferenceEntry:
+        """Write an entry atomically so concurrent readers never see partial files."""
+        meta_path, emb_path = self._paths(digest, model_name)
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        try:
+            os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+            tmp_suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(emb_path + tmp_suffix, "wb") as f:
+                np.save(f, embeddings)
+            os.replace(emb_path + tmp_suffix, emb_path)
+            with open(meta_path + tmp_suffix, "w", encoding="utf-8") as f:
+                json.dump({
+                    "digest": digest,
+                    "model": model_name,
+                    "max_sentences": max_sentences,
+                    "sentences": sentences,
+                }, f)
+            os.replace(meta_path + tmp_suffix, meta_path)
+        except OSError as e:
+            # A read-only or full disk should never fail the analysis itself
+            print(f"⚠️ Could not persist reference embeddings for {digest[:12]}: {e}")
+        return ReferenceEntry(digest, sentences, embeddings)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"root": self.root, "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,177 @@
+"""
+Cross-request dynamic batching for sentence embedding.
+
+Concurrent analyses used to call ``model.encode`` with their own small
+batches. Instead they submit sentences to a shared queue; one worker thread
+collects them for up to ``max_wait`` seconds, sorts them by length so each
+forward pass pads as little as possible, and runs batches of up to
+``max_batch_size``. Every caller gets back exactly its own rows, in order.
+"""
+
+import time
+import queue
+import threading
+from typing import List, Callable, Optional, Any
+
+import numpy as np
+
+from metrics import registry
+
+
+class _EncodeRequest:
+    """Sentences of one caller plus the buffer their embeddings are written into."""
+
+    def __init__(self, model, sentences: List[str], progress: Callable[[int, int], None]):
+        self.model = model
+        self.sentences = sentences
+        self.progress = progress
+        self.embeddings: Optional[np.ndarray] = None
+        self.remaining = len(sentences)
+        self.error: Optional[Exception] = None
+        self.done = threading.Event()
+
+
+class EmbeddingBatcher:
+    """Coalesce encode calls from concurrent requests into shared, length-bucketed batches."""
+
+    def __init__(self, max_batch_size: int = 64, max_wait: float = 0.005, max_batches_per_cycle: int = 8,
+                 timeout: float = 300.0):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        # Upper bound on how long a caller blocks, so a stuck worker cannot hang requests forever
+        self.timeout = timeout
+        # Bounds how long a large request can hold the worker before newer
+        # callers get a turn
+        self.max_batches_per_cycle = max_batches_per_cycle
+        self.batches_run = 0
+        self.sentences_encoded = 0
+        self._queue: "queue.Queue[_EncodeRequest]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_worker(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                self._thread.start()
+
+    def encode(self, model, sentences: List[str],
+               progress: Optional[Callable[[int, int], None]] = None) -> np.ndarray:
+        """Embed ``sentences`` with ``model``; blocks the calling thread until done."""
+        if not sentences:
+            return np.zeros((0, model.get_sentence_embedding_dimension()), dtype=np.float32)
+        request = _EncodeRequest(model, sentences, progress or (lambda done, total: None))
+        self._ensure_worker()
+        self._queue.put(request)
+        if not request.done.wait(self.timeout):
+            # The worker skips rows of a request that already has an error
+            request.error = TimeoutError(f"embedding timed out after {self.timeout:.0f}s")
+            raise request.error
+        if request.error is not None:
+            raise request.error
+        return request.embeddings
+
+    # ----------------------------------------------------------------- worker
+
+    def _collect(self, pending: List[Any]):
+        """Move queued requests into ``pending``, waiting up to max_wait for more."""
+        if not pending:
+            request = self._queue.get()
+            pending.extend((request, i) for i in range(len(request.sentences)))
+        deadline = time.monotonic() + self.max_wait
+        while len(pending) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            pending.extend((request, i) for i in range(len(request.sentences)))
+        # Whatever else already arrived joins this cycle without waiting
+        while True:
+            try:
+                request = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            pending.extend((request, i) for i in range(len(request.sentences)))
+
+    def _run(self):
+        pending: List[Any] = []
+        while True:
+            cycle: List[Any] = []
+            try:
+                self._collect(pending)
+
+                # Serve the oldest items first, and only those sharing its model
+                model = pending[0][0].model
+                cap = self.max_batch_size * self.max_batches_per_cycle
+                rest = []
+                for item in pending:
+                    if item[0].model is model and len(cycle) < cap:
+                        cycle.append(item)
+                    else:
+                        rest.append(item)
+                pending = rest
+
+                # Length bucketing: similar-length sentences pad to similar lengths
+                cycle.sort(key=lambda item: len(item[0].sentences[item[1]]))
+                for start in range(0, len(cycle), self.max_batch_size):
+                    self._run_batch(model, cycle[start:start + self.max_batch_size])
+            except Exception as e:
+                # Fail whoever is waiting instead of letting the worker die with them blocked
+                print(f"⚠️ Embedding batcher cycle failed: {e}")
+                for request, _ in cycle + pending:
+                    if request.error is None:
+                        request.error = e
+                    request.done.set()
+                pending = []
+
+    def _run_batch(self, model, batch: List[Any]):
+        requests = {id(request): request for request, _ in batch}
+        began = time.perf_counter()
+        try:
+            emb = model.encode(
+                [request.sentences[i] for request, i in batch],
+                batch_size=len(batch),
+                convert_to_numpy=True,
+                show_progress_bar=False
+            )
+        except Exception as e:
+            for request in requests.values():
+                if request.error is None:
+                    request.error = e
+                    request.done.set()
+            return
+
+        registry.observe("plagiasense_embedding_batch_seconds", time.perf_counter() - began)
+        registry.inc("plagiasense_embedding_batch_sentences_total", len(batch))
+        self.batches_run += 1
+        self.sentences_encoded += len(batch)
+        for (request, i), row in zip(batch, emb):
+            if request.error is not None:
+                continue
+            if request.embeddings is None:
+                request.embeddings = np.empty((len(request.sentences), emb.shape[1]), dtype=np.float32)
+            request.embeddings[i] = row
+            request.remaining -= 1
+        for request in requests.values():
+            if request.error is not None:
+                continue
+            total = len(request.sentences)
+            try:
+                request.progress(total - request.remaining, total)
+            except Exception as e:
+                print(f"⚠️ Embedding progress callback failed: {e}")
+            if request.remaining == 0:
+                request.done.set()
+
+    def stats(self):
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "queued_requests": self._queue.qsize(),
+            "batches_run": self.batches_run,
+            "sentences_encoded": self.sentences_encoded,
+            "avg_batch_size": self.sentences_encoded / self.batches_run if self.batches_run else 0.0,
+        }
@@ -0,0 +1,164 @@
+"""
+Sentence-level embedding cache.
+
+Submissions for the same assignment repeat prompts, quoted questions and stock
+phrasing, so embeddings are cached per (model, sentence). The in-memory tier
+is an LRU bounded by a byte budget. An optional on-disk tier is a fixed-size
+memory-mapped hash table, one per model, that survives restarts and is shared
+by every worker on the host.
+"""
+
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Tuple, Dict, Optional, Any
+
+import numpy as np
+
+KEY_BYTES = 16
+# Rough per-entry cost of the OrderedDict slot, key object and array header
+ENTRY_OVERHEAD = 200
+
+
+def sentence_key(model_name: str, sentence: str) -> bytes:
+    return hashlib.blake2b(f"{model_name}\0{sentence}".encode("utf-8"), digest_size=KEY_BYTES).digest()
+
+
+class DiskEmbeddingTable:
+    """Open-addressing hash table of embeddings in two memory-mapped files.
+
+    A full probe window overwrites its first slot, so the table behaves like a
+    cache with ``capacity`` rows rather than growing without bound.
+    """
+
+    PROBES = 8
+
+    def __init__(self, path: str, capacity: int, dim: int):
+        os.makedirs(path, exist_ok=True)
+        self.capacity = capacity
+        self.dim = dim
+        keys_path = os.path.join(path, f"keys-{capacity}.bin")
+        vectors_path = os.path.join(path, f"vectors-{capacity}x{dim}.f32")
+        self.keys = np.memmap(keys_path, dtype=np.uint8, shape=(capacity, KEY_BYTES),
+                              mode="r+" if os.path.exists(keys_path) else "w+")
+        self.vectors = np.memmap(vectors_path, dtype=np.float32, shape=(capacity, dim),
+                                 mode="r+" if os.path.exists(vectors_path) else "w+")
+        self._lock = threading.Lock()
+
+    def _slots(self, key: bytes):
+        start = int.from_bytes(key[:8], "little") % self.capacity
+        return [(start + i) % self.capacity for i in range(self.PROBES)]
+
+    def get(self, key: bytes) -> Optional[np.ndarray]:
+        want = np.frombuffer(key, dtype=np.uint8)
+        for slot in self._slots(key):
+            stored = self.keys[slot]
+            if np.array_equal(stored, want):
+                return np.array(self.vectors[slot])
+            if not stored.any():
+                return None
+        return None
+
+    def put(self, key: bytes, vector: np.ndarray):
+        want = np.frombuffer(key, dtype=np.uint8)
+        with self._lock:
+            slots = self._slots(key)
+            target = slots[0]
+            for slot in slots:
+                stored = self.keys[slot]
+                if not stored.any() or np.array_equal(stored, want):
+                    target = slot
+                    break
+            # Vector first, key last: a reader never matches a half-written row
+            self.keys[target] = 0
+            self.vectors[target] = vector
+            self.keys[target] = want
+
+
+class SentenceEmbeddingCache:
+    """LRU of sentence embeddings under a byte budget, optionally backed by disk."""
+
+    def __init__(self, budget_bytes: int, disk_dir: Optional[str] = None, disk_rows: int = 0):
+        self.budget_bytes = budget_bytes
+        self.disk_dir = disk_dir
+        self.disk_rows = disk_rows
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._bytes = 0
+        self._tables: Dict[str, DiskEmbeddingTable] = {}
+        self._lock = threading.Lock()
+
+    def _table(self, model_name: str, dim: int) -> Optional[DiskEmbeddingTable]:
+        if not self.disk_dir or self.disk_rows <= 0:
+            return None
+        table = self._tables.get(model_name)
+        if table is None:
+            try:
+                table = DiskEmbeddingTable(
+                    os.path.join(self.disk_dir, model_name.replace("/", "__")), self.disk_rows, dim
+                )
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Sentence embedding disk cache unavailable: {e}")
+                self.disk_rows = 0
+                return None
+            self._tables[model_name] = table
+        return table
+
+    def _remember(self, key: bytes, vector: np.ndarray):
+        size = vector.nbytes + ENTRY_OVERHEAD
+        if key in self._entries or size > self.budget_bytes:
+            return
+        self._entries[key] = vector
+        self._bytes += size
+        while self._bytes > self.budget_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.nbytes + ENTRY_OVERHEAD
+            self.evictions += 1
+
+    def lookup(self, model_name: str, sentences: List[str], dim: int) -> Tuple[List[Optional[np.ndarray]], List[bytes]]:
+        """Return cached rows (None for misses) and the key of every sentence."""
+        keys = [sentence_key(model_name, s) for s in sentences]
+        rows: List[Optional[np.ndarray]] = []
+        with self._lock:
+            table = self._table(model_name, dim)
+            for key in keys:
+                row = self._entries.get(key)
+                if row is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                elif table is not None:
+                    row = table.get(key)
+                    if row is not None:
+                        self.disk_hits += 1
+                        self._remember(key, row)
+                if row is None:
+                    self.misses += 1
+                rows.append(row)
+        return rows, keys
+
+    def store(self, model_name: str, keys: List[bytes], embeddings: np.ndarray):
+        with self._lock:
+            table = self._table(model_name, embeddings.shape[1]) if len(keys) else None
+            for key, row in zip(keys, embeddings):
+                row = np.array(row, dtype=np.float32)
+                self._remember(key, row)
+                if table is not None:
+                    table.put(key, row)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "budget_bytes": self.budget_bytes,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            "disk_rows": self.disk_rows,
+        }
@@ -0,0 +1,101 @@
+"""
+CPU inference backends for the Sentence-BERT models.
+
+* ``torch`` - the full-precision PyTorch model (default).
+* ``int8``  - the same model with every ``nn.Linear`` dynamically quantized to
+  int8; roughly 2x faster encodes and a quarter of the linear-layer RAM.
+* ``onnx``  - an exported ONNX graph run by onnxruntime through
+  sentence-transformers' ``backend="onnx"`` (needs sentence-transformers>=3.2,
+  optimum and onnxruntime).
+
+Reduced-precision backends shift similarity scores slightly, so
+``parity_report`` compares their scores with fp32 on a fixed set of pairs
+before they are trusted with the red/orange thresholds.
+"""
+
+from typing import List, Tuple, Dict, Optional, Any
+
+import numpy as np
+
+BACKENDS = ("torch", "int8", "onnx")
+
+# Paraphrases, near-copies and unrelated pairs spanning the score range
+PARITY_PAIRS: List[Tuple[str, str]] = [
+    ("The mitochondria is the powerhouse of the cell.",
+     "Mitochondria are known as the powerhouse of the cell."),
+    ("Climate change is driven largely by greenhouse gas emissions.",
+     "Greenhouse gas emissions are the main driver of climate change."),
+    ("The experiment was repeated three times to ensure reliability.",
+     "To make sure the results were reliable, the experiment was run three times."),
+    ("Shakespeare wrote Hamlet at the beginning of the seventeenth century.",
+     "Hamlet was written by Shakespeare around 1600."),
+    ("Neural networks learn representations from large amounts of data.",
+     "Deep learning models extract features automatically from big datasets."),
+    ("The French Revolution began in 1789.",
+     "Photosynthesis converts light energy into chemical energy."),
+    ("Interest rates were raised to control inflation.",
+     "The central bank increased rates in order to curb rising prices."),
+    ("The sample size was too small to draw firm conclusions.",
+     "My favourite food is pasta with tomato sauce."),
+    ("Water boils at 100 degrees Celsius at sea level.",
+     "At sea level, the boiling point of water is 100 degrees Celsius."),
+    ("The survey results indicate strong support for the policy.",
+     "Most respondents in the survey supported the policy."),
+]
+
+
+def load_sentence_model(model_name: str, backend: str = "torch", device: str = "cpu",
+                        onnx_file_name: Optional[str] = None):
+    """Load a SentenceTransformer for the requested inference backend."""
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{backend}'. Choose from: {', '.join(BACKENDS)}")
+
+    if backend == "torch":
+        return SentenceTransformer(model_name, device=device)
+
+    if backend == "int8":
+        # Dynamic quantization is a CPU-only kernel
+        model = SentenceTransformer(model_name, device="cpu")
+        torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+        return model.eval()
+
+    kwargs: Dict[str, Any] = {"backend": "onnx", "device": "cpu"}
+    if onnx_file_name:
+        kwargs["model_kwargs"] = {"file_name": onnx_file_name}
+    try:
+        return SentenceTransformer(model_name, **kwargs)
+    except TypeError:
+        raise RuntimeError("The onnx backend needs sentence-transformers>=3.2 "
+                           "(pip install 'sentence-transformers[onnx]')")
+
+
+def pair_scores(model, pairs: List[Tuple[str, str]]) -> np.ndarray:
+    """Cosine similarity of each (a, b) pair, as process_plagiarism_detection would score it."""
+    a = model.encode([p[0] for p in pairs], convert_to_numpy=True, show_progress_bar=False)
+    b = model.encode([p[1] for p in pairs], convert_to_numpy=True, show_progress_bar=False)
+    a = a / np.maximum(np.linalg.norm(a, axis=1, keepdims=True), 1e-12)
+    b = b / np.maximum(np.linalg.norm(b, axis=1, keepdims=True), 1e-12)
+    return np.sum(a * b, axis=1)
+
+
+def risk_band(scores: np.ndarray, red: float, orange: float) -> np.ndarray:
+    return np.where(scores >= red, 2, np.where(scores >= orange, 1, 0))
+
+
+def parity_report(reference_model, candidate_model, red: float, orange: float,
+                  pairs: Optional[List[Tuple[str, str]]] = None) -> Dict[str, Any]:
+    """Compare candidate-backend scores against the fp32 reference model."""
+    pairs = pairs or PARITY_PAIRS
+    ref = pair_scores(reference_model, pairs)
+    cand = pair_scores(candidate_model, pairs)
+    diff = np.abs(ref - cand)
+    return {
+        "pairs": len(pairs),
+        "max_score_diff": float(diff.max()),
+        "mean_score_diff": float(diff.mean()),
+        # Share of pairs that land in the same red/orange/clear band
+        "band_agreement": float(np.mean(risk_band(ref, red, orange) == risk_band(cand, red, orange))),
+    }
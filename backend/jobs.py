@@ -0,0 +1,148 @@
+"""
+In-memory background jobs for long analyses.
+
+A POST to a job endpoint returns immediately with a job id; the work runs on
+the shared executor and reports stage-level progress that clients poll. Jobs
+are purged once they have been finished for longer than ``ttl_seconds``.
+"""
+
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Any
+
+from fastapi import HTTPException
+
+
+# Rough share of total work per stage, used to turn stage progress into a percentage
+STAGE_WEIGHTS = OrderedDict([
+    ("queued", 0.0),
+    ("extracting", 0.15),
+    ("splitting", 0.05),
+    ("encoding", 0.55),
+    ("scoring", 0.15),
+    ("building", 0.10),
+])
+
+
+class Job:
+    """State of one submitted analysis."""
+
+    def __init__(self, kind: str):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = "queued"  # queued, running, done, failed
+        self.stage = "queued"
+        self.current = 0
+        self.total = 0
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.error_status = 500
+
+    def percent(self) -> float:
+        if self.status == "done":
+            return 100.0
+        done = 0.0
+        for stage, weight in STAGE_WEIGHTS.items():
+            if stage == self.stage:
+                if self.total:
+                    done += weight * min(1.0, self.current / self.total)
+                break
+            done += weight
+        return round(100.0 * done, 1)
+
+    def to_status(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "stage": self.stage,
+            "stage_progress": {"current": self.current, "total": self.total},
+            "percent": self.percent(),
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+        }
+
+
+class JobStore:
+    """Thread-safe registry of jobs with time-based expiry of finished ones."""
+
+    def __init__(self, ttl_seconds: float = 3600, max_jobs: int = 1000):
+        self.ttl_seconds = ttl_seconds
+        self.max_jobs = max_jobs
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _purge(self):
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_at is not None and now - job.finished_at > self.ttl_seconds
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def create(self, kind: str) -> Job:
+        with self._lock:
+            self._purge()
+            active = sum(1 for job in self._jobs.values() if job.finished_at is None)
+            if active >= self.max_jobs:
+                raise HTTPException(status_code=503, detail="Too many analysis jobs in progress, try again later")
+            # Make room by dropping the oldest finished jobs first
+            while len(self._jobs) >= self.max_jobs:
+                oldest = next(job_id for job_id, job in self._jobs.items() if job.finished_at is not None)
+                del self._jobs[oldest]
+            job = Job(kind)
+            self._jobs[job.id] = job
+            return job
+
+    def get(self, job_id: str) -> Job:
+        with self._lock:
+            self._purge()
+            job = self._jobs.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found or expired")
+        return job
+
+    def progress_callback(self, job: Job) -> Callable[[str, int, int], None]:
+        """Return a ``progress(stage, current, total)`` hook bound to a job."""
+        def progress(stage: str, current: int = 0, total: int = 0):
+            with self._lock:
+                job.status = "running"
+                job.stage = stage
+                job.current = current
+                job.total = total
+        return progress
+
+    def fail(self, job: Job, error: str, status_code: int = 500):
+        """Mark a job failed; like finished jobs, it expires after ``ttl_seconds``."""
+        with self._lock:
+            job.status = "failed"
+            job.error = error
+            job.error_status = status_code
+            job.finished_at = time.time()
+
+    def run(self, job: Job, fn: Callable[..., Dict[str, Any]], *args, **kwargs):
+        """Execute ``fn`` for a job, recording its result or error. Runs in a worker thread."""
+        try:
+            result = fn(*args, progress=self.progress_callback(job), **kwargs)
+        except HTTPException as e:
+            self.fail(job, str(e.detail), e.status_code)
+        except Exception as e:
+            self.fail(job, f"Processing error: {e}")
+        else:
+            with self._lock:
+                job.status = "done"
+                job.result = result
+                job.finished_at = time.time()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            return counts
@@ -0,0 +1,179 @@
+"""
+Lexical pre-filter for verbatim and near-verbatim copying.
+
+Before the dense Sentence-BERT stage, student sentences are matched against
+the reference sentences on their surface form:
+
+* exact: the same text once case, punctuation and spacing are normalised,
+  found with a dictionary lookup. These sentences skip embedding entirely.
+* near-exact: word 3-gram shingles summarised by MinHash signatures and
+  bucketed with LSH banding. A student sentence's candidates are the
+  reference sentences sharing a band, kept if their estimated Jaccard
+  similarity clears the threshold. The semantic stage then scores only
+  those candidates instead of the whole corpus.
+"""
+
+import re
+import zlib
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Tuple, Callable
+
+import numpy as np
+
+NON_WORD_RE = re.compile(r"[\W_]+")
+
+
+def normalize_sentence(sentence: str) -> str:
+    """Lowercase, with every run of punctuation/whitespace turned into one space."""
+    return NON_WORD_RE.sub(" ", sentence.lower()).strip()
+
+
+def shingle_hashes(normalized: List[str], size: int = 3) -> Tuple[np.ndarray, np.ndarray]:
+    """64-bit hashes of the word ``size``-grams of every sentence: (flat hashes, count per sentence).
+
+    Sentences shorter than ``size`` words contribute one shingle of all their words.
+    """
+    tokens = [text.split() for text in normalized]
+    lengths = np.array([len(t) for t in tokens], dtype=np.int64)
+    h = np.fromiter((zlib.crc32(w.encode("utf-8")) for t in tokens for w in t),
+                    dtype=np.uint64, count=int(lengths.sum()))
+    width = np.minimum(lengths, size)
+    counts = np.where(lengths > 0, lengths - width + 1, 0)
+    out = np.zeros(int(counts.sum()), dtype=np.uint64)
+    if not len(out):
+        return out, counts
+
+    # Window start (in h) of every output shingle, and its width
+    sent = np.repeat(np.arange(len(tokens)), counts)
+    out_starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    tok_starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    pos = tok_starts[sent] + np.arange(len(out)) - out_starts[sent]
+    w = width[sent]
+    # Polynomial combination of consecutive token hashes (wraps mod 2^64)
+    with np.errstate(over="ignore"):
+        for i in range(size):
+            take = w > i
+            out[take] = out[take] * np.uint64(0x100000001B3) + h[pos[take] + i]
+    return out, counts
+
+
+class LexicalIndex:
+    """Exact-text table plus MinHash-LSH over the shingles of reference sentences."""
+
+    def __init__(self, sentences: List[str], num_perm: int = 64, bands: int = 16,
+                 shingle_size: int = 3, seed: int = 1, chunk_shingles: int = 65536):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows_per_band = num_perm // bands
+        self.shingle_size = shingle_size
+        self.chunk_shingles = chunk_shingles
+        rng = np.random.default_rng(seed)
+        # Multiply-shift hash family; odd multipliers keep the map a bijection
+        self._a = rng.integers(1, 2 ** 63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+        self._band_mult = rng.integers(1, 2 ** 63, size=self.rows_per_band, dtype=np.uint64) | np.uint64(1)
+
+        self.size = len(sentences)
+        self.exact: Dict[str, List[int]] = {}
+        normalized = [normalize_sentence(s) for s in sentences]
+        for row, text in enumerate(normalized):
+            if text:
+                self.exact.setdefault(text, []).append(row)
+
+        self.signatures = self._signatures(normalized)
+        # Per band: sorted bucket keys and the reference rows in that order
+        self._band_keys = []
+        self._band_rows = []
+        for keys in self._band_hashes(self.signatures):
+            order = np.argsort(keys, kind="stable")
+            self._band_keys.append(keys[order])
+            self._band_rows.append(order)
+
+    def _signatures(self, normalized: List[str]) -> np.ndarray:
+        flat, counts = shingle_hashes(normalized, self.shingle_size)
+        sig = np.full((len(normalized), self.num_perm), np.iinfo(np.uint64).max, dtype=np.uint64)
+        bounds = np.concatenate([[0], np.cumsum(counts)])
+        nonempty = np.flatnonzero(counts)
+        # Sentences are processed in chunks so the [num_perm, shingles] matrix stays small
+        start = 0
+        while start < len(nonempty):
+            stop = int(np.searchsorted(bounds[nonempty + 1], bounds[nonempty[start]] + self.chunk_shingles, side="right"))
+            stop = max(stop, start + 1)
+            rows = nonempty[start:stop]
+            lo, hi = bounds[rows[0]], bounds[rows[-1] + 1]
+            with np.errstate(over="ignore"):
+                hashed = (self._a[:, None] * flat[None, lo:hi] + self._b[:, None]) >> np.uint64(32)
+            sig[rows] = np.minimum.reduceat(hashed, bounds[rows] - lo, axis=1).T
+            start = stop
+        return sig
+
+    def _band_hashes(self, signatures: np.ndarray) -> List[np.ndarray]:
+        r = self.rows_per_band
+        hashes = []
+        with np.errstate(over="ignore"):
+            for band in range(self.bands):
+                rows = signatures[:, band * r:(band + 1) * r]
+                hashes.append((rows * self._band_mult[None, :]).sum(axis=1, dtype=np.uint64) + np.uint64(band))
+        return hashes
+
+    def exact_matches(self, sentences: List[str]) -> List[List[int]]:
+        """Reference rows with the same normalised text as each sentence (empty when none)."""
+        return [self.exact.get(normalize_sentence(s), []) for s in sentences]
+
+    def candidates(self, sentences: List[str], threshold: float = 0.5,
+                   max_candidates: int = 32) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """LSH candidates per sentence as (rows, estimated Jaccard), best first, above ``threshold``."""
+        if not sentences or self.size == 0:
+            return [(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)) for _ in sentences]
+        sig = self._signatures([normalize_sentence(s) for s in sentences])
+        empty = (sig == np.iinfo(np.uint64).max).all(axis=1)
+        ranges = []
+        for band, keys in enumerate(self._band_hashes(sig)):
+            lo = np.searchsorted(self._band_keys[band], keys, side="left")
+            hi = np.searchsorted(self._band_keys[band], keys, side="right")
+            ranges.append((lo, hi))
+
+        out = []
+        for i in range(len(sentences)):
+            if empty[i]:
+                out.append((np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)))
+                continue
+            parts = [self._band_rows[band][lo[i]:hi[i]] for band, (lo, hi) in enumerate(ranges) if hi[i] > lo[i]]
+            rows = np.unique(np.concatenate(parts)) if parts else np.zeros(0, dtype=np.int64)
+            jaccard = (self.signatures[rows] == sig[i]).mean(axis=1).astype(np.float32)
+            keep = jaccard >= threshold
+            rows, jaccard = rows[keep], jaccard[keep]
+            order = np.argsort(-jaccard, kind="stable")[:max_candidates]
+            out.append((rows[order].astype(np.int64), jaccard[order]))
+        return out
+
+
+class LexicalIndexCache:
+    """A few LexicalIndex objects keyed by reference set, rebuilt only for new sets."""
+
+    def __init__(self, max_indexes: int = 4, **index_kwargs):
+        self.max_indexes = max_indexes
+        self.index_kwargs = index_kwargs
+        self.builds = 0
+        self._indexes: "OrderedDict[str, LexicalIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, sentences: Callable[[], List[str]]) -> LexicalIndex:
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is not None:
+                self._indexes.move_to_end(key)
+                return index
+        index = LexicalIndex(sentences(), **self.index_kwargs)
+        with self._lock:
+            self.builds += 1
+            self._indexes[key] = index
+            while len(self._indexes) > self.max_indexes:
+                self._indexes.popitem(last=False)
+        return index
+
+    def stats(self) -> Dict[str, int]:
+        return {"cached_indexes": len(self._indexes), "builds": self.builds, **self.index_kwargs}
@@ -0,0 +1,236 @@
+"""
+Stage timings and Prometheus metrics.
+
+Hot-path code wraps each stage in ``stage("encoding")``. The stage's wall
+time goes into a process-wide histogram, and into the ``RequestTimings`` of
+the request that ran it, if one is active. Wall time and the thread's CPU time are
+kept apart. A stage whose CPU time is close to its wall time was compute
+bound. A large gap means it waited: on the PDF process pool, the embedding
+batcher, disk or a lock. Time spent queued for a worker thread is recorded
+separately by ``InstrumentedExecutor``.
+
+The active ``RequestTimings`` lives in a context variable.
+``InstrumentedExecutor`` runs every task in a copy of the submitter's
+context, so stages on worker threads are credited to the request that
+queued them.
+
+``registry.render()`` is the Prometheus text exposition format. Collectors
+added with ``add_collector`` are sampled at scrape time, which is how the
+counters that caches already keep in ``stats()`` are exported.
+"""
+
+import time
+import bisect
+import threading
+import contextvars
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Tuple, Optional, Callable, Iterable, Any
+
+# Seconds; covers a cached lookup up to a long document on CPU
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+# (name, type, help, labels, value) as returned by collectors
+Sample = Tuple[str, str, str, Dict[str, Any], float]
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metrics:
+    """Counters and histograms keyed by name and label set."""
+
+    def __init__(self):
+        self._help: Dict[str, Tuple[str, str]] = {}
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[str, Dict[Labels, List[float]]] = {}
+        self._buckets: Dict[str, Tuple[float, ...]] = {}
+        self._collectors: List[Callable[[], Iterable[Sample]]] = []
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help_text: str):
+        self._help[name] = ("counter", help_text)
+        self._counters.setdefault(name, {})
+
+    def histogram(self, name: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self._help[name] = ("histogram", help_text)
+        self._buckets[name] = tuple(buckets)
+        self._histograms.setdefault(name, {})
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        key = _labels(labels)
+        with self._lock:
+            series = self._counters[name]
+            series[key] = series.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = _labels(labels)
+        buckets = self._buckets[name]
+        with self._lock:
+            # Count per bucket (the last one is +Inf), then sum and count
+            state = self._histograms[name].setdefault(key, [0.0] * (len(buckets) + 3))
+            state[bisect.bisect_left(buckets, value)] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def add_collector(self, collector: Callable[[], Iterable[Sample]]):
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            for name, series in self._counters.items():
+                kind, help_text = self._help[name]
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+                lines += [f"{name}{_format_labels(k)} {_format_value(v)}" for k, v in series.items()]
+            for name, series in self._histograms.items():
+                _, help_text = self._help[name]
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+                buckets = self._buckets[name]
+                for key, state in series.items():
+                    cumulative = 0.0
+                    for bound, n in zip(buckets + (float("inf"),), state):
+                        cumulative += n
+                        lines.append(f"{name}_bucket{_format_labels(key, ('le', _format_value(bound)))} {_format_value(cumulative)}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {_format_value(state[-2])}")
+                    lines.append(f"{name}_count{_format_labels(key)} {_format_value(state[-1])}")
+
+        seen = set()
+        for collector in self._collectors:
+            try:
+                samples = list(collector())
+            except Exception as e:
+                print(f"⚠️ Metrics collector failed: {e}")
+                continue
+            for name, kind, help_text, labels, value in samples:
+                if name not in seen:
+                    seen.add(name)
+                    lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+                lines.append(f"{name}{_format_labels(_labels(labels))} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Metrics()
+registry.counter("plagiasense_requests_total", "HTTP requests by route and status code")
+registry.histogram("plagiasense_request_seconds", "HTTP request latency by route")
+registry.histogram("plagiasense_stage_seconds", "Wall time of each pipeline stage")
+registry.counter("plagiasense_stage_cpu_seconds_total", "Thread CPU time of each pipeline stage")
+registry.histogram("plagiasense_executor_queue_seconds", "Time a task waited for a worker thread")
+registry.histogram("plagiasense_admission_wait_seconds", "Time a request waited for an analysis slot")
+registry.histogram("plagiasense_pdf_page_seconds", "PDF text extraction time per page")
+registry.histogram("plagiasense_embedding_batch_seconds", "Forward pass time per embedding batch")
+registry.counter("plagiasense_embedding_batch_sentences_total", "Sentences encoded by the embedding batcher")
+registry.counter("plagiasense_model_loads_total", "Models loaded into memory")
+
+
+class RequestTimings:
+    """Per-request breakdown: wall and CPU seconds per stage, queue wait and counters."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self.queue_wait = 0.0
+        self.counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def add_stage(self, name: str, seconds: float, cpu_seconds: float):
+        with self._lock:
+            entry = self.stages.setdefault(name, {"seconds": 0.0, "cpu_seconds": 0.0, "calls": 0})
+            entry["seconds"] += seconds
+            entry["cpu_seconds"] += cpu_seconds
+            entry["calls"] += 1
+
+    def add_queue_wait(self, seconds: float):
+        with self._lock:
+            self.queue_wait += seconds
+
+    def count(self, name: str, value: int = 1):
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + value
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "total_seconds": time.perf_counter() - self.start,
+                "queue_wait_seconds": self.queue_wait,
+                "stages": {name: dict(entry) for name, entry in self.stages.items()},
+                "counts": dict(self.counts),
+            }
+
+    def server_timing(self) -> str:
+        """The stages as a Server-Timing header value (milliseconds)."""
+        with self._lock:
+            parts = [f"queue;dur={self.queue_wait * 1000:.1f}"] if self.queue_wait else []
+            parts += [f"{name};dur={entry['seconds'] * 1000:.1f}" for name, entry in self.stages.items()]
+        return ", ".join(parts)
+
+
+current_timings: "contextvars.ContextVar[Optional[RequestTimings]]" = contextvars.ContextVar("current_timings", default=None)
+
+
+def record_count(name: str, value: int = 1):
+    """Add to a counter of the active request's timings, if any."""
+    timings = current_timings.get()
+    if timings is not None and value:
+        timings.count(name, value)
+
+
+@contextmanager
+def stage(name: str):
+    """Time a pipeline stage into the stage histogram and the active request's timings."""
+    wall = time.perf_counter()
+    cpu = time.thread_time()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - wall
+        cpu_seconds = time.thread_time() - cpu
+        registry.observe("plagiasense_stage_seconds", seconds, stage=name)
+        registry.inc("plagiasense_stage_cpu_seconds_total", cpu_seconds, stage=name)
+        timings = current_timings.get()
+        if timings is not None:
+            timings.add_stage(name, seconds, cpu_seconds)
+
+
+class InstrumentedExecutor(ThreadPoolExecutor):
+    """Thread pool that records queue wait and runs tasks in the submitter's context."""
+
+    def __init__(self, max_workers: Optional[int] = None, thread_name_prefix: str = "worker"):
+        super().__init__(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
+        self.name = thread_name_prefix
+        self.queued = 0
+        self._queued_lock = threading.Lock()
+
+    def submit(self, fn, *args, **kwargs):
+        submitted = time.perf_counter()
+        context = contextvars.copy_context()
+        with self._queued_lock:
+            self.queued += 1
+
+        def run():
+            with self._queued_lock:
+                self.queued -= 1
+            waited = time.perf_counter() - submitted
+            registry.observe("plagiasense_executor_queue_seconds", waited, executor=self.name)
+            timings = current_timings.get()
+            if timings is not None:
+                timings.add_queue_wait(waited)
+            return fn(*args, **kwargs)
+
+        return super().submit(context.run, run)
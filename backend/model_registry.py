@@ -0,0 +1,105 @@
+"""
+Registry of loaded Sentence-BERT models.
+
+Requests may pick any model advertised by /api/models. Loaded models are kept
+in an LRU bounded by an estimated RAM budget; the least recently used model
+is dropped when a new one would not fit. Loading is serialised per model name
+so concurrent first requests never load the same weights twice.
+"""
+
+import time
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Any
+
+AVAILABLE_MODELS = {
+    "all-MiniLM-L6-v2": "Fast & Balanced",
+    "all-mpnet-base-v2": "High Quality",
+    "all-distilroberta-v1": "Good Balance"
+}
+
+
+def resolve_model_name(name: str) -> str:
+    """Map a short /api/models name to its Hugging Face id; full ids pass through."""
+    short = name.split("/")[-1]
+    if short not in AVAILABLE_MODELS:
+        raise ValueError(f"Unknown model '{name}'. Choose from: {', '.join(AVAILABLE_MODELS)}")
+    return f"sentence-transformers/{short}"
+
+
+def estimate_model_bytes(model) -> int:
+    """Size of the model's parameters and buffers, the bulk of its resident memory."""
+    try:
+        params = sum(p.numel() * p.element_size() for p in model.parameters())
+        buffers = sum(b.numel() * b.element_size() for b in model.buffers())
+        return params + buffers
+    except Exception:
+        return 0
+
+
+class ModelRegistry:
+    """LRU of loaded models under a RAM budget, with per-model load locks."""
+
+    def __init__(self, loader: Callable[[str], Any], budget_bytes: int):
+        self.loader = loader
+        self.budget_bytes = budget_bytes
+        self.loads = 0
+        self.evictions = 0
+        self._models: "OrderedDict[str, Any]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._load_seconds: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._models
+
+    def get(self, name: str):
+        with self._lock:
+            model = self._models.get(name)
+            if model is not None:
+                self._models.move_to_end(name)
+                return model
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+
+        with load_lock:
+            # Another thread may have finished loading while we waited
+            with self._lock:
+                model = self._models.get(name)
+                if model is not None:
+                    self._models.move_to_end(name)
+                    return model
+            start = time.time()
+            model = self.loader(name)
+            size = estimate_model_bytes(model)
+            with self._lock:
+                self.loads += 1
+                self._load_seconds[name] = time.time() - start
+                self._models[name] = model
+                self._sizes[name] = size
+                self._evict(keep=name)
+            return model
+
+    def _evict(self, keep: str):
+        while sum(self._sizes.values()) > self.budget_bytes and len(self._models) > 1:
+            oldest = next(iter(self._models))
+            if oldest == keep:
+                self._models.move_to_end(keep)
+                continue
+            # In-flight requests hold their own reference; memory is freed after them
+            del self._models[oldest]
+            del self._sizes[oldest]
+            self.evictions += 1
+            print(f"♻️ Evicted model {oldest} to stay within the model memory budget")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "loaded": {
+                    name: {"bytes": self._sizes.get(name, 0), "load_seconds": self._load_seconds.get(name)}
+                    for name in self._models
+                },
+                "budget_bytes": self.budget_bytes,
+                "loads": self.loads,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,354 @@
+"""
+Parallel, cached PDF text extraction.
+
+pdfplumber is pure Python and GIL-bound, so pages are extracted in a process
+pool: every document is cut into page ranges and all ranges of all documents
+in a request run side by side. Extracted text is cached by the SHA-256 of the
+PDF, first in an in-memory LRU and then on disk, so a reference reading is
+only ever parsed once.
+
+Documents are ``bytes`` or spooled uploads (see uploads.py). Spooled uploads
+are opened by path, so they are never loaded into memory whole.
+"""
+
+import os
+import tempfile
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, BrokenExecutor, CancelledError, Future, wait
+from typing import List, Tuple, Optional, Callable, Dict, Any
+
+try:
+    import pdfplumber
+except ImportError:
+    pdfplumber = None
+
+from segmentation import clean_page_text, join_pages
+from metrics import registry, record_count
+from uploads import Document, SpooledPdf, document_digest, pdf_source
+
+
+class PdfExtractionError(Exception):
+    """The document could not be parsed (corrupt, encrypted or timed out)."""
+
+
+class PoolLost(Exception):
+    """Another request reset the pool while this one was using it; worth a retry."""
+
+
+def extract_page_range(source: Any, start: int, end: int) -> List[str]:
+    """Extract pages [start, end) from a path or file object. Runs in worker processes."""
+    texts = []
+    with pdfplumber.open(source) as pdf:
+        for i in range(start, min(end, len(pdf.pages))):
+            page = pdf.pages[i]
+            try:
+                texts.append(clean_page_text(page.extract_text() or ""))
+            except Exception as e:
+                print(f"Error extracting text from page {i+1}: {e}")
+            finally:
+                # Release the parsed layout so long documents don't accumulate it
+                page.close()
+    return texts
+
+
+def extract_page_range_timed(source: Any, start: int, end: int) -> Tuple[List[str], float]:
+    """extract_page_range plus the seconds the worker spent on it."""
+    import time
+    began = time.perf_counter()
+    texts = extract_page_range(source, start, end)
+    return texts, time.perf_counter() - began
+
+
+def observe_pages(pages: int, seconds: float):
+    """Record ``pages`` pages that took ``seconds`` in total."""
+    for _ in range(pages):
+        registry.observe("plagiasense_pdf_page_seconds", seconds / pages)
+    record_count("pdf_pages", pages)
+
+
+def count_pages(source: Any) -> int:
+    with pdfplumber.open(source) as pdf:
+        return len(pdf.pages)
+
+
+class PdfExtractor:
+    """Extract text from PDFs with a process pool and a two-level cache."""
+
+    def __init__(self, workers: int = 2, pages_per_task: int = 8, max_pages: int = 1000,
+                 timeout: float = 120.0, cache_dir: Optional[str] = None,
+                 memory_budget: int = 64 * 1024 * 1024):
+        self.workers = workers
+        self.pages_per_task = pages_per_task
+        self.max_pages = max_pages
+        self.timeout = timeout
+        self.cache_dir = cache_dir
+        self.memory_budget = memory_budget
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    # ------------------------------------------------------------------ cache
+
+    def _cache_key(self, digest: str) -> str:
+        # Text truncated at a page limit is only valid for that limit
+        return f"{digest}.p{self.max_pages}"
+
+    def _disk_path(self, key: str) -> Optional[str]:
+        if not self.cache_dir:
+            return None
+        return os.path.join(self.cache_dir, key[:2], key + ".txt")
+
+    def _remember(self, key: str, text: str):
+        size = len(text.encode("utf-8"))
+        if size > self.memory_budget:
+            return
+        with self._lock:
+            if key in self._memory:
+                return
+            self._memory[key] = text
+            self._memory_bytes += size
+            while self._memory_bytes > self.memory_budget:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted.encode("utf-8"))
+
+    def _lookup(self, key: str) -> Optional[str]:
+        with self._lock:
+            text = self._memory.get(key)
+            if text is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return text
+        path = self._disk_path(key)
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    text = f.read()
+            except OSError:
+                return None
+            with self._lock:
+                self.disk_hits += 1
+            self._remember(key, text)
+            return text
+        return None
+
+    def _store(self, key: str, text: str):
+        self._remember(key, text)
+        path = self._disk_path(key)
+        if not path:
+            return
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"⚠️ Could not cache extracted text for {key[:12]}: {e}")
+
+    # ------------------------------------------------------------------- pool
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # spawn: forking a process that already runs torch threads can deadlock
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._pool
+
+    def _reset_pool(self, pool: Optional[ProcessPoolExecutor] = None):
+        """Kill workers stuck on a pathological document and start fresh next time.
+
+        With ``pool``, only that pool is reset: if another request has already
+        replaced it, the fresh one is left alone. Tasks of other requests
+        sharing the reset pool are cancelled; they rerun on the new pool
+        (see ``_extract_parallel_retrying``).
+        """
+        with self._lock:
+            if pool is not None and self._pool is not pool:
+                pool = None
+            else:
+                pool, self._pool = self._pool, None
+        if pool is None:
+            return
+        for process in list(getattr(pool, "_processes", {}).values()):
+            process.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    # ------------------------------------------------------------- extraction
+
+    def _extract_inline(self, doc: Document) -> str:
+        import time
+        deadline = time.monotonic() + self.timeout
+        texts = []
+        with pdfplumber.open(pdf_source(doc)) as pdf:
+            for i, page in enumerate(pdf.pages[:self.max_pages]):
+                if time.monotonic() > deadline:
+                    raise PdfExtractionError(f"timed out after {self.timeout:.0f}s at page {i+1}")
+                began = time.perf_counter()
+                try:
+                    texts.append(clean_page_text(page.extract_text() or ""))
+                except Exception as e:
+                    print(f"Error extracting text from page {i+1}: {e}")
+                finally:
+                    page.close()
+                observe_pages(1, time.perf_counter() - began)
+        return join_pages(texts)
+
+    def _submit(self, pool: ProcessPoolExecutor, fn, *args) -> Future:
+        try:
+            return pool.submit(fn, *args)
+        except BrokenExecutor:
+            raise
+        except RuntimeError as e:
+            # "cannot schedule new futures after shutdown": another request reset the pool
+            raise PoolLost(str(e))
+
+    def _result(self, future: Future) -> Any:
+        try:
+            return future.result()
+        except BrokenExecutor:
+            raise
+        except CancelledError:
+            raise PoolLost("cancelled by a pool reset")
+        except Exception as e:
+            raise PdfExtractionError(str(e))
+
+    def _extract_parallel(self, pool: ProcessPoolExecutor, docs: List[Document],
+                          progress: Callable[[int, int], None]) -> List[str]:
+        paths = []
+        written = []
+        try:
+            # Workers read from disk so the PDF bytes aren't pickled once per task;
+            # spooled uploads are on disk already
+            for doc in docs:
+                if isinstance(doc, SpooledPdf):
+                    paths.append(doc.path)
+                    continue
+                fd, path = tempfile.mkstemp(suffix=".pdf")
+                with os.fdopen(fd, "wb") as f:
+                    f.write(doc)
+                paths.append(path)
+                written.append(path)
+
+            # Page counting parses the PDF too, so it runs in the pool under the timeout
+            count_futures = [self._submit(pool, count_pages, path) for path in paths]
+            doc_futures = []
+            for path, count_future in zip(paths, count_futures):
+                self._wait(pool, [count_future])
+                n_pages = min(self._result(count_future), self.max_pages)
+                doc_futures.append([
+                    self._submit(pool, extract_page_range_timed, path, start, min(start + self.pages_per_task, n_pages))
+                    for start in range(0, n_pages, self.pages_per_task)
+                ])
+
+            results = []
+            for doc_i, futures in enumerate(doc_futures):
+                # Each document gets its own timeout once the previous one is collected
+                self._wait(pool, futures)
+                texts = []
+                for future in futures:
+                    page_texts, seconds = self._result(future)
+                    texts.extend(page_texts)
+                    if page_texts:
+                        observe_pages(len(page_texts), seconds)
+                results.append(join_pages(texts))
+                progress(doc_i + 1, len(docs))
+            return results
+        finally:
+            for path in written:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def _wait(self, pool: ProcessPoolExecutor, futures: List[Future]):
+        done, pending = wait(futures, timeout=self.timeout)
+        if pending:
+            self._reset_pool(pool)
+            raise PdfExtractionError(f"timed out after {self.timeout:.0f}s")
+
+    def _extract_parallel_retrying(self, docs: List[Document], progress: Callable[[int, int], None]) -> List[str]:
+        """_extract_parallel, retrying once on a fresh pool if a worker died (OOM, segfault) or another request reset the pool."""
+        pool = self._get_pool()
+        try:
+            return self._extract_parallel(pool, docs, progress)
+        except BrokenExecutor:
+            # A dead worker leaves the pool unusable for every later request
+            self._reset_pool(pool)
+        except PoolLost:
+            pass
+        pool = self._get_pool()
+        try:
+            return self._extract_parallel(pool, docs, progress)
+        except BrokenExecutor as e:
+            self._reset_pool(pool)
+            raise PdfExtractionError(f"extraction worker crashed: {e}")
+        except PoolLost as e:
+            raise PdfExtractionError(f"extraction pool was reset twice: {e}")
+
+    def extract_many(self, docs: List[Document], digests: Optional[List[str]] = None,
+                     progress: Optional[Callable[[int, int], None]] = None) -> List[str]:
+        """Extract every document, parsing cache misses in parallel. Order is preserved."""
+        progress = progress or (lambda done, total: None)
+        if digests is None:
+            digests = [document_digest(doc) for doc in docs]
+        keys = [self._cache_key(d) for d in digests]
+        texts: List[Optional[str]] = [self._lookup(k) for k in keys]
+
+        # Parse each distinct missing document once, even if uploaded twice
+        missing: Dict[str, int] = {}
+        for i, text in enumerate(texts):
+            if text is None and keys[i] not in missing:
+                missing[keys[i]] = i
+        with self._lock:
+            self.misses += len(missing)
+        record_count("pdf_text_cache_hits", sum(text is not None for text in texts))
+
+        if missing:
+            to_parse = [docs[i] for i in missing.values()]
+            if self.workers > 0:
+                parsed = self._extract_parallel_retrying(to_parse, progress)
+            else:
+                parsed = []
+                for n, doc in enumerate(to_parse):
+                    try:
+                        parsed.append(self._extract_inline(doc))
+                    except PdfExtractionError:
+                        raise
+                    except Exception as e:
+                        raise PdfExtractionError(str(e))
+                    progress(n + 1, len(to_parse))
+            parsed_by_key = dict(zip(missing, parsed))
+            for key, text in parsed_by_key.items():
+                self._store(key, text)
+            texts = [text if text is not None else parsed_by_key[key] for key, text in zip(keys, texts)]
+
+        return texts
+
+    def extract(self, doc: Document, digest: Optional[str] = None) -> str:
+        return self.extract_many([doc], [digest] if digest else None)[0]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "max_pages": self.max_pages,
+            "timeout": self.timeout,
+            "memory_hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "memory_bytes": self._memory_bytes,
+        }
@@ -0,0 +1,120 @@
+"""
+Precompiled text normalization and sentence segmentation.
+
+Every pattern is compiled once at import. ``Segmenter.segment`` runs in a
+single streaming pass over the extracted text: it finds where the body ends
+(reference/appendix heading), walks sentence spans up to that point, trims
+and filters each one, and stops as soon as ``max_sentences`` are collected.
+Each sentence keeps its character offsets into the original text so
+highlights can be mapped back onto the document.
+"""
+
+import re
+from typing import Callable, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+# Page cleanup, applied per PDF page: runs of spaces/tabs -> one space, and
+# each run of line breaks (hyphenated or not) -> one newline, or nothing when
+# every break in the run is a hyphenation
+PAGE_CLEANUP_RE = re.compile(r"[ \t]+|(?:-?\n)+")
+BLANK_LINES_RE = re.compile(r"\n{3,}")
+
+# Everything after the first of these headings is not body text
+REFERENCES_HEADING_RE = re.compile(r"\n\s*(references|bibliography|works cited|citations?)\s*\n", re.IGNORECASE)
+APPENDIX_HEADING_RE = re.compile(r"\n\s*(appendix|appendices)\s*[a-z]?\s*\n", re.IGNORECASE)
+
+SENTENCE_BOUNDARY_RE = re.compile(r"(?<=[.!?])\s+(?=[A-Z])")
+NUMERIC_ONLY_RE = re.compile(r"[\d\s.\-]+")
+WHITESPACE_RE = re.compile(r"\s+")
+
+MIN_SENTENCE_CHARS = 20
+
+
+def _page_cleanup(match: "re.Match") -> str:
+    token = match.group(0)
+    if token[0] in " \t":
+        return " "
+    return "\n" if token.count("\n") > token.count("-") else ""
+
+
+def clean_page_text(t: str) -> str:
+    """Normalize whitespace and clean up common PDF artifacts in one pass."""
+    return PAGE_CLEANUP_RE.sub(_page_cleanup, t)
+
+
+def join_pages(texts: List[str]) -> str:
+    # Basic cleanup: remove multiple blank lines
+    return BLANK_LINES_RE.sub("\n\n", "\n".join(texts)).strip()
+
+
+def body_end(text: str) -> int:
+    """Offset where the reference section (or, failing that, the appendix) starts."""
+    for pattern in (REFERENCES_HEADING_RE, APPENDIX_HEADING_RE):
+        m = pattern.search(text)
+        if m:
+            return m.start()
+    return len(text)
+
+
+def regex_spans(text: str, end: int) -> Iterator[Tuple[int, int]]:
+    """Sentence spans of text[:end], split after . ! ? followed by a capital letter."""
+    start = 0
+    for m in SENTENCE_BOUNDARY_RE.finditer(text, 0, end):
+        yield start, m.start()
+        start = m.end()
+    yield start, end
+
+
+class Segment(NamedTuple):
+    text: str
+    start: int  # offset of the first character in the original text
+    end: int    # offset one past the last character
+
+
+class Segmenter:
+    """Clean, truncate, split and filter a document in one pass."""
+
+    def __init__(self, span_tokenizer: Optional[Callable[[str], Iterable[Tuple[int, int]]]] = None,
+                 name: str = "regex", collapse_whitespace: Optional[bool] = None,
+                 min_chars: int = MIN_SENTENCE_CHARS):
+        self.span_tokenizer = span_tokenizer
+        self.name = name
+        # The regex splitter keeps PDF line breaks inside sentences, so it
+        # flattens them; punkt output is kept verbatim as before
+        self.collapse_whitespace = span_tokenizer is None if collapse_whitespace is None else collapse_whitespace
+        self.min_chars = min_chars
+
+    def _spans(self, text: str, end: int) -> Iterable[Tuple[int, int]]:
+        if self.span_tokenizer is None:
+            return regex_spans(text, end)
+        return self.span_tokenizer(text[:end])
+
+    def segment(self, text: str, max_sentences: int) -> List[Segment]:
+        segments: List[Segment] = []
+        for start, stop in self._spans(text, body_end(text)):
+            raw = text[start:stop]
+            s = raw.strip()
+            # Skip very short sentences and number-only sentences
+            if len(s) <= self.min_chars or NUMERIC_ONLY_RE.fullmatch(s):
+                continue
+            lead = len(raw) - len(raw.lstrip())
+            if self.collapse_whitespace:
+                s = WHITESPACE_RE.sub(" ", s)
+            segments.append(Segment(s, start + lead, start + lead + len(raw.strip())))
+            if len(segments) >= max_sentences:
+                break
+        return segments
+
+    def split(self, text: str, max_sentences: int) -> List[str]:
+        return [seg.text for seg in self.segment(text, max_sentences)]
+
+
+def punkt_span_tokenizer(language: str = "english") -> Callable[[str], Iterable[Tuple[int, int]]]:
+    """NLTK punkt ``span_tokenize``; raises LookupError when the model is not installed."""
+    try:
+        from nltk.tokenize.punkt import PunktTokenizer
+        tokenizer = PunktTokenizer(language)
+    except ImportError:
+        # NLTK < 3.8.2 ships the pickled model instead of punkt_tab
+        import nltk
+        tokenizer = nltk.data.load(f"tokenizers/punkt/{language}.pickle")
+    return tokenizer.span_tokenize
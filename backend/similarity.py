@@ -0,0 +1,308 @@
+"""
+Nearest-reference search over sentence embeddings.
+
+The dense ``util.cos_sim(main_emb, ref_emb)`` matrix grows with
+N_main x N_ref, so search is delegated to a pluggable engine instead:
+
+* ``exact`` tiles the matmul over query and reference blocks and keeps a
+  running top-k per query, so peak memory is bounded by the tile size
+  (query_block_size x block_size floats) rather than the corpus.
+* ``ivf`` builds an inverted-file index (spherical k-means over the
+  reference rows) and only scores the ``nprobe`` closest clusters per query.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Dict, Tuple, Optional, Any, Union, Callable
+
+import numpy as np
+
+
+def normalize_rows(x: np.ndarray) -> np.ndarray:
+    """L2-normalize rows so a dot product equals cosine similarity."""
+    x = np.asarray(x, dtype=np.float32)
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    return x / np.maximum(norms, 1e-12)
+
+
+def select_topk(scores: np.ndarray, idx: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Unordered k best candidates of each row."""
+    if scores.shape[1] <= k:
+        return scores, idx
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return np.take_along_axis(scores, part, axis=1), np.take_along_axis(idx, part, axis=1)
+
+
+def block_topk(sim: np.ndarray, k: int, offset: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """Top-k columns of a similarity tile, as indices shifted by the tile offset."""
+    idx = np.broadcast_to(np.arange(offset, offset + sim.shape[1]), sim.shape)
+    return select_topk(sim, idx, k)
+
+
+def merge_topk(scores_a: np.ndarray, idx_a: np.ndarray, scores_b: np.ndarray, idx_b: np.ndarray,
+               k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Merge a running top-k with a new tile's candidates, keeping the k best."""
+    return select_topk(np.concatenate([scores_a, scores_b], axis=1),
+                       np.concatenate([idx_a, idx_b], axis=1), k)
+
+
+def sort_topk(scores: np.ndarray, idx: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Order candidates best-first and pad rows with fewer than k (score -inf, index 0)."""
+    if scores.shape[1] < k:
+        pad = k - scores.shape[1]
+        scores = np.pad(scores, ((0, 0), (0, pad)), constant_values=-np.inf)
+        idx = np.pad(idx, ((0, 0), (0, pad)))
+    order = np.argsort(-scores, axis=1, kind="stable")
+    return np.take_along_axis(scores, order, axis=1), np.take_along_axis(idx, order, axis=1)
+
+
+def resolve_refs(refs: Union[np.ndarray, Callable[[], np.ndarray]]) -> np.ndarray:
+    return refs() if callable(refs) else refs
+
+
+class SimilarityEngine:
+    """Find the k most similar reference rows for every query row."""
+
+    name = "base"
+
+    def search(self, queries: np.ndarray, refs: np.ndarray, k: int = 1,
+               key: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (scores [n_queries, k], idx [n_queries, k]), best match first.
+
+        ``refs`` may also be a zero-argument callable returning the matrix; it
+        is only called when the rows are actually needed.
+        """
+        raise NotImplementedError
+
+    def info(self) -> Dict[str, Any]:
+        return {"engine": self.name}
+
+
+class ExactEngine(SimilarityEngine):
+    """Tiled brute-force search; identical results to a full cos_sim top-k."""
+
+    name = "exact"
+
+    def __init__(self, block_size: int = 4096, query_block_size: int = 1024):
+        self.block_size = block_size
+        self.query_block_size = query_block_size
+
+    def search(self, queries, refs, k=1, key=None):
+        refs = resolve_refs(refs)
+        q = normalize_rows(queries)
+        out_scores = np.empty((len(q), k), dtype=np.float32)
+        out_idx = np.empty((len(q), k), dtype=np.int64)
+
+        for q_start in range(0, len(q), self.query_block_size):
+            q_block = q[q_start:q_start + self.query_block_size]
+            best_scores = np.empty((len(q_block), 0), dtype=np.float32)
+            best_idx = np.empty((len(q_block), 0), dtype=np.int64)
+            for start in range(0, len(refs), self.block_size):
+                sim = q_block @ normalize_rows(refs[start:start + self.block_size]).T
+                scores, idx = block_topk(sim, k, start)
+                best_scores, best_idx = merge_topk(best_scores, best_idx, scores, idx, k)
+            best_scores, best_idx = sort_topk(best_scores, best_idx, k)
+            out_scores[q_start:q_start + len(q_block)] = best_scores
+            out_idx[q_start:q_start + len(q_block)] = best_idx
+
+        return out_scores, out_idx
+
+    def info(self):
+        return {"engine": self.name, "block_size": self.block_size, "query_block_size": self.query_block_size}
+
+
+class IVFIndex:
+    """Inverted-file index: reference rows bucketed by their nearest centroid."""
+
+    def __init__(self, refs: np.ndarray, nlist: Optional[int] = None, iterations: int = 10,
+                 train_size_per_list: int = 64, block_size: int = 8192, seed: int = 0):
+        x = normalize_rows(refs)
+        n = len(x)
+        self.nlist = max(1, min(n, nlist or int(np.sqrt(n))))
+        self.block_size = block_size
+        rng = np.random.default_rng(seed)
+
+        # Spherical k-means on a sample keeps build time independent of corpus size
+        train = x[rng.choice(n, size=min(n, self.nlist * train_size_per_list), replace=False)]
+        centroids = train[rng.choice(len(train), size=self.nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assign = self._assign(train, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, train)
+            counts = np.bincount(assign, minlength=self.nlist)
+            empty = counts == 0
+            # Re-seed empty clusters from random training points
+            sums[empty] = train[rng.choice(len(train), size=int(empty.sum()))]
+            centroids = normalize_rows(sums)
+        self.centroids = centroids
+
+        # Store vectors contiguously per list so probing is a slice
+        assign = self._assign(x, centroids)
+        order = np.argsort(assign, kind="stable")
+        self.ids = order
+        self.vectors = x[order]
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=self.nlist))])
+
+    def _assign(self, x: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        out = np.empty(len(x), dtype=np.int64)
+        for start in range(0, len(x), self.block_size):
+            out[start:start + self.block_size] = (x[start:start + self.block_size] @ centroids.T).argmax(axis=1)
+        return out
+
+    def search(self, queries: np.ndarray, nprobe: int, k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        q = normalize_rows(queries)
+        nprobe = max(1, min(nprobe, self.nlist))
+        coarse = q @ self.centroids.T
+        # Never spend a probe on an empty list
+        coarse[:, np.diff(self.offsets) == 0] = -np.inf
+        probes = np.argpartition(-coarse, nprobe - 1, axis=1)[:, :nprobe]
+
+        best_scores = np.full((len(q), k), -np.inf, dtype=np.float32)
+        best_pos = np.zeros((len(q), k), dtype=np.int64)
+
+        # Visit each list once and score every query that probes it
+        for lst in np.unique(probes):
+            lo, hi = self.offsets[lst], self.offsets[lst + 1]
+            if lo == hi:
+                continue
+            rows = np.nonzero((probes == lst).any(axis=1))[0]
+            scores, pos = block_topk(q[rows] @ self.vectors[lo:hi].T, k, lo)
+            merged_scores, merged_pos = merge_topk(best_scores[rows], best_pos[rows], scores, pos, k)
+            best_scores[rows], best_pos[rows] = sort_topk(merged_scores, merged_pos, k)
+
+        return best_scores, self.ids[best_pos]
+
+
+class IVFEngine(SimilarityEngine):
+    """Approximate search through cached IVF indexes; small corpora fall back to exact."""
+
+    name = "ivf"
+
+    def __init__(self, nprobe: int = 16, min_rows: int = 20000, max_indexes: int = 4,
+                 block_size: int = 4096, query_block_size: int = 1024):
+        self.nprobe = nprobe
+        self.min_rows = min_rows
+        self.max_indexes = max_indexes
+        self.exact = ExactEngine(block_size, query_block_size)
+        self._indexes: "OrderedDict[str, IVFIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_index(self, refs: np.ndarray, key: Optional[str]) -> IVFIndex:
+        if key is None:
+            return IVFIndex(refs)
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is not None:
+                self._indexes.move_to_end(key)
+                return index
+        # Build outside the lock; a duplicate build under a race is harmless
+        index = IVFIndex(refs)
+        with self._lock:
+            self._indexes[key] = index
+            while len(self._indexes) > self.max_indexes:
+                self._indexes.popitem(last=False)
+        return index
+
+    def search(self, queries, refs, k=1, key=None):
+        if key is not None:
+            with self._lock:
+                index = self._indexes.get(key)
+            if index is not None:
+                # Only corpora of at least min_rows are indexed; refs are not needed
+                return index.search(queries, self.nprobe, k)
+        refs = resolve_refs(refs)
+        if len(refs) < self.min_rows:
+            return self.exact.search(queries, refs, k)
+        return self.get_index(refs, key).search(queries, self.nprobe, k)
+
+    def info(self):
+        return {
+            "engine": self.name,
+            "nprobe": self.nprobe,
+            "min_rows": self.min_rows,
+            "cached_indexes": len(self._indexes),
+        }
+
+
+ENGINES = {
+    "exact": ExactEngine,
+    "ivf": IVFEngine,
+}
+
+
+def create_engine(name: str, **kwargs) -> SimilarityEngine:
+    if name not in ENGINES:
+        raise ValueError(f"Unknown similarity engine '{name}'. Choose from: {', '.join(ENGINES)}")
+    return ENGINES[name](**kwargs)
+
+
+def best_per_document(queries: np.ndarray, refs: np.ndarray, offsets: np.ndarray,
+                      block_size: int = 4096, query_block_size: int = 1024) -> Tuple[np.ndarray, np.ndarray]:
+    """Best score and row within every document for each query: ([n_queries, n_docs], [n_queries, n_docs]).
+
+    ``offsets[d]..offsets[d + 1]`` are the rows of document d. Tiled like
+    ExactEngine; documents with no rows keep score -inf.
+    """
+    q = normalize_rows(queries)
+    n_docs = len(offsets) - 1
+    best_scores = np.full((len(q), n_docs), -np.inf, dtype=np.float32)
+    best_idx = np.zeros((len(q), n_docs), dtype=np.int64)
+
+    for start in range(0, len(refs), block_size):
+        stop = min(start + block_size, len(refs))
+        block = normalize_rows(refs[start:stop])
+        # Documents overlapping rows [start, stop)
+        first = int(np.searchsorted(offsets, start, side="right")) - 1
+        last = int(np.searchsorted(offsets, stop, side="left"))
+        for q_start in range(0, len(q), query_block_size):
+            q_stop = min(q_start + query_block_size, len(q))
+            sim = q[q_start:q_stop] @ block.T
+            rows = np.arange(q_stop - q_start)
+            for d in range(max(first, 0), min(last, n_docs)):
+                a = max(int(offsets[d]), start) - start
+                b = min(int(offsets[d + 1]), stop) - start
+                if a >= b:
+                    continue
+                j = np.argmax(sim[:, a:b], axis=1)
+                scores = sim[rows, a + j]
+                better = scores > best_scores[q_start:q_stop, d]
+                best_scores[q_start:q_stop, d] = np.where(better, scores, best_scores[q_start:q_stop, d])
+                best_idx[q_start:q_stop, d] = np.where(better, start + a + j, best_idx[q_start:q_stop, d])
+
+    return best_scores, best_idx
+
+
+def recall_against_exact(engine: SimilarityEngine, queries: np.ndarray, refs: np.ndarray,
+                         key: Optional[str] = None) -> Dict[str, float]:
+    """Compare an engine with exact search: top-1 recall and worst score shortfall."""
+    exact_scores, exact_idx = ExactEngine().search(queries, refs)
+    scores, idx = engine.search(queries, refs, key=key)
+    return {
+        "recall_at_1": float(np.mean(idx[:, 0] == exact_idx[:, 0])),
+        "max_score_gap": float(np.max(exact_scores[:, 0] - scores[:, 0])) if len(scores) else 0.0,
+    }
+
+
+def synthetic_embeddings(seed: int, n_refs: int, n_queries: int, dim: int = 384,
+                         topics: int = 500) -> Tuple[np.ndarray, np.ndarray]:
+    """Clustered unit vectors shaped like MiniLM output, plus queries that paraphrase (noisily copy) random references."""
+    rng = np.random.default_rng(seed)
+    centres = normalize_rows(rng.normal(size=(topics, dim)))
+    refs = normalize_rows(centres[rng.integers(0, topics, n_refs)] + 0.35 * rng.normal(size=(n_refs, dim)))
+    queries = normalize_rows(refs[rng.integers(0, n_refs, n_queries)] + 0.02 * rng.normal(size=(n_queries, dim)))
+    return queries, refs
+
+
+if __name__ == "__main__":
+    # Recall and timing at production scale; test_similarity.py asserts recall on a smaller corpus
+    import time
+
+    queries, refs = synthetic_embeddings(42, 100000, 2000)
+
+    engine = IVFEngine(min_rows=0)
+    t = time.time()
+    engine.get_index(refs, "bench")
+    print(f"IVF build: {time.time() - t:.2f}s ({engine.get_index(refs, 'bench').nlist} lists)")
+    t = time.time()
+    result = recall_against_exact(engine, queries, refs, key="bench")
+    print(f"IVF vs exact: {result} in {time.time() - t:.2f}s")
@@ -0,0 +1,19 @@
+import pytest
+
+from ai_classifier import ai_label_index
+
+
+def test_ai_label_index_matches_whole_names():
+    assert ai_label_index({0: "Real", 1: "Fake"}) == 1
+    assert ai_label_index({0: "ChatGPT", 1: "Human"}) == 0
+    assert ai_label_index({0: "LABEL_0", 1: "LABEL_1"}) == 1
+
+
+@pytest.mark.parametrize("id2label", [
+    {0: "Not AI", 1: "Human"},
+    {0: "human", 1: "not-generated"},
+    {0: "positive", 1: "negative"},
+])
+def test_ai_label_index_refuses_to_guess(id2label):
+    with pytest.raises(RuntimeError):
+        ai_label_index(id2label)
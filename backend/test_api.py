@@ -0,0 +1,87 @@
+import os
+import tempfile
+
+# Keep the test run off the network and out of the repo's cache directory
+os.environ.setdefault("PLAGIASENSE_CACHE_DIR", tempfile.mkdtemp())
+os.environ.setdefault("NLTK_DOWNLOAD", "0")
+os.environ.setdefault("PDF_WORKERS", "0")
+os.environ.setdefault("EMBED_BATCHING", "0")
+
+import numpy as np
+
+import api
+from benchmark import make_pdf
+
+
+class FakeModel:
+    """Bag-of-words hashing encoder standing in for a SentenceTransformer."""
+
+    dim = 16
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+
+    def encode(self, sentences, convert_to_tensor=False, **kwargs):
+        import torch
+        emb = np.zeros((len(sentences), self.dim), dtype=np.float32)
+        for i, sentence in enumerate(sentences):
+            for word in sentence.lower().split():
+                emb[i, hash(word) % self.dim] += 1.0
+        return torch.from_numpy(emb) if convert_to_tensor else emb
+
+
+def test_embed_documents_without_text():
+    """Documents with no extractable sentences get empty entries instead of a 500."""
+    model = FakeModel()
+    docs = [make_pdf([]), make_pdf([]) + b"\n% second empty document"]
+    entries = api.embed_documents(model, "fake-model", docs)
+    assert [entry.sentences for entry in entries] == [[], []]
+    assert all(entry.embeddings.shape == (0, model.dim) for entry in entries)
+
+
+def test_job_refused_by_admission_fails():
+    """A job the admission queue refuses after its 202 ends up failed, not queued forever."""
+    import asyncio
+    from admission import AdmissionController
+
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, max_queue=1)
+        running = await controller.enter("plagiarism")
+        waiting = asyncio.ensure_future(controller.enter("plagiarism"))
+        await asyncio.sleep(0)
+        # Both the slot and the queue are taken
+        assert controller.queued == 1
+        original, api.admission = api.admission, controller
+        try:
+            job = api.job_store.create("plagiarism")
+            await api.run_admitted_job(job, "plagiarism", None, lambda progress: {})
+        finally:
+            api.admission = original
+            running.release()
+            (await waiting).release()
+        return job
+
+    job = asyncio.run(scenario())
+    assert job.status == "failed"
+    assert job.error_status == 429
+    assert job.finished_at is not None
+
+
+def test_reference_store_is_per_splitter():
+    """Sentences cached under one splitter are not served to another."""
+    from segmentation import Segmenter
+
+    model = FakeModel()
+    doc = make_pdf(["Stored per splitter. Second sentence here."])
+    original = api.sentence_splitter
+    try:
+        api.sentence_splitter = Segmenter()
+        api.embed_documents(model, "fake-model", [doc])
+        misses = api.reference_store.misses
+        api.embed_documents(model, "fake-model", [doc])
+        assert api.reference_store.misses == misses
+        api.sentence_splitter = Segmenter(lambda text: [(0, len(text))], name="whole")
+        api.embed_documents(model, "fake-model", [doc])
+        assert api.reference_store.misses == misses + 1
+    finally:
+        api.sentence_splitter = original
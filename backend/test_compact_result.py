@@ -0,0 +1,10 @@
+from compact_result import utf16_offsets
+
+
+def test_offsets_are_utf16_code_units():
+    # Math-italic x and y are outside the BMP: two UTF-16 units each, as in JavaScript
+    text = "a𝑥b𝑦 cd"
+    starts = [0, 1, 2, 3, 4, 7]
+    utf16 = text.encode("utf-16-le")
+    for cp, unit in zip(starts, utf16_offsets(text, starts).tolist()):
+        assert utf16[:unit * 2].decode("utf-16-le") == text[:cp]
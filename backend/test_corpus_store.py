@@ -0,0 +1,17 @@
+import numpy as np
+
+from corpus_store import ReferenceCorpus, ReferenceEntry
+
+
+def test_rows_match_concatenated_embeddings():
+    rng = np.random.default_rng(0)
+    entries = [
+        ReferenceEntry(f"doc{i}", [f"s{j}" for j in range(n)], rng.standard_normal((n, 8)).astype(np.float32))
+        for i, n in enumerate([3, 0, 5, 2])
+    ]
+    corpus = ReferenceCorpus(entries, 8, "model")
+    idx = np.array([9, 0, 4, 3, 7], dtype=np.int64)
+    # Gathered before the full matrix exists, then compared against it
+    gathered = corpus.rows(idx)
+    np.testing.assert_array_equal(gathered, corpus.embeddings[idx])
+    assert corpus.embeddings.shape == (10, 8)
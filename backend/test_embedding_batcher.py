@@ -0,0 +1,36 @@
+import time
+
+import numpy as np
+import pytest
+
+from embedding_batcher import EmbeddingBatcher
+
+
+class LengthModel:
+    """Embeds a sentence as its length; ``delay`` makes every forward pass slow."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+
+    def get_sentence_embedding_dimension(self):
+        return 1
+
+    def encode(self, sentences, **kwargs):
+        time.sleep(self.delay)
+        return np.array([[len(s)] for s in sentences], dtype=np.float32)
+
+
+def test_failed_cycle_releases_callers():
+    """An error outside model.encode fails the waiting caller and leaves the worker running."""
+    batcher = EmbeddingBatcher(timeout=5)
+    model = LengthModel()
+    with pytest.raises(TypeError):
+        # len(None) fails while the cycle is being length-sorted
+        batcher.encode(model, [None])
+    assert batcher.encode(model, ["abc", "de"]).tolist() == [[3.0], [2.0]]
+
+
+def test_encode_times_out():
+    batcher = EmbeddingBatcher(timeout=0.1)
+    with pytest.raises(TimeoutError):
+        batcher.encode(LengthModel(delay=1.0), ["slow"])
@@ -0,0 +1,43 @@
+import time
+from concurrent.futures import BrokenExecutor
+
+import pytest
+
+from benchmark import make_pdf
+from pdf_extract import PdfExtractor, PoolLost
+
+
+def test_recovers_from_dead_worker():
+    """A killed worker must not leave the pool broken for later extractions."""
+    extractor = PdfExtractor(workers=1)
+    try:
+        assert "first" in extractor.extract(make_pdf(["The first document."]))
+        for process in list(extractor._get_pool()._processes.values()):
+            process.kill()
+            process.join()
+        assert "second" in extractor.extract(make_pdf(["The second document."]))
+        assert "third" in extractor.extract(make_pdf(["The third document."]))
+    finally:
+        extractor.shutdown()
+
+
+def test_pool_reset_by_another_request_is_retryable():
+    """Work caught in another request's pool reset is retried, not reported as a bad PDF."""
+    extractor = PdfExtractor(workers=1)
+    try:
+        pool = extractor._get_pool()
+        running = pool.submit(time.sleep, 5)
+        queued = pool.submit(time.sleep, 0)
+        extractor._reset_pool(pool)
+        # Depending on timing, queued work is cancelled or sees the pool as broken
+        with pytest.raises((PoolLost, BrokenExecutor)):
+            extractor._result(queued)
+        with pytest.raises((PoolLost, BrokenExecutor)):
+            extractor._extract_parallel(pool, [make_pdf(["Held the old pool."])], lambda done, total: None)
+        # Resetting a pool that was already replaced leaves the fresh one alone
+        fresh = extractor._get_pool()
+        extractor._reset_pool(pool)
+        assert extractor._get_pool() is fresh
+        assert "fresh" in extractor.extract(make_pdf(["A fresh pool."]))
+    finally:
+        extractor.shutdown()
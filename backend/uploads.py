@@ -0,0 +1,130 @@
+"""
+Streaming ingest of uploaded PDFs.
+
+Uploads are copied in chunks to temp files instead of being read into
+``bytes``. The SHA-256 is computed as the chunks go by, so the text and
+reference caches never hash the document again. Size limits are enforced
+per file and per request while copying: an oversized upload is refused with
+413 after at most one chunk past the limit, not after it has been read into
+memory. pdfplumber then opens the temp file by path, and in process mode
+only the path crosses to the worker.
+
+Pipeline functions accept either a ``SpooledPdf`` or plain ``bytes`` (the
+benchmark and older callers pass bytes); ``document_digest`` and
+``pdf_source`` hide the difference.
+"""
+
+import io
+import os
+import asyncio
+import hashlib
+import tempfile
+from typing import List, Dict, Optional, Union, Any
+
+from fastapi import HTTPException
+
+# 1 MiB: few enough reads to be cheap, small enough to keep memory flat
+CHUNK_BYTES = 1024 * 1024
+
+
+class SpooledPdf:
+    """An uploaded PDF on disk: its path, original name, size and SHA-256."""
+
+    def __init__(self, path: str, name: str, size: int, digest: str):
+        self.path = path
+        self.name = name
+        self.size = size
+        self.digest = digest
+
+    def read_bytes(self) -> bytes:
+        with open(self.path, "rb") as f:
+            return f.read()
+
+
+Document = Union[bytes, SpooledPdf]
+
+
+def document_digest(doc: Document) -> str:
+    if isinstance(doc, SpooledPdf):
+        return doc.digest
+    return hashlib.sha256(doc).hexdigest()
+
+
+def pdf_source(doc: Document) -> Any:
+    """Something ``pdfplumber.open`` accepts: the path of a spooled upload, or a stream over bytes."""
+    if isinstance(doc, SpooledPdf):
+        return doc.path
+    return io.BytesIO(doc)
+
+
+def _human(n: int) -> str:
+    return f"{n / (1024 * 1024):.0f} MB"
+
+
+class UploadSpool:
+    """The spooled uploads of one request, with its size limits; ``cleanup()`` deletes them."""
+
+    def __init__(self, max_file_bytes: int, max_total_bytes: int, tmp_dir: Optional[str] = None):
+        self.max_file_bytes = max_file_bytes
+        self.max_total_bytes = max_total_bytes
+        self.tmp_dir = tmp_dir
+        self.total = 0
+        self.files: List[SpooledPdf] = []
+        self._by_digest: Dict[str, SpooledPdf] = {}
+
+    def _too_large(self, detail: str):
+        raise HTTPException(status_code=413, detail=detail)
+
+    def _check(self, name: str, size: int):
+        if size > self.max_file_bytes:
+            self._too_large(f"File {name} is larger than the {_human(self.max_file_bytes)} limit")
+        if self.total + size > self.max_total_bytes:
+            self._too_large(f"Uploads exceed the {_human(self.max_total_bytes)} per-request limit")
+
+    def _copy(self, source, name: str) -> SpooledPdf:
+        fd, path = tempfile.mkstemp(suffix=".pdf", dir=self.tmp_dir)
+        sha = hashlib.sha256()
+        size = 0
+        try:
+            with os.fdopen(fd, "wb") as out:
+                while True:
+                    chunk = source.read(CHUNK_BYTES)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    self._check(name, size)
+                    sha.update(chunk)
+                    out.write(chunk)
+        except BaseException:
+            os.remove(path)
+            raise
+        return SpooledPdf(path, name, size, sha.hexdigest())
+
+    async def add(self, upload) -> SpooledPdf:
+        """Spool a Starlette ``UploadFile`` to disk, hashing it and applying the limits."""
+        if upload.size is not None:
+            # Known from the multipart parser: refuse before copying anything
+            self._check(upload.filename, upload.size)
+        await upload.seek(0)
+        # File I/O off the event loop, on the default thread pool rather than the analysis executor
+        spooled = await asyncio.get_event_loop().run_in_executor(None, self._copy, upload.file, upload.filename)
+        self.total += spooled.size
+
+        # The same PDF uploaded twice in one request is kept on disk once
+        first = self._by_digest.get(spooled.digest)
+        if first is not None:
+            os.remove(spooled.path)
+            spooled = SpooledPdf(first.path, spooled.name, spooled.size, spooled.digest)
+        else:
+            self._by_digest[spooled.digest] = spooled
+        self.files.append(spooled)
+        return spooled
+
+    def cleanup(self):
+        for spooled in self._by_digest.values():
+            try:
+                os.remove(spooled.path)
+            except OSError:
+                pass
+        self._by_digest.clear()
+        self.files = []
@@ -13,6 +13,7 @@ const API_BASE_URL = getApiBaseUrl();
 export const API_ENDPOINTS = {
   ANALYZE: `${API_BASE_URL}/api/analyze`,
   AI_DETECTION: `${API_BASE_URL}/api/ai-detection/analyze`,
+  ANALYZE_COMBINED: `${API_BASE_URL}/api/analyze/combined`,
   AI_DETECTION_MODELS: `${API_BASE_URL}/api/ai-detection/models`,
   AI_DETECTION_METHODS: `${API_BASE_URL}/api/ai-detection/methods`,
   MODELS: `${API_BASE_URL}/api/models`,
@@ -7,7 +7,24 @@ export interface FlaggedSentence {
   reference_document: string;
   reference_sentence: string;
   sentence_index: number;
+  char_start?: number;
+  char_end?: number;
   risk_level: 'HIGH' | 'MEDIUM';
+  match_type?: 'semantic' | 'near_exact' | 'exact';
+  alternative_matches?: Array<{
+    score: number;
+    reference_document: string;
+    reference_sentence: string;
+  }>;
+}
+
+// Sent with timings=true: wall and thread-CPU seconds per stage; a large
+// gap between the two means the stage was waiting rather than computing
+export interface RequestTimings {
+  total_seconds: number;
+  queue_wait_seconds: number;
+  stages: Record<string, { seconds: number; cpu_seconds: number; calls: number }>;
+  counts: Record<string, number>;
 }
 
 export interface AnalysisResult {
@@ -18,8 +35,60 @@ export interface AnalysisResult {
   flagged_sentences: FlaggedSentence[];
   highlighted_fragments: string[];
   processing_time: number;
+  timings?: RequestTimings | null;
+}
+
+// format=compact: offsets into `text` (UTF-16 code units, so `text.slice(start, end)`
+// works directly), packed [n, k] scores/matches (base64, little-endian) and a
+// deduplicated reference sentence table
+export interface PackedArray {
+  // int8: match_types codes; decode with Int8Array
+  dtype: 'float32' | 'int32' | 'int8';
+  shape: number[];
+  data: string;
+}
+
+export interface CompactAnalysisResult {
+  format: 'compact';
+  overall_score: number;
+  red_count: number;
+  orange_count: number;
+  total_sentences: number;
+  thresholds: { red: number; orange: number };
+  text: string;
+  sentence_starts: PackedArray;
+  sentence_ends: PackedArray;
+  scores: PackedArray;
+  matches: PackedArray;
+  reference_documents: string[];
+  reference_sentences: string[];
+  reference_sentence_documents: number[];
+  match_types: PackedArray;
+  match_type_names: string[];
+  processing_time: number;
 }
 
+// Records of a streamed analysis (stream=ndjson)
+export type AnalysisStreamRecord =
+  | {
+      type: 'block';
+      start: number;
+      end: number;
+      red_count: number;
+      orange_count: number;
+      flagged_sentences: FlaggedSentence[];
+      highlighted_fragments: string[];
+    }
+  | {
+      type: 'summary';
+      overall_score: number;
+      red_count: number;
+      orange_count: number;
+      total_sentences: number;
+      processing_time: number;
+    }
+  | { type: 'error'; detail: string };
+
 // AI Detection types
 export interface AIDetectionResult {
   ai_probability: number;
@@ -36,6 +105,13 @@ export interface AIDetectionResult {
     high_risk_sentences: number;
   };
   processing_time: number;
+  timings?: RequestTimings | null;
+}
+
+export interface CombinedAnalysisResult {
+  plagiarism: AnalysisResult;
+  ai_detection: AIDetectionResult;
+  processing_time: number;
 }
 
 export interface ApiStatus {
@@ -130,7 +206,10 @@ export class PlagiaSenseAPI {
     }
   }
 
-  async analyzePlagiarism(files: File[]): Promise<AnalysisResult> {
+  async analyzePlagiarism(files: File[], options: {
+    // false skips the highlighted_fragments HTML (it comes back empty)
+    highlights?: boolean;
+  } = {}): Promise<AnalysisResult> {
     if (files.length < 2) {
       throw new Error('At least 2 files required: first is student document, rest are references');
     }
@@ -147,6 +226,9 @@ export class PlagiaSenseAPI {
       files.forEach((file) => {
         formData.append('files', file);
       });
+      if (options.highlights === false) {
+        formData.append('highlights', 'false');
+      }
 
       const response = await fetch(API_ENDPOINTS.ANALYZE, {
         method: 'POST',
@@ -168,6 +250,44 @@ export class PlagiaSenseAPI {
     }
   }
 
+  async analyzePlagiarismStream(
+    files: File[],
+    onRecord: (record: AnalysisStreamRecord) => void
+  ): Promise<void> {
+    const formData = new FormData();
+    files.forEach((file) => {
+      formData.append('files', file);
+    });
+    formData.append('stream', 'ndjson');
+
+    const response = await fetch(API_ENDPOINTS.ANALYZE, {
+      method: 'POST',
+      body: formData,
+    });
+
+    if (!response.ok || !response.body) {
+      const errorData = await response.json().catch(() => ({ detail: response.statusText }));
+      throw new Error(errorData.detail || `Analysis failed: ${response.statusText}`);
+    }
+
+    // One JSON record per line; a chunk may end mid-line
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffered = '';
+    for (;;) {
+      const { done, value } = await reader.read();
+      buffered += decoder.decode(value, { stream: !done });
+      const lines = buffered.split('\n');
+      buffered = lines.pop() ?? '';
+      for (const line of lines) {
+        if (line.trim()) {
+          onRecord(JSON.parse(line));
+        }
+      }
+      if (done) break;
+    }
+  }
+
   async analyzeAI(file: File, options: {
     method?: string;
     modelChoice?: string;
@@ -219,6 +339,60 @@ export class PlagiaSenseAPI {
     }
   }
 
+  async analyzeCombined(files: File[], options: {
+    method?: string;
+    modelChoice?: string;
+    apiKey?: string;
+    apiUrl?: string;
+  } = {}): Promise<CombinedAnalysisResult> {
+    if (files.length < 2) {
+      throw new Error('At least 2 files required: first is student document, rest are references');
+    }
+
+    for (const file of files) {
+      if (!file.name.toLowerCase().endsWith('.pdf')) {
+        throw new Error(`File ${file.name} is not a PDF. Only PDF files are supported.`);
+      }
+    }
+
+    const { method = 'pretrained', modelChoice = 'roberta-openai', apiKey, apiUrl } = options;
+
+    try {
+      const formData = new FormData();
+      files.forEach((file) => {
+        formData.append('files', file);
+      });
+      formData.append('method', method);
+      if (method === 'pretrained') {
+        formData.append('model_choice', modelChoice);
+      }
+      if (apiKey) {
+        formData.append('api_key', apiKey);
+      }
+      if (apiUrl) {
+        formData.append('api_url', apiUrl);
+      }
+
+      const response = await fetch(API_ENDPOINTS.ANALYZE_COMBINED, {
+        method: 'POST',
+        body: formData,
+      });
+
+      if (!response.ok) {
+        const errorData = await response.json().catch(() => ({ detail: response.statusText }));
+        throw new Error(errorData.detail || `Analysis failed: ${response.statusText}`);
+      }
+
+      return await response.json();
+    } catch (error) {
+      console.error('Combined analysis error:', error);
+      if (error instanceof Error) {
+        throw error;
+      }
+      throw new Error('Failed to analyze documents');
+    }
+  }
+
   async configureThresholds(config: {
     red_threshold?: number;
     orange_threshold?: number;